@@ -0,0 +1,67 @@
+"""Adaptive top-k: choose how many retrieved chunks to keep from the score distribution.
+
+Retrieval over-fetches ``max_k`` candidates and cuts the ranked list where relevance falls off:
+
+- ``mode="gap"``: at the first drop between neighbouring scores of at least ``gap``. Scores are
+  min-max normalized over the candidates, so the threshold does not depend on the distance metric.
+  If there is no such drop, the configured ``TOP_K`` is kept.
+- ``mode="cumulative"``: at the smallest k whose share of the total normalized relevance reaches
+  ``mass``. Peaked distributions (one clearly relevant note) cut early; flat ones keep more.
+
+k is always clamped to ``[min_k, max_k]``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+ADAPTIVE_K_MODES = ("none", "gap", "cumulative")
+
+
+@dataclass(frozen=True)
+class AdaptiveKConfig:
+    mode: str = "gap"
+    min_k: int = 2
+    max_k: int = 12
+    gap: float = 0.25
+    mass: float = 0.8
+
+    def __post_init__(self):
+        if self.mode not in ADAPTIVE_K_MODES:
+            raise ValueError(f"Unknown adaptive k mode {self.mode!r}. Expected one of {ADAPTIVE_K_MODES}.")
+        if not 1 <= self.min_k <= self.max_k:
+            raise ValueError(f"Adaptive k needs 1 <= min_k <= max_k, got {self.min_k} and {self.max_k}.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+
+
+def choose_k(scores: Sequence[float | None], config: AdaptiveKConfig, default_k: int) -> int:
+    """Number of leading candidates to keep; ``scores`` must be sorted best first."""
+
+    import numpy as np
+
+    n = len(scores)
+    fallback = max(config.min_k, min(default_k, config.max_k, n)) if n else 0
+    if n <= config.min_k or any(score is None for score in scores):
+        return min(fallback, n)
+
+    values = np.asarray(scores, dtype=np.float64)[: config.max_k]
+    spread = float(values.max() - values.min())
+    if spread <= 1e-12:
+        return min(fallback, n)
+    normalized = (values - values.min()) / spread
+
+    if config.mode == "gap":
+        drops = normalized[:-1] - normalized[1:]
+        # A cut after position i keeps i + 1 chunks; a cliff before min_k still keeps min_k.
+        cliffs = np.flatnonzero(drops >= config.gap)
+        if cliffs.size == 0:
+            return min(fallback, n)
+        return max(config.min_k, int(cliffs[0]) + 1)
+
+    share = np.cumsum(normalized) / normalized.sum()
+    k = int(np.searchsorted(share, config.mass - 1e-12)) + 1
+    return max(config.min_k, min(k, len(values)))
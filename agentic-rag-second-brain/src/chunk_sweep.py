@@ -0,0 +1,246 @@
+"""Chunk-size sweep: what ``CHUNK_SIZE`` / ``CHUNK_OVERLAP`` cost at ingest and buy at query time.
+
+For every ``(chunk_size, chunk_overlap)`` pair the notes are chunked, embedded and indexed into a
+fresh ``lean`` Chroma directory, then every golden question is retrieved once. The report gives the
+node count, index bytes on disk, ingest time (chunking + embedding + indexing), per-query retrieval
+latency (including the query embedding call) and recall@k.
+
+Chunk ids change with the chunking, so recall is scored per note: for each drift question, the
+relevant notes are those tagged with its ``drift_topic`` that fall in the newest ``window_days``
+(the notes the eval's recency check expects), and recall@k is the share of them that appear among
+the top-k chunks. Questions without a ``drift_topic`` only count towards latency.
+
+Each configuration re-embeds the corpus, so the sweep costs one full ingest per pair.
+
+    python -m src.chunk_sweep --sizes 256,420,768 --overlaps 0,60,120
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Sequence
+
+from src.eval import EvalQuestion, load_golden_questions
+
+DEFAULT_CHUNK_SIZES = (256, 420, 768)
+DEFAULT_CHUNK_OVERLAPS = (0, 60, 120)
+
+
+@dataclass(frozen=True)
+class ChunkTrial:
+    chunk_size: int
+    chunk_overlap: int
+    nodes: int
+    index_bytes: int
+    chunk_s: float
+    ingest_s: float
+    p50_ms: float
+    p95_ms: float
+    recall_at_k: float | None
+
+
+def relevant_sources(
+    documents: Sequence,
+    questions: Sequence[EvalQuestion],
+    window_days: int = 60,
+) -> dict[str, set[str]]:
+    """``question id -> source paths`` of the newest notes on its drift topic."""
+
+    dated_by_tag: dict[str, list[tuple[str, datetime]]] = {}
+    for document in documents:
+        try:
+            doc_date = datetime.strptime(str(document.metadata.get("doc_date", "")), "%Y-%m-%d")
+        except ValueError:
+            continue
+        for tag in document.metadata.get("tags") or []:
+            dated_by_tag.setdefault(tag, []).append((document.metadata["source_path"], doc_date))
+
+    relevant: dict[str, set[str]] = {}
+    for question in questions:
+        dated = dated_by_tag.get(question.drift_topic or "")
+        if not dated:
+            continue
+        cutoff = max(doc_date for _, doc_date in dated) - timedelta(days=window_days)
+        relevant[question.qid] = {source for source, doc_date in dated if doc_date >= cutoff}
+    return relevant
+
+
+def run_trial(
+    documents: Sequence,
+    questions: Sequence[EvalQuestion],
+    relevant: dict[str, set[str]],
+    *,
+    chunk_size: int,
+    chunk_overlap: int,
+    embed_model: str,
+    top_k: int,
+    workdir: Path | str,
+    workers: int | None = None,
+) -> ChunkTrial:
+    """Chunk, index and query the corpus with one chunking configuration."""
+
+    import numpy as np
+
+    from src.index_store import build_or_load_index
+    from src.ingestion import chunk_documents, chunking_params
+    from src.retrieval import clear_query_embedding_cache, retrieve_chunks
+    from src.write_amplification import directory_bytes
+
+    chunking = chunking_params(chunk_size, chunk_overlap)
+    started = time.perf_counter()
+    nodes = chunk_documents(documents, chunk_size, chunk_overlap, workers=workers)
+    chunk_s = time.perf_counter() - started
+    info = build_or_load_index(
+        nodes=nodes,
+        reset=True,
+        chroma_dir=Path(workdir),
+        embed_model=embed_model,
+        partitioning="none",
+        persist_mode="lean",
+        chunking=chunking,
+    )
+    ingest_s = time.perf_counter() - started
+    index = info["index"]
+
+    # Every trial embeds the same questions; without this only the first would pay for the calls.
+    clear_query_embedding_cache()
+    latencies_ms: list[float] = []
+    recalls: list[float] = []
+    for question in questions:
+        t0 = time.perf_counter()
+        rows = retrieve_chunks(index=index, query=question.question, top_k=top_k)
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+        wanted = relevant.get(question.qid)
+        if wanted:
+            found = {row["source_path"] for row in rows}
+            recalls.append(len(found & wanted) / len(wanted))
+
+    return ChunkTrial(
+        chunk_size=chunking["chunk_size"],
+        chunk_overlap=chunking["chunk_overlap"],
+        nodes=len(nodes),
+        index_bytes=directory_bytes(workdir)["total"],
+        chunk_s=chunk_s,
+        ingest_s=ingest_s,
+        p50_ms=float(np.percentile(latencies_ms, 50)) if latencies_ms else 0.0,
+        p95_ms=float(np.percentile(latencies_ms, 95)) if latencies_ms else 0.0,
+        recall_at_k=sum(recalls) / len(recalls) if recalls else None,
+    )
+
+
+def warm_up(documents: Sequence, *, embed_model: str, workdir: Path | str, sample_documents: int = 3) -> None:
+    """Index and query a few notes so tokenizer, Chroma and client start-up is not billed to a trial."""
+
+    from src.index_store import build_or_load_index
+    from src.ingestion import chunk_documents
+    from src.retrieval import clear_query_embedding_cache, retrieve_chunks
+
+    info = build_or_load_index(
+        nodes=chunk_documents(list(documents[:sample_documents])),
+        reset=True,
+        chroma_dir=Path(workdir),
+        embed_model=embed_model,
+        partitioning="none",
+        persist_mode="lean",
+    )
+    retrieve_chunks(index=info["index"], query="warm-up", top_k=1)
+    clear_query_embedding_cache()
+
+
+def sweep(
+    documents: Sequence,
+    questions: Sequence[EvalQuestion],
+    *,
+    chunk_sizes: Sequence[int],
+    chunk_overlaps: Sequence[int],
+    embed_model: str,
+    top_k: int,
+    window_days: int = 60,
+    workers: int | None = None,
+) -> list[ChunkTrial]:
+    """One ``ChunkTrial`` per valid pair (overlap smaller than size), each in a throwaway directory."""
+
+    relevant = relevant_sources(documents, questions, window_days)
+    pairs = [(size, overlap) for size in chunk_sizes for overlap in chunk_overlaps if overlap < size]
+    root = Path(tempfile.mkdtemp(prefix="rag-chunk-sweep-"))
+    try:
+        warm_up(documents, embed_model=embed_model, workdir=root / "warm-up")
+        return [
+            run_trial(
+                documents,
+                questions,
+                relevant,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                embed_model=embed_model,
+                top_k=top_k,
+                workdir=root / f"{chunk_size}-{chunk_overlap}",
+                workers=workers,
+            )
+            for chunk_size, chunk_overlap in pairs
+        ]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _format_trial(trial: ChunkTrial) -> str:
+    recall = "n/a" if trial.recall_at_k is None else f"{trial.recall_at_k:.3f}"
+    return (
+        f"size={trial.chunk_size:<5} overlap={trial.chunk_overlap:<4} nodes={trial.nodes:<5} "
+        f"index={trial.index_bytes / 1e3:.1f} kB chunk={trial.chunk_s:.2f}s ingest={trial.ingest_s:.2f}s "
+        f"p50={trial.p50_ms:.1f}ms p95={trial.p95_ms:.1f}ms recall@k={recall}"
+    )
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.chunk_sweep", description=__doc__.splitlines()[0])
+    parser.add_argument("--notes-dir", default=None, help="Notes to index (defaults to RAW_NOTES_DIR).")
+    parser.add_argument("--golden", default="eval/golden_questions.jsonl")
+    parser.add_argument("--sizes", type=_int_list, default=list(DEFAULT_CHUNK_SIZES))
+    parser.add_argument("--overlaps", type=_int_list, default=list(DEFAULT_CHUNK_OVERLAPS))
+    parser.add_argument("--k", type=int, default=None, help="Recall@k cutoff (defaults to TOP_K).")
+    parser.add_argument("--window-days", type=int, default=60, help="Newest-notes window per drift topic.")
+    parser.add_argument("--workers", type=int, default=None, help="Chunking processes (defaults to CHUNK_WORKERS).")
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+    from src.ingestion import load_markdown_documents
+
+    documents = load_markdown_documents(args.notes_dir or settings.raw_notes_dir)
+    questions = load_golden_questions(args.golden)
+    k = args.k or int(settings.top_k)
+    print(f"{len(documents)} notes, {len(questions)} golden questions, k={k}, embed_model={settings.embed_model}")
+    trials = sweep(
+        documents,
+        questions,
+        chunk_sizes=args.sizes,
+        chunk_overlaps=args.overlaps,
+        embed_model=settings.embed_model,
+        top_k=k,
+        window_days=args.window_days,
+        workers=args.workers,
+    )
+    for trial in trials:
+        print("  " + _format_trial(trial))
+    scored = [trial for trial in trials if trial.recall_at_k is not None]
+    if scored:
+        best = max(scored, key=lambda trial: (trial.recall_at_k, -trial.index_bytes, -trial.p50_ms))
+        print(
+            f"\nBest recall@k: {_format_trial(best)}"
+            f"\nSettings: CHUNK_SIZE={best.chunk_size} CHUNK_OVERLAP={best.chunk_overlap}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,188 @@
+"""Command-line entry point.
+
+One-shot query::
+
+    python -m src.cli query "What embedding model should we use?" --mode agentic
+
+Warm worker (index and graph are loaded once, then one query per stdin line)::
+
+    python -m src.cli worker --mode baseline
+
+HTTP query service (see ``src/service.py``), optionally re-indexing changed notes in the background::
+
+    python -m src.cli serve --port 8000 --watch
+
+Pre-forked workers sharing one read-only, memory-mapped index (see ``src/prefork.py``)::
+
+    python -m src.cli serve --port 8000 --workers 4
+
+Watch ``RAW_NOTES_DIR`` and keep the index in sync without serving (see ``src/watcher.py``)::
+
+    python -m src.cli watch
+
+Worker input lines are either plain query text or JSON objects with ``query`` and optional
+``mode`` / ``id`` keys. Each answer is written to stdout as a single JSON line.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, TextIO
+
+from src.records import json_default
+
+
+def _dumps(payload: dict[str, Any]) -> str:
+    return json.dumps(payload, default=json_default)
+
+
+def _parse_worker_line(line: str, default_mode: str) -> dict[str, Any]:
+    stripped = line.strip()
+    if stripped.startswith("{"):
+        request = json.loads(stripped)
+        if not str(request.get("query", "")).strip():
+            raise ValueError("Worker request is missing 'query'.")
+        return {
+            "id": request.get("id"),
+            "query": str(request["query"]),
+            "mode": str(request.get("mode", default_mode)),
+        }
+    return {"id": None, "query": stripped, "mode": default_mode}
+
+
+def run_worker(runtime, default_mode: str, stdin: TextIO, stdout: TextIO) -> int:
+    """Serve queries line by line against an already-loaded runtime."""
+
+    served = 0
+    for line in stdin:
+        if not line.strip():
+            continue
+        started = time.perf_counter()
+        try:
+            request = _parse_worker_line(line, default_mode)
+            result = runtime.answer(request["query"], mode=request["mode"])
+            payload = {
+                "id": request["id"],
+                "mode": request["mode"],
+                "latency_s": time.perf_counter() - started,
+                "result": result,
+            }
+        except Exception as exc:  # keep the warm process alive on bad input or API errors
+            payload = {"error": f"{type(exc).__name__}: {exc}", "latency_s": time.perf_counter() - started}
+        stdout.write(_dumps(payload) + "\n")
+        stdout.flush()
+        served += 1
+    return served
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Agentic RAG second brain CLI.")
+    parser.add_argument("--chroma-dir", default=None, help="Persisted Chroma directory (defaults to CHROMA_DIR).")
+    parser.add_argument("--embed-model", default=None, help="Embedding model (defaults to EMBED_MODEL).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    query_parser = subparsers.add_parser("query", help="Answer a single query and exit.")
+    query_parser.add_argument("text", help="Question to answer.")
+    query_parser.add_argument("--mode", choices=["baseline", "agentic"], default="agentic")
+
+    worker_parser = subparsers.add_parser("worker", help="Keep the index and graph warm and answer stdin lines.")
+    worker_parser.add_argument("--mode", choices=["baseline", "agentic"], default="agentic")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve baseline and agentic queries over HTTP.")
+    serve_parser.add_argument("--host", default=None, help="Bind address (defaults to SERVICE_HOST).")
+    serve_parser.add_argument("--port", type=int, default=None, help="Bind port (defaults to SERVICE_PORT).")
+    serve_parser.add_argument("--max-concurrency", type=int, default=None)
+    serve_parser.add_argument("--max-pending", type=int, default=None)
+    serve_parser.add_argument("--watch", action="store_true", help="Apply note changes to the index while serving.")
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Pre-forked worker processes sharing a read-only index (defaults to SERVICE_WORKERS).",
+    )
+
+    subparsers.add_parser("watch", help="Apply created, modified and deleted notes to the index until interrupted.")
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+
+    # Settings read the environment at import time, so .env must be loaded first.
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    from src.config import settings
+
+    if args.command == "serve":
+        workers = int(args.workers or settings.service_workers)
+        if workers > 1:
+            if args.watch:
+                raise SystemExit("--watch cannot be combined with read-only pre-forked workers.")
+            from src.prefork import run_prefork_service
+
+            run_prefork_service(
+                workers=workers,
+                host=args.host or settings.service_host,
+                port=int(args.port if args.port is not None else settings.service_port),
+                max_concurrency=int(args.max_concurrency or settings.service_max_concurrency),
+                max_pending=int(args.max_pending if args.max_pending is not None else settings.service_max_pending),
+                chroma_dir=args.chroma_dir,
+                embed_model=args.embed_model,
+            )
+            return 0
+
+    from src.runtime import load_runtime
+
+    started = time.perf_counter()
+    runtime = load_runtime(chroma_dir=args.chroma_dir, embed_model=args.embed_model)
+    print(f"runtime ready in {time.perf_counter() - started:.2f}s", file=sys.stderr, flush=True)
+
+    if args.command == "query":
+        sys.stdout.write(_dumps(runtime.answer(args.text, mode=args.mode)) + "\n")
+        return 0
+
+    if args.command == "serve":
+        from src.service import run_service
+
+        run_service(
+            runtime,
+            host=args.host,
+            port=args.port,
+            max_concurrency=args.max_concurrency,
+            max_pending=args.max_pending,
+            watch=args.watch,
+        )
+        return 0
+
+    if args.command == "watch":
+        from src.watcher import NoteWatcher
+
+        watcher = NoteWatcher(
+            runtime.index_handle,
+            settings.raw_notes_dir,
+            poll_interval_s=float(settings.watch_poll_interval_s),
+            debounce_s=float(settings.watch_debounce_s),
+            chroma_dir=runtime.chroma_dir,
+        ).start()
+        print(f"watching {settings.raw_notes_dir}", file=sys.stderr, flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.stop()
+        return 0
+
+    run_worker(runtime, default_mode=args.mode, stdin=sys.stdin, stdout=sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,6 +12,10 @@ class Settings:
     embed_model: str = os.getenv("EMBED_MODEL", "text-embedding-3-small")
     chroma_dir: str = os.getenv("CHROMA_DIR", "./data/processed/chroma")
     reset_index: str = os.getenv("RESET_INDEX", "0")
+    persist_mode: str = os.getenv("PERSIST_MODE", "full")
+    chunk_size: str = os.getenv("CHUNK_SIZE", "420")
+    chunk_overlap: str = os.getenv("CHUNK_OVERLAP", "60")
+    chunk_workers: str = os.getenv("CHUNK_WORKERS", "1")
     top_k: str = os.getenv("TOP_K", "6")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     temperature: str = os.getenv("TEMPERATURE", "0")
@@ -21,6 +25,65 @@ class Settings:
     evidence_min_recent_chunks: str = os.getenv("EVIDENCE_MIN_RECENT_CHUNKS", "1")
     evidence_threshold: str = os.getenv("EVIDENCE_THRESHOLD", "0.65")
     use_llm_grader: str = os.getenv("USE_LLM_GRADER", "0")
+    speculative_generation: str = os.getenv("SPECULATIVE_GENERATION", "0")
+    multi_query: str = os.getenv("MULTI_QUERY", "0")
+    rrf_k: str = os.getenv("RRF_K", "60")
+    rewrite_model: str = os.getenv("REWRITE_MODEL", "")
+    rewrite_temperature: str = os.getenv("REWRITE_TEMPERATURE", "0")
+    rewrite_max_tokens: str = os.getenv("REWRITE_MAX_TOKENS", "0")
+    rewrite_timeout_s: str = os.getenv("REWRITE_TIMEOUT_S", "0")
+    grader_model: str = os.getenv("GRADER_MODEL", "")
+    grader_temperature: str = os.getenv("GRADER_TEMPERATURE", "0")
+    grader_max_tokens: str = os.getenv("GRADER_MAX_TOKENS", "0")
+    grader_timeout_s: str = os.getenv("GRADER_TIMEOUT_S", "0")
+    generation_model: str = os.getenv("GENERATION_MODEL", "")
+    generation_temperature: str = os.getenv("GENERATION_TEMPERATURE", "")
+    generation_max_tokens: str = os.getenv("GENERATION_MAX_TOKENS", "0")
+    generation_timeout_s: str = os.getenv("GENERATION_TIMEOUT_S", "0")
+    adaptive_k_mode: str = os.getenv("ADAPTIVE_K_MODE", "none")
+    adaptive_min_k: str = os.getenv("ADAPTIVE_MIN_K", "2")
+    adaptive_max_k: str = os.getenv("ADAPTIVE_MAX_K", "12")
+    adaptive_gap: str = os.getenv("ADAPTIVE_GAP", "0.25")
+    adaptive_mass: str = os.getenv("ADAPTIVE_MASS", "0.8")
+    diversify_mode: str = os.getenv("DIVERSIFY_MODE", "none")
+    diversify_fetch_k: str = os.getenv("DIVERSIFY_FETCH_K", "20")
+    mmr_lambda: str = os.getenv("MMR_LAMBDA", "0.7")
+    dedup_threshold: str = os.getenv("DEDUP_THRESHOLD", "0.92")
+    hnsw_space: str = os.getenv("HNSW_SPACE", "l2")
+    hnsw_m: str = os.getenv("HNSW_M", "16")
+    hnsw_construction_ef: str = os.getenv("HNSW_CONSTRUCTION_EF", "100")
+    hnsw_search_ef: str = os.getenv("HNSW_SEARCH_EF", "10")
+    matryoshka_dim: str = os.getenv("MATRYOSHKA_DIM", "0")
+    rescore_candidates: str = os.getenv("RESCORE_CANDIDATES", "50")
+    index_partitioning: str = os.getenv("INDEX_PARTITIONING", "none")
+    recent_partitions: str = os.getenv("RECENT_PARTITIONS", "2")
+    csv_chunk_rows: str = os.getenv("CSV_CHUNK_ROWS", "10000")
+    embed_batch_size: str = os.getenv("EMBED_BATCH_SIZE", "256")
+    embed_workers: str = os.getenv("EMBED_WORKERS", "4")
+    migration_shadow_rate: str = os.getenv("MIGRATION_SHADOW_RATE", "0")
+    model_prices: str = os.getenv("MODEL_PRICES", "")
+    rate_limit_rpm: str = os.getenv("RATE_LIMIT_RPM", "0")
+    rate_limit_tpm: str = os.getenv("RATE_LIMIT_TPM", "0")
+    rate_limits: str = os.getenv("RATE_LIMITS", "")
+    rate_limit_burst_s: str = os.getenv("RATE_LIMIT_BURST_S", "10")
+    rate_limit_max_retries: str = os.getenv("RATE_LIMIT_MAX_RETRIES", "6")
+    rate_limit_backoff_s: str = os.getenv("RATE_LIMIT_BACKOFF_S", "0.5")
+    rate_limit_backoff_max_s: str = os.getenv("RATE_LIMIT_BACKOFF_MAX_S", "30")
+    eval_baseline_report: str = os.getenv("EVAL_BASELINE_REPORT", "eval/baseline_report.json")
+    eval_regression_tolerance: str = os.getenv("EVAL_REGRESSION_TOLERANCE", "0.10")
+    eval_latency_slack_s: str = os.getenv("EVAL_LATENCY_SLACK_S", "0.05")
+    profile: str = os.getenv("PROFILE", "0")
+    profile_dir: str = os.getenv("PROFILE_DIR", "./data/processed/profiles")
+    profile_sample_interval_ms: str = os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2")
+    profile_top_n: str = os.getenv("PROFILE_TOP_N", "25")
+    profile_traceback_depth: str = os.getenv("PROFILE_TRACEBACK_DEPTH", "1")
+    service_host: str = os.getenv("SERVICE_HOST", "127.0.0.1")
+    service_port: str = os.getenv("SERVICE_PORT", "8000")
+    service_max_concurrency: str = os.getenv("SERVICE_MAX_CONCURRENCY", "8")
+    service_max_pending: str = os.getenv("SERVICE_MAX_PENDING", "64")
+    service_workers: str = os.getenv("SERVICE_WORKERS", "1")
+    watch_poll_interval_s: str = os.getenv("WATCH_POLL_INTERVAL_S", "1.0")
+    watch_debounce_s: str = os.getenv("WATCH_DEBOUNCE_S", "0.5")
 
 
 settings = Settings()
@@ -0,0 +1,216 @@
+"""Tabular knowledge bases: embed a CSV of ``id,title,content`` rows into a searchable snapshot.
+
+The CSV is read in ``chunk_rows`` slices with pandas, and each slice is embedded as it is read.
+Each row becomes one chunk, ``"Title: {title}\\nContent: {content}"``. Chunks are embedded in
+batched requests (``batch_size`` inputs and at most ``max_batch_chars`` characters each, up to
+``workers`` requests in flight) instead of one call per row. The vectors are L2-normalized into one
+contiguous float32 matrix and written in the snapshot format (``src/snapshot.py``), so
+``SnapshotIndex`` answers top-k with a single matrix-vector product plus ``argpartition`` and returns
+the same rows as ``src.retrieval.retrieve_chunks``. Set ``CHROMA_DIR`` to the output directory to
+run the baseline, agentic graph or eval over the table.
+
+    python -m src.csv_kb build ../data/sample_knowledge.csv --out data/processed/csv_kb
+    python -m src.snapshot load data/processed/csv_kb --query "refund policy"
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Sequence
+
+from src.snapshot import METADATA_COLUMNS, write_snapshot
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+CSV_COLUMNS = ("id", "title", "content")
+CHUNK_TEMPLATE = "Title: {title}\nContent: {content}"
+
+
+def chunk_text(title: str, content: str) -> str:
+    return CHUNK_TEMPLATE.format(title=title, content=content)
+
+
+def read_csv_chunks(
+    csv_path: Path | str,
+    chunk_rows: int = 10_000,
+    date_column: str | None = None,
+) -> Iterator["pd.DataFrame"]:
+    """Yield ``chunk_rows``-row frames of the CSV's string columns; missing cells become ``""``."""
+
+    import pandas as pd
+
+    wanted = set(CSV_COLUMNS) | ({date_column} if date_column else set())
+    for frame in pd.read_csv(
+        csv_path,
+        chunksize=chunk_rows,
+        dtype=str,
+        keep_default_na=False,
+        usecols=lambda column: column in wanted,
+    ):
+        missing = wanted - set(frame.columns)
+        if missing:
+            raise ValueError(f"{csv_path} is missing column(s) {sorted(missing)}; expected {CSV_COLUMNS}.")
+        yield frame
+
+
+def _batches(texts: Sequence[str], batch_size: int, max_batch_chars: int) -> list[tuple[int, int]]:
+    """``(start, end)`` slices holding at most ``batch_size`` texts and roughly ``max_batch_chars``."""
+
+    spans: list[tuple[int, int]] = []
+    start, chars = 0, 0
+    for position, text in enumerate(texts):
+        if position > start and (position - start >= batch_size or chars + len(text) > max_batch_chars):
+            spans.append((start, position))
+            start, chars = position, 0
+        chars += len(text)
+    if start < len(texts):
+        spans.append((start, len(texts)))
+    return spans
+
+
+def embed_texts(
+    client,
+    texts: Sequence[str],
+    model: str,
+    *,
+    batch_size: int = 256,
+    max_batch_chars: int = 400_000,
+    workers: int = 4,
+) -> "np.ndarray":
+    """``(len(texts), dim)`` float32 embeddings in input order, fetched in batched requests."""
+
+    import numpy as np
+
+    def embed(span: tuple[int, int]) -> list[list[float]]:
+        response = client.embeddings.create(model=model, input=list(texts[span[0] : span[1]]))
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    spans = _batches(texts, batch_size, max_batch_chars)
+    if not spans:
+        return np.zeros((0, 0), dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="csv-embed") as pool:
+        batches = list(pool.map(embed, spans))
+    return np.asarray([vector for batch in batches for vector in batch], dtype=np.float32)
+
+
+def normalize_rows(vectors: "np.ndarray") -> "np.ndarray":
+    """Contiguous float32 copy with unit-length rows (all-zero rows stay zero)."""
+
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build_csv_snapshot(
+    csv_path: Path | str,
+    out_dir: Path | str,
+    *,
+    embed_model: str,
+    chunk_rows: int = 10_000,
+    batch_size: int = 256,
+    max_batch_chars: int = 400_000,
+    workers: int = 4,
+    date_column: str | None = None,
+    client=None,
+) -> dict[str, Any]:
+    """Embed every CSV row and write a normalized snapshot to ``out_dir``. Returns the manifest."""
+
+    import numpy as np
+
+    if client is None:
+        from src.rate_limit import openai_client
+
+        client = openai_client()
+
+    csv_path = Path(csv_path)
+    stem = csv_path.stem
+    texts: list[str] = []
+    blocks: list[np.ndarray] = []
+    columns: dict[str, list] = {"node_id": [], **{key: [] for key in METADATA_COLUMNS}}
+    seen: set[str] = set()
+    for frame in read_csv_chunks(csv_path, chunk_rows=chunk_rows, date_column=date_column):
+        id_series = frame["id"].str.strip()
+        ids = id_series.tolist()
+        duplicates = seen.intersection(ids) | set(id_series[id_series.duplicated()])
+        if duplicates:
+            raise ValueError(f"{csv_path} has duplicate id(s) {sorted(duplicates)[:5]}; ids must be unique.")
+        seen.update(ids)
+
+        titles = frame["title"].tolist()
+        chunk_texts = [chunk_text(title, content) for title, content in zip(titles, frame["content"].tolist())]
+        blocks.append(
+            embed_texts(
+                client,
+                chunk_texts,
+                embed_model,
+                batch_size=batch_size,
+                max_batch_chars=max_batch_chars,
+                workers=workers,
+            )
+        )
+        texts.extend(chunk_texts)
+        columns["node_id"].extend(f"csv:{stem}:{row_id}" for row_id in ids)
+        columns["chunk_id"].extend(f"{stem}:{row_id}" for row_id in ids)
+        columns["doc_id"].extend(ids)
+        columns["doc_title"].extend(titles)
+        columns["doc_date"].extend(frame[date_column].tolist() if date_column else [""] * len(ids))
+        columns["source_path"].extend([str(csv_path)] * len(ids))
+        columns["tags"].extend([[] for _ in ids])
+
+    blocks = [block for block in blocks if block.size]
+    if not blocks:
+        raise ValueError(f"{csv_path} has no rows to embed.")
+    return write_snapshot(
+        out_dir,
+        vectors=normalize_rows(np.concatenate(blocks)),
+        texts=texts,
+        columns=columns,
+        embed_model=embed_model,
+        space="cosine",
+        normalized=True,
+        chunking={"splitter": "csv-row", "template": CHUNK_TEMPLATE},
+        source={"csv": str(csv_path), "rows": len(texts)},
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.csv_kb", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Embed a CSV into a snapshot directory.")
+    build_parser.add_argument("csv")
+    build_parser.add_argument("--out", required=True)
+    build_parser.add_argument("--chunk-rows", type=int, default=None)
+    build_parser.add_argument("--batch-size", type=int, default=None)
+    build_parser.add_argument("--workers", type=int, default=None)
+    build_parser.add_argument("--date-column", default=None)
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+
+    started = time.perf_counter()
+    manifest = build_csv_snapshot(
+        args.csv,
+        args.out,
+        embed_model=settings.embed_model,
+        chunk_rows=args.chunk_rows or int(settings.csv_chunk_rows),
+        batch_size=args.batch_size or int(settings.embed_batch_size),
+        workers=args.workers or int(settings.embed_workers),
+        date_column=args.date_column,
+    )
+    print(
+        f"embedded {manifest['count']} rows (dim={manifest['dim']}) from {args.csv} "
+        f"to {args.out} in {time.perf_counter() - started:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""Near-duplicate suppression and MMR diversification over retrieved chunks.
+
+Both stages work on the stored chunk embeddings as one matrix, so the pairwise similarity of
+the whole candidate set is a single matrix product.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DIVERSIFY_MODES = ("none", "mmr", "threshold")
+
+
+@dataclass(frozen=True)
+class DiversifyConfig:
+    """How to over-fetch and thin out retrieval candidates before context assembly.
+
+    - ``mode="mmr"``: maximal marginal relevance, trading query relevance against redundancy
+      with ``lambda_mult`` (1.0 = pure relevance).
+    - ``mode="threshold"``: keep candidates in rank order, dropping any whose cosine similarity
+      to an already kept chunk exceeds ``duplicate_threshold``.
+
+    Both modes drop near-duplicates above ``duplicate_threshold``, so fewer than ``top_k`` chunks
+    may be returned.
+    """
+
+    mode: str = "mmr"
+    fetch_k: int = 20
+    lambda_mult: float = 0.7
+    duplicate_threshold: float = 0.92
+
+    def __post_init__(self):
+        if self.mode not in DIVERSIFY_MODES:
+            raise ValueError(f"Unknown diversify mode {self.mode!r}. Expected one of {DIVERSIFY_MODES}.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    return matrix / np.clip(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12, None)
+
+
+def dedupe_by_similarity(candidates: "np.ndarray", k: int, threshold: float) -> list[int]:
+    """Greedy rank-order selection skipping candidates too similar to anything already kept."""
+
+    import numpy as np
+
+    vectors = _normalize_rows(np.asarray(candidates, dtype=np.float32))
+    similarity = vectors @ vectors.T
+    kept: list[int] = []
+    for idx in range(len(vectors)):
+        if kept and float(similarity[idx, kept].max()) > threshold:
+            continue
+        kept.append(idx)
+        if len(kept) == k:
+            break
+    return kept
+
+
+def mmr_select(
+    query: Sequence[float],
+    candidates: "np.ndarray",
+    k: int,
+    lambda_mult: float,
+    duplicate_threshold: float = 1.0,
+) -> list[int]:
+    """Maximal marginal relevance over normalized vectors; returns selected candidate indices."""
+
+    import numpy as np
+
+    vectors = _normalize_rows(np.asarray(candidates, dtype=np.float32))
+    query_vec = _normalize_rows(np.asarray(query, dtype=np.float32))
+    relevance = vectors @ query_vec
+    similarity = vectors @ vectors.T
+
+    selected: list[int] = []
+    max_redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    while len(selected) < min(k, len(vectors)):
+        redundancy = np.where(np.isfinite(max_redundancy), max_redundancy, 0.0)
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            break
+        available[best] = False
+        if selected and float(max_redundancy[best]) > duplicate_threshold:
+            continue
+        selected.append(best)
+        max_redundancy = np.maximum(max_redundancy, similarity[best])
+    return selected
+
+
+def select_diverse(
+    query_embedding: Sequence[float],
+    candidate_embeddings: "np.ndarray",
+    top_k: int,
+    config: DiversifyConfig,
+) -> list[int]:
+    if config.mode == "mmr":
+        return mmr_select(
+            query_embedding,
+            candidate_embeddings,
+            k=top_k,
+            lambda_mult=config.lambda_mult,
+            duplicate_threshold=config.duplicate_threshold,
+        )
+    if config.mode == "threshold":
+        return dedupe_by_similarity(candidate_embeddings, k=top_k, threshold=config.duplicate_threshold)
+    return list(range(min(top_k, len(candidate_embeddings))))
@@ -0,0 +1,492 @@
+"""Zero-downtime embedding model migration through a shadow collection.
+
+Changing ``EMBED_MODEL`` invalidates every stored vector. Instead of an offline ``RESET_INDEX=1``
+rebuild, a migration builds a second collection (``notes__<model>``) in the same Chroma directory,
+chunked like the live one so chunk ids line up, while queries keep being answered from the live
+collection. Optionally a ``ShadowIndex`` then replays a sample of live queries against the new
+collection off the query path and records top-k overlap and latency for both. Notes edited after
+the build started are replayed into the new collection when the build finishes and again at
+cutover, so no watcher edit is lost. Cutover rewrites
+``index_manifest.json`` to name the new collection (a single atomic file replace) and, in a running
+service, swaps the new index in through the ``IndexHandle``; the old collection is kept, so cutting
+over back to the old model is the rollback.
+
+Collections record ``embed:model`` and ``embed:dim`` in their metadata, and loading one with another
+model raises ``EmbeddingModelMismatchError``. Only single-collection indexes can be migrated;
+partitioned and two-stage indexes are rebuilt instead.
+
+    python -m src.embed_migration build --to text-embedding-3-large
+    python -m src.embed_migration compare --to text-embedding-3-large --golden eval/golden_questions.jsonl
+    python -m src.embed_migration cutover --to text-embedding-3-large
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Sequence
+
+from src.index_store import (
+    COLLECTION_NAME,
+    EMBED_DIM_KEY,
+    EMBED_MODEL_KEY,
+    activate_collection,
+    active_collection_name,
+    model_collection_name,
+    read_index_manifest,
+)
+from src.metrics import MetricsRegistry
+from src.records import ChunkRecord
+
+MIGRATION_STATES = ("building", "shadowing", "ready", "cut_over", "failed")
+
+
+def _require_single_collection(chroma_dir: Path | str) -> None:
+    from src.matryoshka import read_two_stage_manifest
+    from src.partitions import read_partition_manifest
+    from src.snapshot import read_snapshot_manifest
+
+    readers = (read_partition_manifest, read_two_stage_manifest, read_snapshot_manifest)
+    if any(read(chroma_dir) for read in readers):
+        raise ValueError(
+            f"{chroma_dir} is a partitioned, two-stage or snapshot index; only single-collection indexes "
+            "can be migrated. Rebuild it with RESET_INDEX=1 and the new EMBED_MODEL instead."
+        )
+
+
+def list_model_collections(chroma_dir: Path | str) -> list[dict[str, Any]]:
+    """Every chunk collection in ``chroma_dir`` with its recorded model, dimension and size."""
+
+    import chromadb
+
+    _require_single_collection(chroma_dir)
+    manifest = read_index_manifest(chroma_dir) or {}
+    active = active_collection_name(chroma_dir)
+    client = chromadb.PersistentClient(path=str(chroma_dir))
+    rows = []
+    for collection in client.list_collections():
+        name = collection if isinstance(collection, str) else collection.name
+        if name != COLLECTION_NAME and not name.startswith(f"{COLLECTION_NAME}__"):
+            continue
+        collection = client.get_collection(name)
+        metadata = collection.metadata or {}
+        embed_model = metadata.get(EMBED_MODEL_KEY)
+        if embed_model is None and name == active:
+            embed_model = manifest.get("embed_model")
+        elif embed_model is None and name == manifest.get("previous_collection"):
+            embed_model = manifest.get("previous_embed_model")
+        rows.append(
+            {
+                "collection": name,
+                "embed_model": embed_model,
+                "embed_dim": metadata.get(EMBED_DIM_KEY),
+                "vector_count": collection.count(),
+                "active": name == active,
+            }
+        )
+    return sorted(rows, key=lambda row: (not row["active"], row["collection"]))
+
+
+def collection_for_model(chroma_dir: Path | str, embed_model: str) -> str:
+    """The existing collection holding ``embed_model`` vectors, else the name a migration would build."""
+
+    for row in list_model_collections(chroma_dir):
+        if row["embed_model"] == embed_model and row["vector_count"]:
+            return row["collection"]
+    return model_collection_name(embed_model)
+
+
+def build_model_collection(
+    chroma_dir: Path | str,
+    embed_model: str,
+    *,
+    notes_dir: Path | str,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """Chunk the notes like the live index and embed them into ``embed_model``'s own collection.
+
+    Returns the ``build_or_load_index`` result; the live collection and the manifest are untouched.
+    """
+
+    from src.index_store import build_or_load_index
+    from src.ingestion import chunk_documents, chunking_params, load_markdown_documents
+
+    chroma_dir = Path(chroma_dir)
+    _require_single_collection(chroma_dir)
+    collection_name = model_collection_name(embed_model)
+    if collection_name == active_collection_name(chroma_dir):
+        raise ValueError(f"'{collection_name}' is already the active collection in {chroma_dir}.")
+    chunking = (read_index_manifest(chroma_dir) or {}).get("chunking") or chunking_params()
+    nodes = chunk_documents(
+        load_markdown_documents(notes_dir),
+        chunking["chunk_size"],
+        chunking["chunk_overlap"],
+        workers=workers,
+    )
+    return build_or_load_index(
+        nodes=nodes,
+        reset=True,
+        chroma_dir=chroma_dir,
+        embed_model=embed_model,
+        partitioning="none",
+        chunking=chunking,
+        collection_name=collection_name,
+    )
+
+
+def cutover_collection(chroma_dir: Path | str, embed_model: str) -> dict[str, Any]:
+    """Make ``embed_model``'s collection the active one. Returns the new manifest."""
+
+    import chromadb
+
+    chroma_dir = Path(chroma_dir)
+    _require_single_collection(chroma_dir)
+    collection_name = collection_for_model(chroma_dir, embed_model)
+    try:
+        collection = chromadb.PersistentClient(path=str(chroma_dir)).get_collection(collection_name)
+    except Exception as exc:
+        raise FileNotFoundError(
+            f"No collection for {embed_model!r} in {chroma_dir}; run the migration build first."
+        ) from exc
+    if collection.count() == 0:
+        raise FileNotFoundError(f"Collection '{collection_name}' in {chroma_dir} has no vectors.")
+    return activate_collection(
+        chroma_dir,
+        collection_name,
+        embed_model=embed_model,
+        embed_dim=(collection.metadata or {}).get(EMBED_DIM_KEY),
+        vector_count=collection.count(),
+    )
+
+
+def overlap_at_k(primary: Sequence[ChunkRecord], candidate: Sequence[ChunkRecord]) -> float:
+    """Share of the top-k chunk ids both indexes returned (1.0 when both are empty)."""
+
+    k = max(len(primary), len(candidate))
+    if not k:
+        return 1.0
+    return len({row["chunk_id"] for row in primary} & {row["chunk_id"] for row in candidate}) / k
+
+
+class ShadowIndex:
+    """Index-like wrapper that answers from ``primary`` and replays sampled queries on ``candidate``.
+
+    The candidate query runs on a background thread after the primary answer is returned, so it adds
+    no latency; at most ``max_pending`` replays are queued and the rest are counted as dropped.
+    Metrics: ``shadow.queries``, ``shadow.overlap_sum``, ``shadow.top1_agree``, ``shadow.errors``,
+    ``shadow.dropped`` and the ``shadow.primary_s`` / ``shadow.candidate_s`` latency histograms.
+    """
+
+    def __init__(
+        self,
+        primary: Any,
+        candidate: Any,
+        *,
+        sample_rate: float = 1.0,
+        metrics: MetricsRegistry | None = None,
+        max_pending: int = 32,
+    ):
+        from src.retrieval import _embed_model
+
+        self.primary = primary
+        self.candidate = candidate
+        self.embed_model = _embed_model(primary)
+        self.sample_rate = sample_rate
+        self.metrics = metrics or MetricsRegistry()
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shadow-query")
+
+    @property
+    def writable_index(self) -> Any:
+        """Where note changes go: the primary. The migration replays them into the candidate."""
+
+        return self.primary
+
+    def stored_embeddings(self, node_ids: Sequence[str]) -> dict[str, list[float]]:
+        from src.retrieval import stored_embeddings
+
+        return stored_embeddings(self.primary, node_ids)
+
+    def retrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import retrieve_candidates
+
+        started = time.perf_counter()
+        rows = retrieve_candidates(self.primary, query, top_k)
+        self._shadow(query, top_k, rows, time.perf_counter() - started)
+        return rows
+
+    async def aretrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import aretrieve_candidates
+
+        started = time.perf_counter()
+        rows = await aretrieve_candidates(self.primary, query, top_k)
+        self._shadow(query, top_k, rows, time.perf_counter() - started)
+        return rows
+
+    def _shadow(self, query: str, top_k: int, rows: list[ChunkRecord], primary_s: float) -> None:
+        if random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.metrics.increment("shadow.dropped")
+                return
+            self._pending += 1
+        self._pool.submit(self._compare, query, top_k, list(rows), primary_s)
+
+    def _compare(self, query: str, top_k: int, rows: list[ChunkRecord], primary_s: float) -> None:
+        from src.retrieval import retrieve_candidates
+
+        try:
+            started = time.perf_counter()
+            candidate_rows = retrieve_candidates(self.candidate, query, top_k)
+            candidate_s = time.perf_counter() - started
+        except Exception:
+            self.metrics.increment("shadow.errors")
+            return
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self.metrics.increment("shadow.queries")
+        self.metrics.increment("shadow.overlap_sum", overlap_at_k(rows, candidate_rows))
+        if rows and candidate_rows and rows[0]["chunk_id"] == candidate_rows[0]["chunk_id"]:
+            self.metrics.increment("shadow.top1_agree")
+        self.metrics.histogram("shadow.primary_s").observe(primary_s)
+        self.metrics.histogram("shadow.candidate_s").observe(candidate_s)
+
+    def close(self, wait: bool = True) -> None:
+        """Stop replaying queries (pending replays finish when ``wait``)."""
+
+        self._pool.shutdown(wait=wait)
+
+    def summary(self) -> dict[str, Any]:
+        snapshot = self.metrics.snapshot()
+        counters, histograms = snapshot["counters"], snapshot["histograms"]
+        queries = counters.get("shadow.queries", 0)
+        return {
+            "sample_rate": self.sample_rate,
+            "queries": queries,
+            "mean_overlap_at_k": counters.get("shadow.overlap_sum", 0) / queries if queries else None,
+            "top1_agreement": counters.get("shadow.top1_agree", 0) / queries if queries else None,
+            "errors": counters.get("shadow.errors", 0),
+            "dropped": counters.get("shadow.dropped", 0),
+            "primary_p50_s": histograms.get("shadow.primary_s", {}).get("p50_s"),
+            "candidate_p50_s": histograms.get("shadow.candidate_s", {}).get("p50_s"),
+        }
+
+
+class EmbeddingMigration:
+    """One in-process migration: build in the background, optionally shadow, then cut over.
+
+    ``start`` returns a ``Future``; queries keep using the handle's current version while the new
+    collection is built. With ``shadow_rate`` > 0 the handle then serves a ``ShadowIndex`` (answers
+    still come from the old collection). ``cutover`` activates the new collection and swaps it in.
+    Notes changed since the build's scan of ``notes_dir`` are re-indexed into the new collection
+    after the build and around cutover (``caught_up`` counts them).
+    """
+
+    def __init__(
+        self,
+        handle,
+        chroma_dir: Path | str,
+        *,
+        from_model: str,
+        to_model: str,
+        notes_dir: Path | str,
+        shadow_rate: float = 0.0,
+    ):
+        self.handle = handle
+        self.chroma_dir = Path(chroma_dir)
+        self.from_model = from_model
+        self.to_model = to_model
+        self.notes_dir = notes_dir
+        self.shadow_rate = shadow_rate
+        self.collection = model_collection_name(to_model)
+        self.state = "building"
+        self.error: str | None = None
+        self.build_s: float | None = None
+        self.vector_count: int | None = None
+        self.embed_dim: int | None = None
+        self.shadow: ShadowIndex | None = None
+        self.caught_up = 0
+        self._index: Any = None
+        self._scan: dict = {}
+        self._lock = threading.Lock()
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-migration")
+
+    def start(self) -> Future:
+        return self._builder.submit(self._build)
+
+    def _build(self) -> None:
+        from src.watcher import scan_notes
+
+        started = time.perf_counter()
+        try:
+            # Taken before the notes are read, so anything edited during the build is caught up.
+            self._scan = scan_notes(self.notes_dir)
+            info = build_model_collection(self.chroma_dir, self.to_model, notes_dir=self.notes_dir)
+            self._index = info["index"]
+            self._catch_up()
+        except Exception as exc:
+            self.state, self.error = "failed", f"{type(exc).__name__}: {exc}"
+            self.handle.metrics.increment("migration.errors")
+            raise
+        self.build_s = time.perf_counter() - started
+        self.vector_count, self.embed_dim = info["vector_count"], info.get("embed_dim")
+        self.handle.metrics.histogram("migration.build_s").observe(self.build_s)
+        with self._lock:
+            if self.shadow_rate > 0:
+                self.shadow = ShadowIndex(
+                    self.handle.index, self._index, sample_rate=self.shadow_rate, metrics=self.handle.metrics
+                )
+                self.handle.swap(self.shadow, source=f"{self.chroma_dir}#{self.collection} (shadow)")
+                self.state = "shadowing"
+            else:
+                self.state = "ready"
+
+    def _catch_up(self) -> int:
+        """Re-index notes changed since the last scan into the new collection; returns how many."""
+
+        from src.watcher import delete_note, diff_snapshots, scan_notes, upsert_note
+
+        current = scan_notes(self.notes_dir)
+        upserted, deleted = diff_snapshots(self._scan, current)
+        chunking = (read_index_manifest(self.chroma_dir) or {}).get("chunking")
+        for path in upserted:
+            upsert_note(self._index, path, chunking)
+        for path in deleted:
+            delete_note(self._index, path)
+        self._scan = current
+        self.caught_up += len(upserted) + len(deleted)
+        return len(upserted) + len(deleted)
+
+    def cutover(self):
+        """Activate the new collection on disk and swap it in; returns the new ``IndexVersion``."""
+
+        with self._lock:
+            if self.state not in ("ready", "shadowing"):
+                raise RuntimeError(f"Cannot cut over a migration that is {self.state}.")
+            self._catch_up()
+            cutover_collection(self.chroma_dir, self.to_model)
+            version = self.handle.swap(self._index, source=f"{self.chroma_dir}#{self.collection}")
+            # A watcher write that landed on the old collection between the scan and the swap is
+            # still a changed file, so a second pass after the swap picks it up.
+            self._catch_up()
+            self.state = "cut_over"
+            if self.shadow is not None:
+                self.shadow.close(wait=False)
+        self.handle.metrics.increment("migration.cutovers")
+        return version
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "from_model": self.from_model,
+            "to_model": self.to_model,
+            "collection": self.collection,
+            "chroma_dir": str(self.chroma_dir),
+            "vector_count": self.vector_count,
+            "embed_dim": self.embed_dim,
+            "build_s": self.build_s,
+            "caught_up": self.caught_up,
+            "error": self.error,
+            "shadow": self.shadow.summary() if self.shadow else None,
+        }
+
+
+def compare_models(
+    chroma_dir: Path | str,
+    from_model: str,
+    to_model: str,
+    queries: Sequence[str],
+    top_k: int,
+) -> dict[str, Any]:
+    """Shadow-query both collections with ``queries`` and report overlap and latency."""
+
+    from src.retrieval import load_persisted_index
+
+    primary, candidate = (
+        load_persisted_index(chroma_dir, model, collection_name=collection_for_model(chroma_dir, model))
+        for model in (from_model, to_model)
+    )
+    shadow = ShadowIndex(primary, candidate, sample_rate=1.0, max_pending=len(queries) + 1)
+    for query in queries:
+        shadow.retrieve_chunks(query, top_k)
+    shadow.close()
+    return shadow.summary()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.embed_migration", description=__doc__.splitlines()[0])
+    parser.add_argument("--chroma-dir", default=None)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="List collections with their embedding model and dimension.")
+    build_parser = subparsers.add_parser("build", help="Embed the notes into the new model's collection.")
+    build_parser.add_argument("--to", required=True, help="Target embedding model.")
+    build_parser.add_argument("--notes-dir", default=None)
+    compare_parser = subparsers.add_parser("compare", help="Shadow-query both collections.")
+    compare_parser.add_argument("--to", required=True)
+    compare_parser.add_argument("--from", dest="from_model", default=None, help="Defaults to the active model.")
+    compare_parser.add_argument("--golden", default="eval/golden_questions.jsonl")
+    compare_parser.add_argument("--k", type=int, default=None)
+    cutover_parser = subparsers.add_parser("cutover", help="Make the model's collection the active one.")
+    cutover_parser.add_argument("--to", required=True)
+    drop_parser = subparsers.add_parser("drop", help="Delete an inactive model's collection.")
+    drop_parser.add_argument("--model", required=True)
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+
+    chroma_dir = Path(args.chroma_dir or settings.chroma_dir)
+    if args.command == "status":
+        for row in list_model_collections(chroma_dir):
+            print(
+                f"{'*' if row['active'] else ' '} {row['collection']:<40} model={row['embed_model']} "
+                f"dim={row['embed_dim']} vectors={row['vector_count']}"
+            )
+        return 0
+    if args.command == "build":
+        started = time.perf_counter()
+        info = build_model_collection(chroma_dir, args.to, notes_dir=args.notes_dir or settings.raw_notes_dir)
+        print(
+            f"built '{info['collection_name']}' with {info['vector_count']} vectors (dim={info['embed_dim']}) "
+            f"in {time.perf_counter() - started:.2f}s; the active collection is unchanged"
+        )
+        return 0
+    if args.command == "compare":
+        from src.eval import load_golden_questions
+
+        manifest = read_index_manifest(chroma_dir) or {}
+        from_model = args.from_model or manifest.get("embed_model") or settings.embed_model
+        questions = [question.question for question in load_golden_questions(args.golden)]
+        summary = compare_models(chroma_dir, from_model, args.to, questions, args.k or int(settings.top_k))
+        print(f"{from_model} (live) vs {args.to} (candidate) on {len(questions)} golden questions:")
+        for key, value in summary.items():
+            print(f"  {key}: {value}")
+        return 0
+    if args.command == "cutover":
+        manifest = cutover_collection(chroma_dir, args.to)
+        print(
+            f"active collection is now '{manifest['collection']}' ({args.to}); previous "
+            f"'{manifest['previous_collection']}' is kept for rollback. Set EMBED_MODEL={args.to} and restart, "
+            f'or POST /reload with {{"embed_model": "{args.to}"}}.'
+        )
+        return 0
+
+    import chromadb
+
+    collection_name = collection_for_model(chroma_dir, args.model)
+    if collection_name == active_collection_name(chroma_dir):
+        raise SystemExit(f"'{collection_name}' is the active collection; cut over to another model first.")
+    chromadb.PersistentClient(path=str(chroma_dir)).delete_collection(collection_name)
+    print(f"dropped '{collection_name}'")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
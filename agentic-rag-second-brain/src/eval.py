@@ -6,15 +6,20 @@ import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any
-
-import pandas as pd
+from typing import TYPE_CHECKING, Any
 
+from src.adaptive_k import AdaptiveKConfig
 from src.config import settings
+from src.diversify import DiversifyConfig
 from src.graph import build_agentic_rag_graph, run_agentic_rag
-from src.ingestion import chunk_documents, load_markdown_documents
+from src.index_store import read_chunk_metadata
+from src.node_llm import NodeLLMConfig
+from src.pricing import estimate_cost_usd
 from src.rag_baseline import baseline_rag_answer
-from src.retrieval import load_persisted_index
+from src.retrieval import clear_query_embedding_cache, load_persisted_index
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 @dataclass(frozen=True)
@@ -52,15 +57,13 @@ def _parse_date(date_text: str) -> datetime | None:
         return None
 
 
-def build_chunk_catalog(raw_notes_dir: str | Path) -> tuple[dict[str, dict[str, Any]], dict[str, set[str]]]:
-    docs = load_markdown_documents(raw_notes_dir)
-    nodes = chunk_documents(docs)
+def build_chunk_catalog(chroma_dir: str | Path) -> tuple[dict[str, dict[str, Any]], dict[str, set[str]]]:
+    """Build the chunk catalog from the persisted index so it matches what retrieval sees."""
 
     chunk_by_id: dict[str, dict[str, Any]] = {}
     topic_chunks: dict[str, set[str]] = {}
 
-    for node in nodes:
-        metadata = dict(getattr(node, "metadata", {}))
+    for metadata in read_chunk_metadata(chroma_dir):
         chunk_id = metadata.get("chunk_id", "")
         if not chunk_id:
             continue
@@ -114,6 +117,8 @@ def _score_run(
     retrieved_chunks: list[dict[str, Any]],
     latency_s: float,
     retries: int,
+    node_latency_s: dict[str, float] | None = None,
+    llm_usage: list[dict[str, Any]] | None = None,
     chunk_by_id: dict[str, dict[str, Any]],
     topic_chunks: dict[str, set[str]],
     newest_window_days: int,
@@ -152,6 +157,10 @@ def _score_run(
         "retrieved_chunks": retrieved_chunks,
         "latency_s": latency_s,
         "retries": retries,
+        "node_latency_s": dict(node_latency_s or {}),
+        "prompt_tokens": sum(record["prompt_tokens"] for record in llm_usage or []),
+        "completion_tokens": sum(record["completion_tokens"] for record in llm_usage or []),
+        "cost_usd": estimate_cost_usd(llm_usage or []),
         "citation_present": citation_present,
         "citation_valid": citation_valid,
         "recency_correct": recency_correct,
@@ -173,15 +182,23 @@ def run_eval(
     evidence_min_recent_chunks: int = 1,
     use_llm_grader: bool = False,
     newest_window_days: int = 60,
+    diversify: DiversifyConfig | None = None,
+    adaptive_k: AdaptiveKConfig | None = None,
+    node_llm: dict[str, NodeLLMConfig] | None = None,
+    speculative_generation: bool = False,
+    multi_query: bool = False,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    import pandas as pd
+
     questions = load_golden_questions(golden_path)
 
+    chroma_path = Path(chroma_dir or settings.chroma_dir)
     index = load_persisted_index(
-        chroma_dir=Path(chroma_dir or settings.chroma_dir),
+        chroma_dir=chroma_path,
         embed_model=embed_model or settings.embed_model,
     )
 
-    chunk_by_id, topic_chunks = build_chunk_catalog(settings.raw_notes_dir)
+    chunk_by_id, topic_chunks = build_chunk_catalog(chroma_path)
 
     graph = build_agentic_rag_graph(
         index=index,
@@ -193,12 +210,21 @@ def run_eval(
         recency_days=recency_days,
         evidence_min_recent_chunks=evidence_min_recent_chunks,
         use_llm_grader=use_llm_grader,
+        raw_notes_dir=settings.raw_notes_dir,
+        diversify=diversify,
+        adaptive_k=adaptive_k,
+        node_llm=node_llm,
+        speculative_generation=speculative_generation,
+        multi_query=multi_query,
     )
 
     baseline_rows: list[dict[str, Any]] = []
     agentic_rows: list[dict[str, Any]] = []
 
     for q in questions:
+        # Each pipeline pays for its own query embedding; otherwise the agentic run would reuse the
+        # one the baseline just cached and look faster than it is.
+        clear_query_embedding_cache()
         t0 = time.perf_counter()
         base = baseline_rag_answer(
             index=index,
@@ -207,6 +233,8 @@ def run_eval(
             model=openai_model or settings.openai_model,
             temperature=temperature,
             max_context_chars=max_context_chars,
+            diversify=diversify,
+            adaptive_k=adaptive_k,
         )
         base_latency = time.perf_counter() - t0
         baseline_rows.append(
@@ -217,12 +245,15 @@ def run_eval(
                 retrieved_chunks=base.get("retrieved_chunks", []),
                 latency_s=base_latency,
                 retries=0,
+                node_latency_s=base.get("node_latency_s"),
+                llm_usage=base.get("llm_usage"),
                 chunk_by_id=chunk_by_id,
                 topic_chunks=topic_chunks,
                 newest_window_days=newest_window_days,
             )
         )
 
+        clear_query_embedding_cache()
         t1 = time.perf_counter()
         agentic_state = run_agentic_rag(graph, q.question)
         agentic_latency = time.perf_counter() - t1
@@ -235,6 +266,8 @@ def run_eval(
                 retrieved_chunks=agentic_state.get("retrieved_chunks", []),
                 latency_s=agentic_latency,
                 retries=int(agentic_state.get("retry_count", 0) or 0),
+                node_latency_s=agentic_state.get("node_latency_s"),
+                llm_usage=agentic_state.get("llm_usage"),
                 chunk_by_id=chunk_by_id,
                 topic_chunks=topic_chunks,
                 newest_window_days=newest_window_days,
@@ -260,8 +293,12 @@ def run_eval(
 
 
 def build_comparison_report(baseline_df: pd.DataFrame, agentic_df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
+
     def summarize(df: pd.DataFrame, scope_name: str, mask: pd.Series | None = None) -> dict[str, Any]:
         scoped = df if mask is None else df[mask]
+        latency = scoped["latency_s"]
+        cost = scoped["cost_usd"]
         return {
             "scope": scope_name,
             "citation_present_rate": float(scoped["citation_present"].mean()) if len(scoped) else 0.0,
@@ -270,7 +307,13 @@ def build_comparison_report(baseline_df: pd.DataFrame, agentic_df: pd.DataFrame)
             if scoped["recency_correct"].notna().any()
             else None,
             "avg_retries": float(scoped["retries"].mean()) if len(scoped) else 0.0,
-            "avg_latency_s": float(scoped["latency_s"].mean()) if len(scoped) else 0.0,
+            "avg_latency_s": float(latency.mean()) if len(scoped) else 0.0,
+            "p50_latency_s": float(latency.quantile(0.50)) if len(scoped) else 0.0,
+            "p95_latency_s": float(latency.quantile(0.95)) if len(scoped) else 0.0,
+            "p99_latency_s": float(latency.quantile(0.99)) if len(scoped) else 0.0,
+            "avg_prompt_tokens": float(scoped["prompt_tokens"].mean()) if len(scoped) else 0.0,
+            "avg_completion_tokens": float(scoped["completion_tokens"].mean()) if len(scoped) else 0.0,
+            "avg_cost_usd": float(cost.mean()) if cost.notna().all() and len(cost) else None,
             "num_questions": int(len(scoped)),
         }
 
@@ -293,12 +336,175 @@ def build_comparison_report(baseline_df: pd.DataFrame, agentic_df: pd.DataFrame)
             "recency_correct_rate",
             "avg_retries",
             "avg_latency_s",
+            "p50_latency_s",
+            "p95_latency_s",
+            "p99_latency_s",
+            "avg_prompt_tokens",
+            "avg_completion_tokens",
+            "avg_cost_usd",
         ]
     ]
 
 
+def build_node_latency_report(baseline_df: pd.DataFrame, agentic_df: pd.DataFrame) -> pd.DataFrame:
+    """Per pipeline and node: mean and p50/p95/p99 wall time per question (retries summed)."""
+
+    import pandas as pd
+
+    rows = []
+    for df in [baseline_df, agentic_df]:
+        if "node_latency_s" not in df:
+            continue
+        per_node = pd.DataFrame(list(df["node_latency_s"])).fillna(0.0)
+        for node in per_node.columns:
+            values = per_node[node]
+            rows.append(
+                {
+                    "pipeline": str(df["pipeline"].iloc[0]),
+                    "node": node,
+                    "mean_s": float(values.mean()),
+                    "p50_s": float(values.quantile(0.50)),
+                    "p95_s": float(values.quantile(0.95)),
+                    "p99_s": float(values.quantile(0.99)),
+                }
+            )
+    return pd.DataFrame(rows, columns=["pipeline", "node", "mean_s", "p50_s", "p95_s", "p99_s"])
+
+
+HIGHER_IS_BETTER = ("citation_present_rate", "citation_valid_rate", "recency_correct_rate")
+LOWER_IS_BETTER = (
+    "p50_latency_s",
+    "p95_latency_s",
+    "p99_latency_s",
+    "avg_prompt_tokens",
+    "avg_completion_tokens",
+    "avg_cost_usd",
+)
+NODE_LATENCY_METRICS = ("p50_s", "p95_s", "p99_s")
+
+
+def regression_metrics(report_df: pd.DataFrame, node_df: pd.DataFrame | None = None) -> dict[str, float]:
+    """Flatten the gated metrics into ``{"pipeline/scope/metric": value}``."""
+
+    metrics: dict[str, float] = {}
+    for row in report_df.to_dict("records"):
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            value = row.get(metric)
+            if value is not None and value == value:
+                metrics[f"{row['pipeline']}/{row['scope']}/{metric}"] = float(value)
+    for row in (node_df.to_dict("records") if node_df is not None else []):
+        for metric in NODE_LATENCY_METRICS:
+            metrics[f"{row['pipeline']}/node:{row['node']}/{metric}"] = float(row[metric])
+    return metrics
+
+
+def save_baseline_report(
+    report_df: pd.DataFrame,
+    node_df: pd.DataFrame | None,
+    path: str | Path,
+) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "metrics": regression_metrics(report_df, node_df),
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return path
+
+
+def check_regressions(
+    report_df: pd.DataFrame,
+    node_df: pd.DataFrame | None,
+    baseline_path: str | Path,
+    *,
+    tolerance: float = 0.10,
+    latency_slack_s: float = 0.05,
+) -> list[str]:
+    """Compare against a stored baseline report; returns one message per degraded metric.
+
+    Lower-is-better metrics fail above ``baseline * (1 + tolerance)`` (plus ``latency_slack_s`` for
+    latencies, so millisecond jitter does not fail the gate); rates fail below
+    ``baseline * (1 - tolerance)``. Metrics missing from either side are skipped.
+    """
+
+    stored = json.loads(Path(baseline_path).read_text(encoding="utf-8"))["metrics"]
+    current = regression_metrics(report_df, node_df)
+    failures = []
+    for key, value in sorted(current.items()):
+        if key not in stored:
+            continue
+        reference = stored[key]
+        metric = key.rsplit("/", 1)[-1]
+        if metric in HIGHER_IS_BETTER:
+            limit = reference * (1 - tolerance)
+            failed = value < limit
+        else:
+            limit = reference * (1 + tolerance)
+            if metric.endswith("_s"):
+                limit += latency_slack_s
+            failed = value > limit
+        if failed:
+            failures.append(f"{key}: {value:.4g} vs baseline {reference:.4g} (limit {limit:.4g})")
+    return failures
+
+
 def top_failures(df: pd.DataFrame, n: int = 3) -> pd.DataFrame:
     scored = df.copy()
     scored["num_failed_checks"] = scored["checks_failed"].map(len)
     ranked = scored.sort_values(["num_failed_checks", "latency_s"], ascending=[False, False])
     return ranked.head(n)
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.eval",
+        description="Run the golden-set eval and gate latency, token and cost regressions.",
+    )
+    parser.add_argument("--golden", default="eval/golden_questions.jsonl")
+    parser.add_argument("--chroma-dir", default=None, help="Persisted Chroma directory (defaults to CHROMA_DIR).")
+    parser.add_argument("--top-k", type=int, default=int(settings.top_k))
+    parser.add_argument("--use-llm-grader", action="store_true")
+    parser.add_argument("--baseline-report", default=settings.eval_baseline_report)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=float(settings.eval_regression_tolerance))
+    parser.add_argument("--latency-slack-s", type=float, default=float(settings.eval_latency_slack_s))
+    args = parser.parse_args(argv)
+
+    baseline_df, agentic_df = run_eval(
+        golden_path=args.golden,
+        chroma_dir=args.chroma_dir,
+        top_k=args.top_k,
+        use_llm_grader=args.use_llm_grader,
+    )
+    report_df = build_comparison_report(baseline_df, agentic_df)
+    node_df = build_node_latency_report(baseline_df, agentic_df)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report_df.to_string(index=False))
+        print()
+        print(node_df.to_string(index=False))
+
+    baseline_path = Path(args.baseline_report)
+    if args.update_baseline or not baseline_path.exists():
+        save_baseline_report(report_df, node_df, baseline_path)
+        print(f"\nStored baseline report at {baseline_path}")
+        return 0
+
+    failures = check_regressions(
+        report_df, node_df, baseline_path, tolerance=args.tolerance, latency_slack_s=args.latency_slack_s
+    )
+    if failures:
+        print(f"\n{len(failures)} regression(s) against {baseline_path}:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"\nNo regressions against {baseline_path} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import json
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import pandas as pd
-from openai import OpenAI
+if TYPE_CHECKING:
+    import pandas as pd
 
 RUBRIC = """You are grading answer helpfulness for an internal notes QA task.
 Return strict JSON with keys:
@@ -18,7 +18,9 @@ Rubric:
 
 
 def judge_answer(question: str, answer: str, model: str = "gpt-4o-mini") -> dict[str, Any]:
-    client = OpenAI()
+    from src.rate_limit import openai_client
+
+    client = openai_client()
     response = client.chat.completions.create(
         model=model,
         temperature=0,
@@ -33,6 +35,8 @@ def judge_answer(question: str, answer: str, model: str = "gpt-4o-mini") -> dict
 
 
 def llm_judge_dataframe(df: pd.DataFrame, model: str = "gpt-4o-mini") -> pd.DataFrame:
+    import pandas as pd
+
     rows = []
     for _, row in df.iterrows():
         verdict = judge_answer(question=str(row["question"]), answer=str(row["answer"]), model=model)
@@ -0,0 +1,312 @@
+"""Deterministic OpenAI-compatible stand-in for local runs, tests and load experiments.
+
+Implements ``POST /v1/embeddings`` and ``POST /v1/chat/completions`` well enough for the code in
+this project: embeddings are hashed bag-of-words vectors (so similar texts land close together),
+and chat responses satisfy the JSON schemas in ``src/prompts.py`` by citing chunks found in the
+prompt context (cut short with ``finish_reason="length"`` when they exceed ``max_tokens``). Point
+the OpenAI SDK at it with ``OPENAI_BASE_URL=http://127.0.0.1:<port>/v1``.
+
+For load experiments the backend can inject latency (a fixed delay per endpoint with optional
+log-normal jitter that keeps the mean) and fail a fraction of requests with an HTTP error status.
+
+    python -m src.fake_openai --port 8010
+    python -m src.fake_openai --port 8010 --chat-latency-ms 400 --embed-latency-ms 40 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+from typing import Any
+
+from src.http_server import HttpError, HttpRequest, start_json_server
+
+DEFAULT_EMBED_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+FALLBACK_EMBED_DIM = 1536
+
+CONTEXT_LINE_RE = re.compile(
+    r"doc_title=(?P<doc_title>.*?) \| doc_date=(?P<doc_date>\S*) \| chunk_id=(?P<chunk_id>\S+) "
+    r"\| source_path=(?P<source_path>\S*)"
+)
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_-]+")
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    """Hash each lowercase token into a signed bucket and L2-normalize."""
+
+    vector = [0.0] * dim
+    for token in TOKEN_RE.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return [value / norm for value in vector]
+
+
+def _citations_from_prompt(prompt: str, limit: int = 2) -> list[dict[str, str]]:
+    seen: dict[str, dict[str, str]] = {}
+    for match in CONTEXT_LINE_RE.finditer(prompt):
+        seen.setdefault(match.group("chunk_id"), match.groupdict())
+    ranked = sorted(seen.values(), key=lambda row: row["doc_date"], reverse=True)
+    return ranked[:limit]
+
+
+def fake_chat_content(body: dict[str, Any]) -> str:
+    messages = body.get("messages") or []
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    user_prompt = str(messages[-1].get("content", "")) if messages else ""
+    response_format = body.get("response_format") or {}
+    schema_name = (response_format.get("json_schema") or {}).get("name")
+
+    if schema_name == "evidence_grade":
+        return json.dumps(
+            {"evidence_ok": True, "confidence": "high", "rewrite_hint": "", "rationale": "fake grader"}
+        )
+    if schema_name in {"baseline_rag_response", "agentic_rag_response"}:
+        citations = _citations_from_prompt(prompt)
+        if citations:
+            newest = citations[0]
+            answer = f"According to '{newest['doc_title']}' ({newest['doc_date']}), see the cited notes."
+        else:
+            answer = "The provided context does not contain enough information."
+        if schema_name == "baseline_rag_response":
+            return json.dumps({"answer": answer, "citations": citations, "notes": ""})
+        return json.dumps(
+            {"answer": answer, "citations": citations, "confidence": "high", "next_step": ""}
+        )
+    if response_format.get("type") == "json_object":
+        return json.dumps({"score": 3, "rationale": "fake judge"})
+
+    query = user_prompt.split("Original user query:", 1)[-1].strip()
+    return f"{query} Prefer latest notes by date."
+
+
+class FakeOpenAIBackend:
+    """Request handler implementing the OpenAI endpoints this project uses."""
+
+    def __init__(
+        self,
+        embed_dim: int | None = None,
+        *,
+        chat_latency_s: float = 0.0,
+        embed_latency_s: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int | None = None,
+    ):
+        self.embed_dim = embed_dim
+        self.chat_latency_s = chat_latency_s
+        self.embed_latency_s = embed_latency_s
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self.request_counts: dict[str, int] = {}
+        self.injected_errors = 0
+
+    def _count(self, path: str) -> None:
+        self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    async def _inject_faults(self, latency_s: float) -> None:
+        if latency_s > 0:
+            if self.latency_jitter > 0:
+                sigma = self.latency_jitter
+                latency_s *= math.exp(self._random.gauss(0.0, sigma) - sigma * sigma / 2)
+            await asyncio.sleep(latency_s)
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            self.injected_errors += 1
+            raise HttpError(self.error_status, "Injected fault from the fake OpenAI backend.")
+
+    def _embeddings(self, body: dict[str, Any]) -> dict[str, Any]:
+        model = str(body.get("model", "text-embedding-3-small"))
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = int(body.get("dimensions") or self.embed_dim or DEFAULT_EMBED_DIMS.get(model, FALLBACK_EMBED_DIM))
+        encode_base64 = body.get("encoding_format") == "base64"
+
+        data = []
+        for position, text in enumerate(inputs):
+            vector = fake_embedding(str(text), dim)
+            if encode_base64:
+                embedding: Any = base64.b64encode(struct.pack(f"<{dim}f", *vector)).decode("ascii")
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": position, "embedding": embedding})
+
+        prompt_tokens = sum(_approx_tokens(str(text)) for text in inputs)
+        return {
+            "object": "list",
+            "model": model,
+            "data": data,
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    def _chat(self, body: dict[str, Any]) -> dict[str, Any]:
+        content = fake_chat_content(body)
+        finish_reason = "stop"
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        if max_tokens and _approx_tokens(content) > int(max_tokens):
+            # Cut the output like the API does at the cap, so truncation handling can be exercised.
+            content, finish_reason = content[: int(max_tokens) * 4], "length"
+        prompt_tokens = sum(_approx_tokens(str(m.get("content", ""))) for m in body.get("messages") or [])
+        completion_tokens = _approx_tokens(content)
+        return {
+            "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": str(body.get("model", "fake")),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    async def handle(self, request: HttpRequest) -> tuple[int, Any]:
+        path = request.path.rstrip("/")
+        self._count(path)
+        if request.method != "POST":
+            raise HttpError(405, f"{request.method} not supported on {path}")
+        if path.endswith("/embeddings"):
+            await self._inject_faults(self.embed_latency_s)
+            return 200, self._embeddings(request.json())
+        if path.endswith("/chat/completions"):
+            await self._inject_faults(self.chat_latency_s)
+            return 200, self._chat(request.json())
+        raise HttpError(404, f"Unknown endpoint: {path}")
+
+
+class FakeOpenAIServer:
+    """Run the fake backend on a background event loop thread (for synchronous callers)."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, backend: FakeOpenAIBackend | None = None):
+        self.host = host
+        self.port = port
+        self.backend = backend or FakeOpenAIBackend()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> str:
+        """Start serving and return the base URL; a failure to bind is raised here."""
+
+        ready = threading.Event()
+        failure: list[BaseException] = []
+
+        def _run() -> None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                self._server = loop.run_until_complete(
+                    start_json_server(self.backend.handle, self.host, self.port)
+                )
+                self.port = self._server.sockets[0].getsockname()[1]
+                self._loop = loop
+            except BaseException as exc:
+                failure.append(exc)
+                loop.close()
+                return
+            finally:
+                ready.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, name="fake-openai", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failure:
+            self._thread.join()
+            self._thread = None
+            raise failure[0]
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._loop is None or self._server is None:
+            return
+
+        async def _shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(_shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.fake_openai", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--embed-dim", type=int, default=None)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Log-normal sigma (0 = fixed).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail.")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    async def _serve() -> None:
+        backend = FakeOpenAIBackend(
+            embed_dim=args.embed_dim,
+            chat_latency_s=args.chat_latency_ms / 1000,
+            embed_latency_s=args.embed_latency_ms / 1000,
+            latency_jitter=args.latency_jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            seed=args.seed,
+        )
+        server = await start_json_server(backend.handle, args.host, args.port)
+        print(f"fake OpenAI listening on http://{args.host}:{args.port}/v1", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
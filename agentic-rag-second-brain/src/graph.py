@@ -2,13 +2,16 @@ from __future__ import annotations
 
 import json
 import re
-from datetime import datetime
+import time
 from pathlib import Path
 from typing import Any, Literal, TypedDict
 
-from langgraph.graph import END, START, StateGraph
-from openai import OpenAI
-
+from src.adaptive_k import AdaptiveKConfig
+from src.diversify import DiversifyConfig
+from src.index_handle import IndexHandle, IndexVersion
+from src.node_llm import NodeLLMConfig, resolve_node_llm
+from src.pricing import usage_record
+from src.profiling import profiled
 from src.prompts import (
     AGENTIC_GENERATION_JSON_SCHEMA,
     AGENTIC_GENERATION_SYSTEM_PROMPT,
@@ -20,29 +23,33 @@ from src.prompts import (
     RECENCY_REWRITE_USER_PROMPT_TEMPLATE,
 )
 from src.rag_baseline import build_context
-from src.retrieval import retrieve_chunks
+from src.recency import RECENCY_HINT_TOKENS, latest_doc_date_from_chunks, parse_doc_date
+from src.records import ChunkRecord, TraceEvent
+from src.retrieval import (
+    aretrieve_candidates,
+    aretrieve_chunks,
+    candidate_count,
+    retrieve_candidates,
+    retrieve_chunks,
+    select_fused_chunks,
+)
 
 
 class AgenticRagState(TypedDict):
     user_query: str
     rewritten_query: str
-    retrieved_chunks: list[dict[str, Any]]
+    retrieved_chunks: list[ChunkRecord]
     evidence_ok: bool
     confidence: Literal["high", "medium", "low"]
     retry_count: int
-    decision_trace: list[str]
+    decision_trace: list[TraceEvent]
     final_answer: dict[str, Any]
+    node_latency_s: dict[str, float]
+    speculative_content: str | None
+    llm_usage: list[dict[str, Any]]
+    index_version: int
 
 
-RECENCY_HINT_TOKENS = (
-    "current",
-    "latest",
-    "most recent",
-    "best",
-    "should we use",
-    "recommended",
-    "recommendation",
-)
 STOPWORDS = {
     "what",
     "which",
@@ -68,37 +75,6 @@ STOPWORDS = {
 }
 
 
-def _parse_date(value: str) -> datetime | None:
-    try:
-        return datetime.strptime(value, "%Y-%m-%d")
-    except (TypeError, ValueError):
-        return None
-
-
-def _latest_doc_date_from_chunks(chunks: list[dict[str, Any]]) -> datetime | None:
-    dates = [_parse_date(chunk.get("doc_date", "")) for chunk in chunks]
-    valid = [date for date in dates if date is not None]
-    return max(valid) if valid else None
-
-
-def _latest_doc_date_from_corpus(raw_notes_dir: Path | str) -> datetime | None:
-    notes_path = Path(raw_notes_dir)
-    if not notes_path.exists():
-        return None
-
-    latest: datetime | None = None
-    for note_file in notes_path.glob("*.md"):
-        match = re.match(r"(\d{4}-\d{2}-\d{2})-", note_file.name)
-        if not match:
-            continue
-        maybe_date = _parse_date(match.group(1))
-        if maybe_date is None:
-            continue
-        if latest is None or maybe_date > latest:
-            latest = maybe_date
-    return latest
-
-
 def _extract_topic_keywords(query: str) -> set[str]:
     tokens = re.findall(r"[a-zA-Z0-9_-]+", query.lower())
     return {token for token in tokens if len(token) > 2 and token not in STOPWORDS}
@@ -127,6 +103,31 @@ def _contains_conflict_signals(chunks: list[dict[str, Any]]) -> bool:
     return len(model_mentions) > 1
 
 
+def _async_client_factory():
+    """Return a getter for one ``AsyncOpenAI`` client per running event loop.
+
+    The async HTTP pool is bound to the loop that created it, so notebooks calling
+    ``asyncio.run(arun_agentic_rag(...))`` repeatedly each get a fresh client.
+    """
+
+    import asyncio
+    import weakref
+
+    clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def get_client():
+        from src.rate_limit import async_openai_client
+
+        loop = asyncio.get_running_loop()
+        client = clients.get(loop)
+        if client is None:
+            client = async_openai_client()
+            clients[loop] = client
+        return client
+
+    return get_client
+
+
 def build_agentic_rag_graph(
     index,
     *,
@@ -139,54 +140,207 @@ def build_agentic_rag_graph(
     evidence_min_recent_chunks: int,
     use_llm_grader: bool,
     raw_notes_dir: Path | str,
+    diversify: DiversifyConfig | None = None,
+    adaptive_k: AdaptiveKConfig | None = None,
+    node_llm: dict[str, NodeLLMConfig] | None = None,
+    speculative_generation: bool = False,
+    multi_query: bool = False,
+    rrf_k: int = 60,
 ):
-    client = OpenAI()
-    latest_corpus_doc_date = _latest_doc_date_from_corpus(raw_notes_dir=raw_notes_dir)
-
-    def rewrite_with_recency_intent(state: AgenticRagState) -> AgenticRagState:
-        user_query = state["user_query"]
+    """Compile the agentic RAG graph.
+
+    Every node has a sync and an async implementation, so the compiled graph supports both
+    ``run_agentic_rag`` (``graph.invoke``) and ``arun_agentic_rag`` (``graph.ainvoke``).
+    ``node_llm`` overrides the chat settings of the ``rewrite``, ``grade`` and ``generate`` steps
+    (see ``src/node_llm.py``). Wall time per node, summed over retries, is returned in
+    ``node_latency_s``, and token usage per chat call in ``llm_usage``.
+
+    With ``speculative_generation`` and the LLM grader, generation starts alongside grading, using
+    the heuristic grade's confidence. The speculative answer is committed when grading neither
+    requests a retry nor changes the confidence, and discarded otherwise (its usage is still
+    recorded, as ``generate_speculative``); ``speculate:`` trace entries record hits and misses.
+
+    With ``multi_query``, the first pass is a single ``fanout_retrieve`` node: it retrieves for the
+    raw query and its keyword variant while the rewrite is in flight, then for the rewritten query,
+    and merges the lists with reciprocal rank fusion. Retries use ``retrieve``.
+
+    ``index`` may be an ``IndexHandle`` (see ``src/index_handle.py``). Each query pins the version
+    current when its first node starts, so a swap only affects queries that start afterwards; the pinned
+    number is returned in ``index_version``. A bare index is wrapped in a handle of its own.
+    """
+
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import END, START, StateGraph
+    from src.rate_limit import openai_client
+
+    client = openai_client()
+    get_async_client = _async_client_factory()
+    handle = index if isinstance(index, IndexHandle) else IndexHandle(index, raw_notes_dir=raw_notes_dir)
+    llm = resolve_node_llm(openai_model, temperature, node_llm)
+    speculate = speculative_generation and use_llm_grader
+    pool = None
+    if speculate or multi_query:
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Background work for the sync graph; the async graph uses tasks on the event loop.
+        pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agentic-rag")
+
+    def _pinned(state: AgenticRagState) -> IndexVersion:
+        # State holds only the version number; the handle keeps pinned versions alive until release.
+        if not state["index_version"]:
+            state["index_version"] = handle.pin().version
+        return handle.resolve(state["index_version"])
+
+    def _response_content(state: AgenticRagState, node: str, response, default: str) -> str:
+        state.setdefault("llm_usage", []).append(usage_record(node, response))
+        return response.choices[0].message.content or default
+
+    def _rewrite_request(user_query: str) -> dict[str, Any] | None:
         should_force_recency = any(token in user_query.lower() for token in RECENCY_HINT_TOKENS)
+        if not should_force_recency:
+            return None
+        return {
+            **llm["rewrite"].request_kwargs(),
+            "messages": [
+                {"role": "system", "content": RECENCY_REWRITE_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": RECENCY_REWRITE_USER_PROMPT_TEMPLATE.format(query=user_query),
+                },
+            ],
+        }
 
+    def _apply_rewrite(state: AgenticRagState, content: str | None) -> AgenticRagState:
+        user_query = state["user_query"]
         rewritten_query = user_query
-        if should_force_recency:
-            response = client.chat.completions.create(
-                model=openai_model,
-                temperature=0,
-                messages=[
-                    {"role": "system", "content": RECENCY_REWRITE_SYSTEM_PROMPT},
-                    {
-                        "role": "user",
-                        "content": RECENCY_REWRITE_USER_PROMPT_TEMPLATE.format(query=user_query),
-                    },
-                ],
-            )
-            rewritten_query = (response.choices[0].message.content or "").strip() or user_query
+        if content is not None:
+            rewritten_query = content.strip() or user_query
             if "latest notes by date" not in rewritten_query.lower():
                 rewritten_query = f"{rewritten_query}. Prefer latest notes by date."
 
         state["rewritten_query"] = rewritten_query
-        state["decision_trace"].append(f"rewrite: {rewritten_query}")
+        state["decision_trace"].append(TraceEvent("rewrite", rewritten_query))
         return state
 
-    def retrieve(state: AgenticRagState) -> AgenticRagState:
-        chunks = retrieve_chunks(index=index, query=state["rewritten_query"], top_k=top_k)
+    def rewrite_with_recency_intent(state: AgenticRagState) -> AgenticRagState:
+        request = _rewrite_request(state["user_query"])
+        content = None
+        if request is not None:
+            response = client.chat.completions.create(**request)
+            content = _response_content(state, "rewrite", response, "")
+        return _apply_rewrite(state, content)
+
+    async def arewrite_with_recency_intent(state: AgenticRagState) -> AgenticRagState:
+        request = _rewrite_request(state["user_query"])
+        content = None
+        if request is not None:
+            response = await get_async_client().chat.completions.create(**request)
+            content = _response_content(state, "rewrite", response, "")
+        return _apply_rewrite(state, content)
+
+    def _apply_retrieval(state: AgenticRagState, chunks: list[ChunkRecord]) -> AgenticRagState:
         state["retrieved_chunks"] = chunks
-        chunk_summary = [
-            f"{chunk.get('chunk_id', '?')}|{chunk.get('doc_date', '?')}|{chunk.get('doc_title', '')}"
-            for chunk in chunks
-        ]
-        state["decision_trace"].append("retrieve: " + ", ".join(chunk_summary))
+        if adaptive_k is not None and adaptive_k.enabled:
+            state["decision_trace"].append(
+                TraceEvent(
+                    "retrieve_k",
+                    f"k={len(chunks)} (adaptive {adaptive_k.mode}, "
+                    f"range {adaptive_k.min_k}-{adaptive_k.max_k}, default {top_k})",
+                )
+            )
+        state["decision_trace"].append(TraceEvent("retrieve", chunks=tuple(chunks)))
         return state
 
+    def retrieve(state: AgenticRagState) -> AgenticRagState:
+        chunks = retrieve_chunks(
+            index=_pinned(state).index,
+            query=state["rewritten_query"],
+            top_k=top_k,
+            diversify=diversify,
+            adaptive=adaptive_k,
+        )
+        return _apply_retrieval(state, chunks)
+
+    async def aretrieve(state: AgenticRagState) -> AgenticRagState:
+        chunks = await aretrieve_chunks(
+            index=_pinned(state).index,
+            query=state["rewritten_query"],
+            top_k=top_k,
+            diversify=diversify,
+            adaptive=adaptive_k,
+        )
+        return _apply_retrieval(state, chunks)
+
+    def _initial_queries(user_query: str) -> list[str]:
+        """The raw query plus its keyword-only variant; neither needs to wait for the rewrite."""
+
+        topic = _extract_topic_keywords(user_query)
+        tokens = re.findall(r"[a-zA-Z0-9_-]+", user_query.lower())
+        keywords = " ".join(dict.fromkeys(token for token in tokens if token in topic))
+        if keywords and keywords != user_query.strip().lower():
+            return [user_query, keywords]
+        return [user_query]
+
+    def _after_rewrite(state: AgenticRagState, searched: list[str]) -> list[str]:
+        rewritten = state["rewritten_query"]
+        return [rewritten] if rewritten.strip().lower() not in {q.strip().lower() for q in searched} else []
+
+    def _fuse(state: AgenticRagState, rankings: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+        state["decision_trace"].append(
+            TraceEvent(
+                "fanout",
+                f"fused {len(rankings)} queries with RRF (k={rrf_k}), "
+                f"{sum(len(ranking) for ranking in rankings)} candidates",
+            )
+        )
+        return select_fused_chunks(
+            _pinned(state).index,
+            state["rewritten_query"],
+            rankings,
+            top_k,
+            diversify=diversify,
+            adaptive=adaptive_k,
+            rrf_k=rrf_k,
+        )
+
+    def fanout_retrieve(state: AgenticRagState) -> AgenticRagState:
+        fetch_k = candidate_count(top_k, diversify, adaptive_k)
+        index = _pinned(state).index
+        queries = _initial_queries(state["user_query"])
+        early = [pool.submit(retrieve_candidates, index, query, fetch_k) for query in queries]
+        state = rewrite_with_recency_intent(state)
+        rankings = [retrieve_candidates(index, query, fetch_k) for query in _after_rewrite(state, queries)]
+        rankings = [future.result() for future in early] + rankings
+        return _apply_retrieval(state, _fuse(state, rankings))
+
+    async def afanout_retrieve(state: AgenticRagState) -> AgenticRagState:
+        import asyncio
+
+        fetch_k = candidate_count(top_k, diversify, adaptive_k)
+        index = _pinned(state).index
+        queries = _initial_queries(state["user_query"])
+        early = [asyncio.create_task(aretrieve_candidates(index, query, fetch_k)) for query in queries]
+        try:
+            state = await arewrite_with_recency_intent(state)
+        except BaseException:
+            for task in early:
+                task.cancel()
+            raise
+        late = [aretrieve_candidates(index, query, fetch_k) for query in _after_rewrite(state, queries)]
+        rankings = list(await asyncio.gather(*early, *late))
+        if diversify is not None and diversify.enabled:
+            return _apply_retrieval(state, await asyncio.to_thread(_fuse, state, rankings))
+        return _apply_retrieval(state, _fuse(state, rankings))
+
     def _heuristic_grade(state: AgenticRagState) -> tuple[bool, str, str]:
         chunks = state["retrieved_chunks"]
-        effective_latest = latest_corpus_doc_date or _latest_doc_date_from_chunks(chunks)
+        effective_latest = _pinned(state).latest_doc_date or latest_doc_date_from_chunks(chunks)
         if effective_latest is None:
             return False, "low", "No parseable doc_date found in corpus or retrieved chunks."
 
         recent_chunks = 0
         for chunk in chunks:
-            parsed = _parse_date(chunk.get("doc_date", ""))
+            parsed = parse_doc_date(chunk.get("doc_date", ""))
             if parsed is None:
                 continue
             age_days = (effective_latest - parsed).days
@@ -209,33 +363,52 @@ def build_agentic_rag_graph(
         )
         return evidence_ok, confidence, rationale
 
-    def grade_evidence(state: AgenticRagState) -> AgenticRagState:
-        if use_llm_grader:
-            chunks_text = "\n\n".join(
-                f"- score={chunk.get('score')} | doc_date={chunk.get('doc_date')} | "
-                f"doc_title={chunk.get('doc_title')} | chunk_id={chunk.get('chunk_id')}\n"
-                f"{chunk.get('text', '')[:350]}"
-                for chunk in state["retrieved_chunks"]
-            )
-            response = client.chat.completions.create(
-                model=openai_model,
-                temperature=0,
-                response_format={"type": "json_schema", "json_schema": EVIDENCE_GRADER_JSON_SCHEMA},
-                messages=[
-                    {"role": "system", "content": EVIDENCE_GRADER_SYSTEM_PROMPT},
-                    {
-                        "role": "user",
-                        "content": EVIDENCE_GRADER_USER_PROMPT_TEMPLATE.format(
-                            query=state["user_query"],
-                            rewritten_query=state["rewritten_query"],
-                            recency_days=recency_days,
-                            min_recent_chunks=evidence_min_recent_chunks,
-                            chunks=chunks_text,
-                        ),
-                    },
-                ],
-            )
-            parsed = json.loads(response.choices[0].message.content or "{}")
+    def _grader_request(state: AgenticRagState) -> dict[str, Any]:
+        chunks_text = "\n\n".join(
+            f"- score={chunk.get('score')} | doc_date={chunk.get('doc_date')} | "
+            f"doc_title={chunk.get('doc_title')} | chunk_id={chunk.get('chunk_id')}\n"
+            f"{chunk.get('text', '')[:350]}"
+            for chunk in state["retrieved_chunks"]
+        )
+        return {
+            **llm["grade"].request_kwargs(),
+            "response_format": {"type": "json_schema", "json_schema": EVIDENCE_GRADER_JSON_SCHEMA},
+            "messages": [
+                {"role": "system", "content": EVIDENCE_GRADER_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": EVIDENCE_GRADER_USER_PROMPT_TEMPLATE.format(
+                        query=state["user_query"],
+                        rewritten_query=state["rewritten_query"],
+                        recency_days=recency_days,
+                        min_recent_chunks=evidence_min_recent_chunks,
+                        chunks=chunks_text,
+                    ),
+                },
+            ],
+        }
+
+    def _parse_grade(state: AgenticRagState, content: str | None, response) -> dict[str, Any] | None:
+        """The grader's JSON verdict, or None (with a trace event) when it is truncated or unparseable."""
+
+        if content is None:
+            return None
+        problem = None
+        if response.choices[0].finish_reason == "length":
+            problem = "grader output hit GRADER_MAX_TOKENS"
+        else:
+            try:
+                parsed = json.loads(content or "{}")
+            except json.JSONDecodeError:
+                parsed = None
+            if isinstance(parsed, dict):
+                return parsed
+            problem = "grader output is not a JSON object"
+        state["decision_trace"].append(TraceEvent("grade_fallback", f"{problem}; using the heuristic grade"))
+        return None
+
+    def _apply_grade(state: AgenticRagState, parsed: dict[str, Any] | None) -> AgenticRagState:
+        if parsed is not None:
             state["evidence_ok"] = bool(parsed.get("evidence_ok", False))
             state["confidence"] = parsed.get("confidence", "low")
             rationale = parsed.get("rationale", "")
@@ -245,38 +418,138 @@ def build_agentic_rag_graph(
             state["confidence"] = confidence
 
         state["decision_trace"].append(
-            f"grade: evidence_ok={state['evidence_ok']}, confidence={state['confidence']} ({rationale})"
+            TraceEvent("grade", f"evidence_ok={state['evidence_ok']}, confidence={state['confidence']} ({rationale})")
         )
         return state
 
+    def _speculative_request(state: AgenticRagState) -> tuple[str, dict[str, Any]]:
+        predicted = _heuristic_grade(state)[1]
+        return predicted, _generation_request({**state, "confidence": predicted})
+
+    def _speculation_miss(state: AgenticRagState, predicted: str) -> str | None:
+        if not state["evidence_ok"] and state["retry_count"] < max_retries:
+            return "grade requested a retry"
+        if state["confidence"] != predicted:
+            # The answer was written for the predicted confidence (hedging, next_step); regenerate.
+            return f"speculated confidence {predicted}, graded {state['confidence']}"
+        return None
+
+    def _commit_speculation(state: AgenticRagState, content: str) -> AgenticRagState:
+        state["speculative_content"] = content
+        state["decision_trace"].append(TraceEvent("speculate", "hit, committing the speculative answer"))
+        return state
+
+    def _record_discarded(state: AgenticRagState, speculation) -> None:
+        """Record a discarded generation's usage under ``generate_speculative`` once it completes."""
+
+        usage = state.setdefault("llm_usage", [])
+
+        def record(done) -> None:
+            if not done.cancelled() and done.exception() is None:
+                usage.append(usage_record("generate_speculative", done.result()))
+
+        speculation.add_done_callback(record)
+
+    def _discard_speculation(state: AgenticRagState, reason: str) -> AgenticRagState:
+        state["speculative_content"] = None
+        state["decision_trace"].append(TraceEvent("speculate", f"miss ({reason}), speculative answer discarded"))
+        return state
+
+    def grade_evidence(state: AgenticRagState) -> AgenticRagState:
+        verdict = None
+        speculation = None
+        if use_llm_grader:
+            if speculate:
+                predicted, request = _speculative_request(state)
+                speculation = pool.submit(lambda: client.chat.completions.create(**request))
+            try:
+                response = client.chat.completions.create(**_grader_request(state))
+            except BaseException:
+                if speculation is not None:
+                    speculation.cancel()
+                raise
+            verdict = _parse_grade(state, _response_content(state, "grade", response, "{}"), response)
+        state = _apply_grade(state, verdict)
+        if speculation is None:
+            return state
+
+        miss = _speculation_miss(state, predicted)
+        if miss is not None:
+            # A request already in flight on the pool cannot be interrupted; its result is ignored.
+            speculation.cancel()
+            _record_discarded(state, speculation)
+            return _discard_speculation(state, miss)
+        try:
+            answer = _response_content(state, "generate", speculation.result(), "{}")
+        except Exception as exc:
+            return _discard_speculation(state, f"speculative generation failed: {type(exc).__name__}")
+        return _commit_speculation(state, answer)
+
+    async def agrade_evidence(state: AgenticRagState) -> AgenticRagState:
+        import asyncio
+
+        verdict = None
+        speculation = None
+        if use_llm_grader:
+            if speculate:
+                predicted, request = _speculative_request(state)
+                speculation = asyncio.create_task(get_async_client().chat.completions.create(**request))
+                speculation.add_done_callback(lambda task: task.cancelled() or task.exception())
+            try:
+                response = await get_async_client().chat.completions.create(**_grader_request(state))
+            except BaseException:
+                if speculation is not None:
+                    speculation.cancel()
+                raise
+            verdict = _parse_grade(state, _response_content(state, "grade", response, "{}"), response)
+        state = _apply_grade(state, verdict)
+        if speculation is None:
+            return state
+
+        miss = _speculation_miss(state, predicted)
+        if miss is not None:
+            # Not cancelled: the API bills a request that is already generating either way, so let it
+            # finish in the background and record what it cost.
+            _record_discarded(state, speculation)
+            return _discard_speculation(state, miss)
+        try:
+            answer = _response_content(state, "generate", await speculation, "{}")
+        except Exception as exc:
+            return _discard_speculation(state, f"speculative generation failed: {type(exc).__name__}")
+        return _commit_speculation(state, answer)
+
     def retry_or_continue(state: AgenticRagState) -> AgenticRagState:
         if not state["evidence_ok"] and state["retry_count"] < max_retries:
             state["retry_count"] += 1
-            latest_year = str(latest_corpus_doc_date.year) if latest_corpus_doc_date else "latest"
+            latest_doc_date = _pinned(state).latest_doc_date
+            latest_year = str(latest_doc_date.year) if latest_doc_date else "latest"
             state["rewritten_query"] = (
                 f"{state['rewritten_query']} As of the latest notes, prefer superseded decisions and focus on {latest_year} updates."
             )
             state["decision_trace"].append(
-                f"retry: attempt={state['retry_count']} strengthened query={state['rewritten_query']}"
+                TraceEvent("retry", f"attempt={state['retry_count']} strengthened query={state['rewritten_query']}")
             )
         else:
             state["decision_trace"].append(
-                f"continue: evidence_ok={state['evidence_ok']} retry_count={state['retry_count']}"
+                TraceEvent("continue", f"evidence_ok={state['evidence_ok']} retry_count={state['retry_count']}")
             )
         return state
 
+    async def aretry_or_continue(state: AgenticRagState) -> AgenticRagState:
+        return retry_or_continue(state)
+
     def route_after_retry(state: AgenticRagState) -> str:
-        if not state["evidence_ok"] and state["retry_count"] <= max_retries and "retry:" in state["decision_trace"][-1]:
+        last_step = state["decision_trace"][-1].step if state["decision_trace"] else ""
+        if not state["evidence_ok"] and state["retry_count"] <= max_retries and last_step == "retry":
             return "retrieve"
         return "generate_with_citations"
 
-    def generate_with_citations(state: AgenticRagState) -> AgenticRagState:
+    def _generation_request(state: AgenticRagState) -> dict[str, Any]:
         context = build_context(chunks=state["retrieved_chunks"], max_context_chars=max_context_chars)
-        response = client.chat.completions.create(
-            model=openai_model,
-            temperature=temperature,
-            response_format={"type": "json_schema", "json_schema": AGENTIC_GENERATION_JSON_SCHEMA},
-            messages=[
+        return {
+            **llm["generate"].request_kwargs(),
+            "response_format": {"type": "json_schema", "json_schema": AGENTIC_GENERATION_JSON_SCHEMA},
+            "messages": [
                 {"role": "system", "content": AGENTIC_GENERATION_SYSTEM_PROMPT},
                 {
                     "role": "user",
@@ -288,8 +561,10 @@ def build_agentic_rag_graph(
                     ),
                 },
             ],
-        )
-        parsed = json.loads(response.choices[0].message.content or "{}")
+        }
+
+    def _apply_generation(state: AgenticRagState, content: str) -> AgenticRagState:
+        parsed = json.loads(content or "{}")
         if state["confidence"] == "low" and not parsed.get("next_step"):
             parsed["next_step"] = (
                 "Do you want the latest recommendation or the historical recommendation from earlier 2025 notes?"
@@ -297,18 +572,84 @@ def build_agentic_rag_graph(
 
         parsed["confidence"] = state["confidence"]
         state["final_answer"] = parsed
-        state["decision_trace"].append("generate: completed answer with citations")
+        state["decision_trace"].append(TraceEvent("generate", "completed answer with citations"))
+        return state
+
+    def _take_speculation(state: AgenticRagState) -> str | None:
+        content = state.get("speculative_content")
+        state["speculative_content"] = None
+        return content
+
+    def generate_with_citations(state: AgenticRagState) -> AgenticRagState:
+        content = _take_speculation(state)
+        if content is None:
+            response = client.chat.completions.create(**_generation_request(state))
+            content = _response_content(state, "generate", response, "{}")
+        return _apply_generation(state, content)
+
+    async def agenerate_with_citations(state: AgenticRagState) -> AgenticRagState:
+        content = _take_speculation(state)
+        if content is None:
+            response = await get_async_client().chat.completions.create(**_generation_request(state))
+            content = _response_content(state, "generate", response, "{}")
+        return _apply_generation(state, content)
+
+    def _timed(name: str, state: AgenticRagState, started: float) -> AgenticRagState:
+        latency = state.setdefault("node_latency_s", {})
+        latency[name] = latency.get(name, 0.0) + time.perf_counter() - started
         return state
 
+    def _node(name: str, func, afunc, *, last: bool = False):
+        """Timed node; the query's pin is released after the ``last`` node or when any node raises."""
+
+        def timed(state: AgenticRagState) -> AgenticRagState:
+            started = time.perf_counter()
+            _pinned(state)
+            try:
+                state = func(state)
+            except BaseException:
+                handle.release(state["index_version"])
+                raise
+            if last:
+                handle.release(state["index_version"])
+            return _timed(name, state, started)
+
+        async def atimed(state: AgenticRagState) -> AgenticRagState:
+            started = time.perf_counter()
+            _pinned(state)
+            try:
+                state = await afunc(state)
+            except BaseException:
+                handle.release(state["index_version"])
+                raise
+            if last:
+                handle.release(state["index_version"])
+            return _timed(name, state, started)
+
+        return RunnableLambda(timed, afunc=atimed, name=name)
+
     workflow = StateGraph(AgenticRagState)
-    workflow.add_node("rewrite_with_recency_intent", rewrite_with_recency_intent)
-    workflow.add_node("retrieve", retrieve)
-    workflow.add_node("grade_evidence", grade_evidence)
-    workflow.add_node("retry_or_continue", retry_or_continue)
-    workflow.add_node("generate_with_citations", generate_with_citations)
-
-    workflow.add_edge(START, "rewrite_with_recency_intent")
-    workflow.add_edge("rewrite_with_recency_intent", "retrieve")
+    if multi_query:
+        workflow.add_node("fanout_retrieve", _node("fanout_retrieve", fanout_retrieve, afanout_retrieve))
+    else:
+        workflow.add_node(
+            "rewrite_with_recency_intent",
+            _node("rewrite_with_recency_intent", rewrite_with_recency_intent, arewrite_with_recency_intent),
+        )
+    workflow.add_node("retrieve", _node("retrieve", retrieve, aretrieve))
+    workflow.add_node("grade_evidence", _node("grade_evidence", grade_evidence, agrade_evidence))
+    workflow.add_node("retry_or_continue", _node("retry_or_continue", retry_or_continue, aretry_or_continue))
+    workflow.add_node(
+        "generate_with_citations",
+        _node("generate_with_citations", generate_with_citations, agenerate_with_citations, last=True),
+    )
+
+    if multi_query:
+        workflow.add_edge(START, "fanout_retrieve")
+        workflow.add_edge("fanout_retrieve", "grade_evidence")
+    else:
+        workflow.add_edge(START, "rewrite_with_recency_intent")
+        workflow.add_edge("rewrite_with_recency_intent", "retrieve")
     workflow.add_edge("retrieve", "grade_evidence")
     workflow.add_edge("grade_evidence", "retry_or_continue")
     workflow.add_conditional_edges(
@@ -324,8 +665,8 @@ def build_agentic_rag_graph(
     return workflow.compile()
 
 
-def run_agentic_rag(graph, query: str) -> dict[str, Any]:
-    initial_state: AgenticRagState = {
+def _initial_state(query: str) -> AgenticRagState:
+    return {
         "user_query": query,
         "rewritten_query": query,
         "retrieved_chunks": [],
@@ -334,5 +675,19 @@ def run_agentic_rag(graph, query: str) -> dict[str, Any]:
         "retry_count": 0,
         "decision_trace": [],
         "final_answer": {},
+        "node_latency_s": {},
+        "speculative_content": None,
+        "llm_usage": [],
+        "index_version": 0,
     }
-    return graph.invoke(initial_state)
+
+
+@profiled("agentic")
+def run_agentic_rag(graph, query: str) -> dict[str, Any]:
+    return graph.invoke(_initial_state(query))
+
+
+async def arun_agentic_rag(graph, query: str) -> dict[str, Any]:
+    """Async counterpart of ``run_agentic_rag``; LLM and embedding calls never block the event loop."""
+
+    return await graph.ainvoke(_initial_state(query))
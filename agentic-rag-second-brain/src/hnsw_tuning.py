@@ -0,0 +1,363 @@
+"""Recall-vs-latency tuner for the HNSW parameters of the persisted collection.
+
+Vectors are read from the persisted Chroma collection (no re-embedding). For every
+``(M, construction_ef, search_ef)`` combination an HNSW index is built with ``hnswlib`` (the
+library Chroma uses internally) and queried one query at a time on a single thread. Recall@k is
+measured against exact brute-force search, the Pareto-optimal configurations are reported, and
+the one with the best recall within the latency target can be applied to the collection.
+
+    python -m src.hnsw_tuning --k 6 --latency-target-ms 2 --holdout 50
+    python -m src.hnsw_tuning --golden eval/golden_questions.jsonl --apply
+    python -m src.hnsw_tuning --drop-previous   # once running services have reloaded
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Sequence
+
+from src.index_store import (
+    COLLECTION_NAME,
+    EMBED_DIM_KEY,
+    EMBED_MODEL_KEY,
+    _manifest_embed_model,
+    activate_collection,
+    active_collection_name,
+    hnsw_collection_metadata,
+    read_index_manifest,
+    update_index_manifest,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_M_VALUES = (8, 16, 32)
+DEFAULT_CONSTRUCTION_EF_VALUES = (64, 100, 200)
+DEFAULT_SEARCH_EF_VALUES = (10, 32, 64, 128)
+
+
+@dataclass(frozen=True)
+class HnswTrial:
+    m: int
+    construction_ef: int
+    search_ef: int
+    recall_at_k: float
+    p50_ms: float
+    p95_ms: float
+    build_s: float
+
+
+def load_collection_embeddings(
+    chroma_dir: Path | str,
+    collection_name: str = COLLECTION_NAME,
+    batch_size: int = 1000,
+) -> tuple[list[str], "np.ndarray", dict]:
+    """Return ``(ids, vectors, collection_metadata)`` for a persisted collection."""
+
+    import chromadb
+    import numpy as np
+
+    client = chromadb.PersistentClient(path=str(chroma_dir))
+    collection = client.get_collection(collection_name)
+    ids: list[str] = []
+    vectors: list = []
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+        ids.extend(batch["ids"])
+        vectors.extend(batch["embeddings"])
+    return ids, np.asarray(vectors, dtype=np.float32), dict(collection.metadata or {})
+
+
+def holdout_split(vectors: "np.ndarray", holdout: int, seed: int = 0) -> tuple["np.ndarray", "np.ndarray"]:
+    """Split stored vectors into ``(base, queries)``; held-out queries are removed from the base."""
+
+    import numpy as np
+
+    if holdout <= 0 or holdout >= len(vectors):
+        raise ValueError(f"holdout must be between 1 and {len(vectors) - 1}, got {holdout}.")
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[holdout:]], vectors[order[:holdout]]
+
+
+def golden_query_embeddings(golden_path: Path | str, embed_model: str) -> "np.ndarray":
+    import numpy as np
+
+    from src.eval import load_golden_questions
+    from src.rate_limit import openai_embedding
+
+    questions = [q.question for q in load_golden_questions(golden_path)]
+    embed = openai_embedding(embed_model)
+    return np.asarray([embed.get_query_embedding(q) for q in questions], dtype=np.float32)
+
+
+def exact_top_k(base: "np.ndarray", queries: "np.ndarray", k: int, space: str) -> "np.ndarray":
+    """Brute-force nearest neighbours with the same distance definitions as hnswlib."""
+
+    import numpy as np
+
+    if space == "l2":
+        distances = (
+            (queries**2).sum(axis=1)[:, None] - 2 * queries @ base.T + (base**2).sum(axis=1)[None, :]
+        )
+    elif space == "cosine":
+        base_n = base / np.clip(np.linalg.norm(base, axis=1, keepdims=True), 1e-12, None)
+        query_n = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        distances = 1.0 - query_n @ base_n.T
+    elif space == "ip":
+        distances = 1.0 - queries @ base.T
+    else:
+        raise ValueError(f"Unsupported space: {space!r}")
+
+    k = min(k, base.shape[0])
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def run_hnsw_grid(
+    base: "np.ndarray",
+    queries: "np.ndarray",
+    *,
+    k: int,
+    space: str,
+    m_values: Sequence[int] = DEFAULT_M_VALUES,
+    construction_ef_values: Sequence[int] = DEFAULT_CONSTRUCTION_EF_VALUES,
+    search_ef_values: Sequence[int] = DEFAULT_SEARCH_EF_VALUES,
+) -> list[HnswTrial]:
+    import hnswlib
+    import numpy as np
+
+    k = min(k, base.shape[0])
+    truth = exact_top_k(base, queries, k, space)
+    labels = np.arange(base.shape[0])
+
+    trials: list[HnswTrial] = []
+    for m in m_values:
+        for construction_ef in construction_ef_values:
+            started = time.perf_counter()
+            index = hnswlib.Index(space=space, dim=base.shape[1])
+            index.init_index(max_elements=base.shape[0], M=m, ef_construction=construction_ef, random_seed=0)
+            index.add_items(base, labels)
+            build_s = time.perf_counter() - started
+            index.set_num_threads(1)
+
+            for search_ef in search_ef_values:
+                index.set_ef(max(search_ef, k))
+                latencies_ms: list[float] = []
+                hits = 0
+                for row, query in enumerate(queries):
+                    t0 = time.perf_counter()
+                    found, _ = index.knn_query(query, k=k)
+                    latencies_ms.append((time.perf_counter() - t0) * 1000)
+                    hits += len(set(found[0].tolist()) & set(truth[row].tolist()))
+                trials.append(
+                    HnswTrial(
+                        m=m,
+                        construction_ef=construction_ef,
+                        search_ef=search_ef,
+                        recall_at_k=hits / (k * len(queries)),
+                        p50_ms=float(np.percentile(latencies_ms, 50)),
+                        p95_ms=float(np.percentile(latencies_ms, 95)),
+                        build_s=build_s,
+                    )
+                )
+    return trials
+
+
+def pareto_front(trials: Sequence[HnswTrial]) -> list[HnswTrial]:
+    """Trials not dominated on (higher recall, lower p95 latency), sorted by latency."""
+
+    front = [
+        trial
+        for trial in trials
+        if not any(
+            other.recall_at_k >= trial.recall_at_k
+            and other.p95_ms <= trial.p95_ms
+            and (other.recall_at_k > trial.recall_at_k or other.p95_ms < trial.p95_ms)
+            for other in trials
+        )
+    ]
+    return sorted(front, key=lambda trial: (trial.p95_ms, -trial.recall_at_k))
+
+
+def choose_config(trials: Sequence[HnswTrial], latency_target_ms: float) -> HnswTrial:
+    """Best recall within the p95 latency target; the fastest config if nothing meets it."""
+
+    front = pareto_front(trials)
+    within = [trial for trial in front if trial.p95_ms <= latency_target_ms]
+    if within:
+        return max(within, key=lambda trial: (trial.recall_at_k, -trial.p95_ms))
+    return front[0]
+
+
+def apply_hnsw_config(
+    chroma_dir: Path | str,
+    trial: HnswTrial,
+    space: str,
+    collection_name: str | None = None,
+    batch_size: int = 500,
+) -> tuple[str, int]:
+    """Rebuild the active collection with the chosen HNSW parameters, copying stored vectors as-is.
+
+    Chroma fixes HNSW parameters at creation time, so the vectors are copied into a new collection
+    and the index manifest is switched to it (one atomic file replace). The old collection stays as
+    the manifest's rollback target, so services still querying it keep working until they reload;
+    ``drop_previous_collection`` removes it afterwards. Returns ``(new_collection_name, copied_vectors)``.
+    """
+
+    import chromadb
+
+    from src.embed_migration import _require_single_collection
+
+    _require_single_collection(chroma_dir)
+    active = active_collection_name(chroma_dir)
+    collection_name = collection_name or active
+    if collection_name != active:
+        raise ValueError(
+            f"Only the active collection ('{active}') can be re-tuned in place, not '{collection_name}'."
+        )
+    client = chromadb.PersistentClient(path=str(chroma_dir))
+    source = client.get_collection(collection_name)
+    metadata = {
+        **{key: value for key, value in (source.metadata or {}).items() if not key.startswith("hnsw:")},
+        **hnsw_collection_metadata(
+            space=space,
+            m=trial.m,
+            construction_ef=trial.construction_ef,
+            search_ef=trial.search_ef,
+        ),
+    }
+    suffix = f"__hnsw{time.time_ns() // 1_000_000}"
+    new_name = collection_name.split("__hnsw")[0][: 63 - len(suffix)] + suffix
+    target = client.create_collection(new_name, metadata=metadata)
+
+    total = source.count()
+    for offset in range(0, total, batch_size):
+        batch = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        target.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+
+    activate_collection(
+        chroma_dir,
+        new_name,
+        embed_model=metadata.get(EMBED_MODEL_KEY) or _manifest_embed_model(chroma_dir, collection_name),
+        embed_dim=metadata.get(EMBED_DIM_KEY),
+        vector_count=target.count(),
+    )
+    return new_name, total
+
+
+def drop_previous_collection(chroma_dir: Path | str) -> str | None:
+    """Delete the collection a re-tune replaced; returns its name, or None when none is recorded.
+
+    Only a previous collection of the active embedding model is dropped here; one left behind by an
+    embedding migration is removed with ``python -m src.embed_migration drop`` instead.
+    """
+
+    import chromadb
+
+    manifest = read_index_manifest(chroma_dir) or {}
+    active = active_collection_name(chroma_dir)
+    previous = manifest.get("previous_collection")
+    if not previous or previous == active:
+        return None
+    if manifest.get("previous_embed_model") != manifest.get("embed_model"):
+        raise ValueError(
+            f"'{previous}' was embedded with {manifest.get('previous_embed_model')!r}, not the active "
+            f"{manifest.get('embed_model')!r}; drop it with `python -m src.embed_migration drop`."
+        )
+    chromadb.PersistentClient(path=str(chroma_dir)).delete_collection(previous)
+    update_index_manifest(chroma_dir, active, previous_collection=None, previous_embed_model=None)
+    return previous
+
+
+def _format_trial(trial: HnswTrial) -> str:
+    return (
+        f"M={trial.m:<3} construction_ef={trial.construction_ef:<4} search_ef={trial.search_ef:<4} "
+        f"recall@k={trial.recall_at_k:.3f} p50={trial.p50_ms:.3f}ms p95={trial.p95_ms:.3f}ms "
+        f"build={trial.build_s:.2f}s"
+    )
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.hnsw_tuning", description=__doc__.splitlines()[0])
+    parser.add_argument("--chroma-dir", default=None)
+    parser.add_argument("--collection", default=None, help="Defaults to the active collection.")
+    parser.add_argument("--k", type=int, default=None, help="Recall@k cutoff (defaults to TOP_K).")
+    parser.add_argument("--space", default=None, help="Distance space (defaults to the collection's).")
+    parser.add_argument("--latency-target-ms", type=float, default=1.0, help="p95 per-query budget.")
+    parser.add_argument("--holdout", type=int, default=50, help="Stored vectors held out as queries.")
+    parser.add_argument("--golden", default=None, help="Use golden questions as queries instead.")
+    parser.add_argument("--m", type=_int_list, default=list(DEFAULT_M_VALUES))
+    parser.add_argument("--construction-ef", type=_int_list, default=list(DEFAULT_CONSTRUCTION_EF_VALUES))
+    parser.add_argument("--search-ef", type=_int_list, default=list(DEFAULT_SEARCH_EF_VALUES))
+    parser.add_argument("--apply", action="store_true", help="Rebuild the collection with the chosen config.")
+    parser.add_argument(
+        "--drop-previous",
+        action="store_true",
+        help="Only delete the collection an earlier --apply replaced (after services have reloaded).",
+    )
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+
+    chroma_dir = Path(args.chroma_dir or settings.chroma_dir)
+    if args.drop_previous:
+        dropped = drop_previous_collection(chroma_dir)
+        print(f"dropped '{dropped}'" if dropped else "no previous collection recorded")
+        return 0
+    args.collection = args.collection or active_collection_name(chroma_dir)
+    k = args.k or int(settings.top_k)
+    _ids, vectors, collection_metadata = load_collection_embeddings(chroma_dir, args.collection)
+    space = args.space or str(collection_metadata.get("hnsw:space", "l2"))
+
+    if args.golden:
+        base, queries = vectors, golden_query_embeddings(args.golden, settings.embed_model)
+    else:
+        base, queries = holdout_split(vectors, min(args.holdout, len(vectors) - 1))
+
+    print(f"{len(base)} base vectors, {len(queries)} queries, dim={vectors.shape[1]}, space={space}, k={k}")
+    trials = run_hnsw_grid(
+        base,
+        queries,
+        k=k,
+        space=space,
+        m_values=args.m,
+        construction_ef_values=args.construction_ef,
+        search_ef_values=args.search_ef,
+    )
+    print("\nPareto-optimal configurations (recall vs p95 latency):")
+    for trial in pareto_front(trials):
+        print("  " + _format_trial(trial))
+
+    chosen = choose_config(trials, args.latency_target_ms)
+    print(f"\nChosen for p95 <= {args.latency_target_ms}ms:\n  {_format_trial(chosen)}")
+    print(
+        f"\nSettings: HNSW_SPACE={space} HNSW_M={chosen.m} "
+        f"HNSW_CONSTRUCTION_EF={chosen.construction_ef} HNSW_SEARCH_EF={chosen.search_ef}"
+    )
+
+    if args.apply:
+        new_name, copied = apply_hnsw_config(chroma_dir, chosen, space=space, collection_name=args.collection)
+        print(
+            f"Rebuilt '{args.collection}' as '{new_name}' with {copied} vectors and made it active; "
+            f"'{args.collection}' is kept for rollback. Reload running services (POST /reload), "
+            "then remove it with --drop-previous."
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+"""Minimal asyncio HTTP/1.1 JSON server used by the query service and the fake OpenAI backend.
+
+Only what those two need is implemented: one request per connection, ``Content-Length`` bodies
+and JSON responses. It keeps the project free of a web framework dependency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from src.records import json_default
+
+MAX_BODY_BYTES = 1_048_576
+
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """Raised by handlers to return a JSON error with a specific status code."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: dict[str, list[str]] = field(default_factory=dict)
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def json(self) -> Any:
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise HttpError(400, f"Invalid JSON body: {exc}") from exc
+
+
+Handler = Callable[[HttpRequest], Awaitable[tuple[int, Any]]]
+
+
+async def read_request(reader: asyncio.StreamReader) -> HttpRequest | None:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _version = request_line.decode("latin-1").strip().split(" ", 2)
+    except ValueError as exc:
+        raise HttpError(400, "Malformed request line.") from exc
+
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes.")
+    body = await reader.readexactly(length) if length else b""
+
+    parts = urlsplit(target)
+    return HttpRequest(
+        method=method.upper(),
+        path=parts.path,
+        query=parse_qs(parts.query),
+        headers=headers,
+        body=body,
+    )
+
+
+async def write_json(writer: asyncio.StreamWriter, status: int, payload: Any) -> None:
+    body = json.dumps(payload, default=json_default).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("latin-1")
+    writer.write(head + body)
+    await writer.drain()
+
+
+async def start_json_server(
+    handler: Handler,
+    host: str,
+    port: int,
+    sock: socket.socket | None = None,
+) -> asyncio.AbstractServer:
+    """Start serving ``handler`` and return the running ``asyncio`` server.
+
+    Pass an already-bound ``sock`` to accept on a listening socket inherited from a parent process.
+    """
+
+    async def _on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    return
+                status, payload = await handler(request)
+            except HttpError as exc:
+                status, payload = exc.status, {"error": exc.message}
+            except Exception as exc:
+                status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+            await write_json(writer, status, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    if sock is not None:
+        return await asyncio.start_server(_on_connection, sock=sock)
+    return await asyncio.start_server(_on_connection, host=host, port=port)
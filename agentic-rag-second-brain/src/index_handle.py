@@ -0,0 +1,176 @@
+"""Versioned index handle with blue/green swap.
+
+The compiled graph and ``RagRuntime`` hold an ``IndexHandle`` instead of a bare index. Each query
+pins the ``IndexVersion`` that is current when it starts and keeps using it for every retrieval,
+retry and recency check, so a swap never changes the corpus under a running query.
+
+Only the version number travels with the query (``index_version`` in graph state); ``pin`` /
+``resolve`` / ``release`` keep each pinned version alive by reference count until its query ends.
+
+``refresh(loader)`` builds the next version off the query path: it calls ``loader()`` (for example
+``load_persisted_index`` on a freshly ingested directory), runs ``warm_queries`` through it so lazy
+loading and caches are paid for before traffic arrives, recomputes derived state such as the latest
+corpus date, and only then publishes it. New queries see the new version; in-flight queries finish on
+the old one, which is released once the last of them drops it.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+from src.metrics import MetricsRegistry
+from src.recency import latest_doc_date_from_corpus
+
+
+@dataclass(eq=False)
+class IndexVersion:
+    version: int
+    index: Any
+    latest_doc_date: datetime | None = None
+    source: str = ""
+    loaded_at: float = field(default_factory=time.time)
+
+
+def latest_corpus_doc_date(raw_notes_dir: Path | str | None) -> datetime | None:
+    if raw_notes_dir is None:
+        return None
+    return latest_doc_date_from_corpus(raw_notes_dir)
+
+
+class IndexHandle:
+    """Holds the current ``IndexVersion``; ``swap`` and ``refresh`` publish a new one atomically."""
+
+    def __init__(
+        self,
+        index: Any,
+        *,
+        raw_notes_dir: Path | str | None = None,
+        source: str = "",
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.raw_notes_dir = raw_notes_dir
+        self.metrics = metrics or MetricsRegistry()
+        self._lock = threading.Lock()
+        self._live: weakref.WeakSet[IndexVersion] = weakref.WeakSet()
+        self._pins: dict[int, list] = {}  # version -> [IndexVersion, pin count]
+        self._builder: ThreadPoolExecutor | None = None
+        self._current = self._publish(0, index, source, latest_corpus_doc_date(raw_notes_dir))
+
+    def _publish(self, previous: int, index: Any, source: str, latest_doc_date: datetime | None) -> IndexVersion:
+        current = IndexVersion(version=previous + 1, index=index, latest_doc_date=latest_doc_date, source=source)
+        self._live.add(current)
+        self.metrics.set_gauge("index.version", current.version)
+        return current
+
+    def current(self) -> IndexVersion:
+        """The version new queries should pin (a single attribute read, no lock)."""
+
+        return self._current
+
+    def pin(self) -> IndexVersion:
+        """Pin the current version for one query; it stays resolvable until the matching ``release``."""
+
+        with self._lock:
+            current = self._current
+            self._pins.setdefault(current.version, [current, 0])[1] += 1
+        return current
+
+    def resolve(self, version: int) -> IndexVersion:
+        """The pinned (or current) ``IndexVersion`` numbered ``version``."""
+
+        entry = self._pins.get(version)
+        if entry is not None:
+            return entry[0]
+        current = self._current
+        if current.version != version:
+            raise KeyError(f"Index version {version} is not pinned.")
+        return current
+
+    def release(self, version: int) -> None:
+        """Drop one pin; an old version is freed once its last pin is released."""
+
+        with self._lock:
+            entry = self._pins.get(version)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._pins[version]
+
+    @property
+    def index(self) -> Any:
+        return self._current.index
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def live_versions(self) -> list[int]:
+        """Versions still referenced: the current one plus any pinned by in-flight queries."""
+
+        return sorted({version.version for version in list(self._live)})
+
+    def refresh_derived_state(self) -> IndexVersion:
+        """Publish the current index as the next version with a recomputed latest corpus date.
+
+        Used after the index was updated in place (watch mode). A new version number keeps new pins
+        apart from queries already pinned to the old one, which keep the values they started with.
+        """
+
+        latest_doc_date = latest_corpus_doc_date(self.raw_notes_dir)
+        with self._lock:
+            current = self._current
+            self._current = published = self._publish(current.version, current.index, current.source, latest_doc_date)
+        return published
+
+    def swap(self, index: Any, *, source: str = "") -> IndexVersion:
+        """Publish an already-built ``index`` as the next version and return it."""
+
+        latest_doc_date = latest_corpus_doc_date(self.raw_notes_dir)
+        with self._lock:
+            self._current = published = self._publish(self._current.version, index, source, latest_doc_date)
+        self.metrics.increment("index.swaps")
+        return published
+
+    def _build(self, loader: Callable[[], Any], warm_queries: Sequence[str], warm_top_k: int, source: str):
+        from src.retrieval import retrieve_chunks
+
+        started = time.perf_counter()
+        try:
+            index = loader()
+            for query in warm_queries:
+                retrieve_chunks(index=index, query=query, top_k=warm_top_k)
+        except Exception:
+            self.metrics.increment("index.refresh_errors")
+            raise
+        self.metrics.histogram("index.build_s").observe(time.perf_counter() - started)
+        return self.swap(index, source=source)
+
+    def refresh(
+        self,
+        loader: Callable[[], Any],
+        *,
+        warm_queries: Sequence[str] = (),
+        warm_top_k: int = 4,
+        source: str = "",
+        background: bool = True,
+    ) -> Future[IndexVersion] | IndexVersion:
+        """Build, warm and swap in the next version.
+
+        With ``background`` (the default) this returns a ``Future`` right away; refreshes run one at
+        a time, in submission order. A failing ``loader`` or warm-up leaves the current version live.
+        """
+
+        if not background:
+            return self._build(loader, warm_queries, warm_top_k, source)
+        with self._lock:
+            if self._builder is None:
+                self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-refresh")
+        return self._builder.submit(self._build, loader, warm_queries, warm_top_k, source)
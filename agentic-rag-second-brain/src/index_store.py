@@ -1,16 +1,153 @@
 from __future__ import annotations
 
 import json
+import os
+import re
 import shutil
+import threading
 from pathlib import Path
 from typing import Sequence
 
-import chromadb
-from llama_index.core import StorageContext, VectorStoreIndex
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.profiling import profiled
 
 COLLECTION_NAME = "notes"
+INDEX_MANIFEST_FILENAME = "index_manifest.json"
+# Collection metadata recording the embedding model and vector dimension a collection was built with.
+EMBED_MODEL_KEY = "embed:model"
+EMBED_DIM_KEY = "embed:dim"
+HNSW_SPACES = ("l2", "cosine", "ip")
+PERSIST_MODES = ("full", "lean")
+# Written by ``StorageContext.persist``; never read back, since indexes load from the vector store.
+LLAMA_INDEX_JSON_STORES = ("docstore.json", "index_store.json", "graph_store.json", "image__vector_store.json")
+# Serializes read-modify-write manifest updates (cutover, watcher counts) within a process.
+_manifest_lock = threading.Lock()
+
+
+def hnsw_collection_metadata(
+    space: str | None = None,
+    m: int | None = None,
+    construction_ef: int | None = None,
+    search_ef: int | None = None,
+) -> dict[str, object]:
+    """Chroma collection metadata carrying HNSW parameters; unset values come from ``Settings``.
+
+    Chroma fixes these when a collection is created, so they only affect new or rebuilt collections.
+    """
+
+    from src.config import settings
+
+    space = space or settings.hnsw_space
+    if space not in HNSW_SPACES:
+        raise ValueError(f"Unsupported HNSW space {space!r}. Expected one of {HNSW_SPACES}.")
+    return {
+        "hnsw:space": space,
+        "hnsw:M": int(m or settings.hnsw_m),
+        "hnsw:construction_ef": int(construction_ef or settings.hnsw_construction_ef),
+        "hnsw:search_ef": int(search_ef or settings.hnsw_search_ef),
+    }
+
+
+class EmbeddingModelMismatchError(ValueError):
+    """Raised when an index is loaded with a different embedding model than it was built with."""
+
+
+def embedding_collection_metadata(embed_model: str, embed_dim: int | None) -> dict[str, object]:
+    metadata: dict[str, object] = {EMBED_MODEL_KEY: embed_model}
+    if embed_dim:
+        metadata[EMBED_DIM_KEY] = int(embed_dim)
+    return metadata
+
+
+def check_embedding_model(
+    recorded_model: str | None,
+    embed_model: str,
+    *,
+    where: str,
+    recorded_dim: int | None = None,
+) -> None:
+    """Raise ``EmbeddingModelMismatchError`` unless ``embed_model`` is the recorded one (if any is recorded).
+
+    Query vectors from another model live in a different space (and usually have another dimension),
+    so searching with them would fail or return unrelated chunks.
+    """
+
+    if not recorded_model or recorded_model == embed_model:
+        return
+    dims = f" ({recorded_dim} dims)" if recorded_dim else ""
+    raise EmbeddingModelMismatchError(
+        f"{where} was embedded with {recorded_model!r}{dims}, but EMBED_MODEL is {embed_model!r}. "
+        f"Set EMBED_MODEL={recorded_model}, migrate with python -m src.embed_migration, "
+        "or rebuild with RESET_INDEX=1."
+    )
+
+
+def model_collection_name(embed_model: str) -> str:
+    """Collection an embedding migration builds for ``embed_model``."""
+
+    safe = re.sub(r"[^a-zA-Z0-9_-]+", "-", embed_model).strip("-_") or "model"
+    return f"{COLLECTION_NAME}__{safe}"[:63]
+
+
+def read_index_manifest(chroma_dir: Path | str) -> dict | None:
+    """How the index in ``chroma_dir`` was built (chunking, embedding model), if recorded."""
+
+    path = Path(chroma_dir) / INDEX_MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_index_manifest(chroma_dir: Path | str, *, embed_model: str, chunking: dict, **extra) -> dict:
+    """Write the manifest through a temporary file and ``os.replace``, so readers never see half of it."""
+
+    manifest = {"embed_model": embed_model, "chunking": dict(chunking), **extra}
+    path = Path(chroma_dir) / INDEX_MANIFEST_FILENAME
+    staging = path.with_suffix(".json.tmp")
+    staging.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(staging, path)
+    return manifest
+
+
+def update_index_manifest(chroma_dir: Path | str, collection_name: str, **fields) -> dict | None:
+    """Set ``fields`` in the manifest if it still describes ``collection_name``; None otherwise."""
+
+    with _manifest_lock:
+        manifest = read_index_manifest(chroma_dir)
+        if manifest is None or (manifest.get("collection") or COLLECTION_NAME) != collection_name:
+            return None
+        return write_index_manifest(chroma_dir, **{**manifest, **fields})
+
+
+def active_collection_name(chroma_dir: Path | str) -> str:
+    """The single-collection index's live collection: ``notes`` unless a migration cut over to another."""
+
+    return (read_index_manifest(chroma_dir) or {}).get("collection") or COLLECTION_NAME
+
+
+def activate_collection(
+    chroma_dir: Path | str,
+    collection_name: str,
+    *,
+    embed_model: str,
+    embed_dim: int | None = None,
+    vector_count: int | None = None,
+) -> dict:
+    """Point the manifest at ``collection_name`` (one atomic file replace); the old one stays for rollback."""
+
+    from src.ingestion import chunking_params
+
+    with _manifest_lock:
+        manifest = read_index_manifest(chroma_dir) or {}
+        return write_index_manifest(
+            chroma_dir,
+            embed_model=embed_model,
+            chunking=manifest.get("chunking") or chunking_params(),
+            collection=collection_name,
+            embed_dim=embed_dim,
+            vector_count=vector_count,
+            previous_collection=manifest.get("collection") or COLLECTION_NAME,
+            previous_embed_model=manifest.get("embed_model"),
+        )
 
 
 def _has_persisted_index(chroma_dir: Path, collection) -> bool:
@@ -19,6 +156,18 @@ def _has_persisted_index(chroma_dir: Path, collection) -> bool:
     return chroma_dir.exists() and any(chroma_dir.iterdir()) and collection.count() > 0
 
 
+def remove_json_stores(chroma_dir: Path | str) -> list[str]:
+    """Delete LlamaIndex JSON stores left by a ``full`` persist; returns the removed file names."""
+
+    removed = []
+    for name in LLAMA_INDEX_JSON_STORES:
+        path = Path(chroma_dir) / name
+        if path.exists():
+            path.unlink()
+            removed.append(name)
+    return removed
+
+
 def _coerce_metadata_value(value):
     """Convert metadata values to Chroma-compatible scalar types."""
     if value is None or isinstance(value, (str, int, float)):
@@ -30,6 +179,13 @@ def _coerce_metadata_value(value):
     return str(value)
 
 
+def _decode_metadata_value(key: str, value):
+    """Reverse ``_coerce_metadata_value`` for fields that were lists before insertion."""
+    if key == "tags" and isinstance(value, str):
+        return [tag.strip() for tag in value.split(",") if tag.strip()]
+    return value
+
+
 def _normalize_node_metadata(nodes: Sequence):
     """Ensure each node has flat scalar metadata for Chroma insertion."""
     normalized_nodes = []
@@ -42,48 +198,266 @@ def _normalize_node_metadata(nodes: Sequence):
     return normalized_nodes
 
 
-def build_or_load_index(nodes: Sequence, reset: bool, chroma_dir: Path, embed_model: str):
+@profiled("index")
+def build_or_load_index(
+    nodes: Sequence,
+    reset: bool,
+    chroma_dir: Path,
+    embed_model: str,
+    partitioning: str | None = None,
+    persist_mode: str | None = None,
+    chunking: dict | None = None,
+    collection_name: str | None = None,
+):
     """Build or load a persisted Chroma-backed vector index.
 
     - If ``reset`` is True, any existing persisted Chroma directory is removed.
     - If data already exists and ``reset`` is False, the existing index is loaded.
     - Otherwise, a new index is built from ``nodes`` and persisted to ``chroma_dir``.
+    - ``partitioning`` (default ``INDEX_PARTITIONING``) of ``quarter``, ``year`` or ``tag`` builds one
+      collection per partition instead, see ``src/partitions.py``.
+    - ``MATRYOSHKA_DIM`` > 0 builds a two-stage index with truncated vectors, see ``src/matryoshka.py``.
+    - ``persist_mode`` (default ``PERSIST_MODE``) ``lean`` keeps Chroma as the only store: the LlamaIndex
+      JSON stores are not written and stale ones are removed. ``full`` also calls ``storage_context.persist``.
+    - ``chunking`` (default: the ``CHUNK_*`` settings) describes how ``nodes`` were split. A fresh build
+      records it with the embedding model in ``index_manifest.json``; the result carries the manifest of
+      whatever index was built or loaded.
+    - ``collection_name`` (default: the active collection, ``notes`` unless a migration cut over) builds
+      or loads another single collection in the same directory. ``reset`` then drops only that collection,
+      and the manifest is left alone unless it is the active one. New collections record the embedding
+      model and dimension in their metadata; loading one with another model raises
+      ``EmbeddingModelMismatchError``.
     """
 
+    from src.config import settings
+    from src.ingestion import chunking_params
+
+    chunking = chunking or chunking_params()
+    active = active_collection_name(chroma_dir) if Path(chroma_dir).exists() else COLLECTION_NAME
+    collection_name = collection_name or active
+    info = _build_or_load_index(
+        nodes=nodes,
+        reset=reset,
+        chroma_dir=Path(chroma_dir),
+        embed_model=embed_model,
+        partitioning=partitioning or settings.index_partitioning,
+        persist_mode=persist_mode or settings.persist_mode,
+        collection_name=collection_name,
+        active=collection_name == active,
+    )
+    if info["built"] and collection_name == active:
+        extra = {"collection": collection_name} if collection_name != COLLECTION_NAME else {}
+        write_index_manifest(
+            chroma_dir,
+            embed_model=embed_model,
+            chunking=chunking,
+            vector_count=info["vector_count"],
+            embed_dim=info.get("embed_dim"),
+            **extra,
+        )
+    info["manifest"] = read_index_manifest(chroma_dir)
+    return info
+
+
+def _build_or_load_index(
+    nodes: Sequence,
+    reset: bool,
+    chroma_dir: Path,
+    embed_model: str,
+    partitioning: str,
+    persist_mode: str,
+    collection_name: str = COLLECTION_NAME,
+    active: bool = True,
+):
+    from src.config import settings
+
+    if persist_mode not in PERSIST_MODES:
+        raise ValueError(f"Unknown persist mode {persist_mode!r}. Expected one of {PERSIST_MODES}.")
+    matryoshka_dim = int(settings.matryoshka_dim)
+    if matryoshka_dim > 0:
+        if collection_name != COLLECTION_NAME:
+            raise ValueError("Named collections (embedding migrations) cannot be combined with MATRYOSHKA_DIM.")
+        if partitioning != "none":
+            raise ValueError("MATRYOSHKA_DIM cannot be combined with INDEX_PARTITIONING.")
+        from src.matryoshka import build_two_stage_index
+
+        return build_two_stage_index(
+            nodes=nodes,
+            reset=reset,
+            chroma_dir=chroma_dir,
+            embed_model=embed_model,
+            dims=matryoshka_dim,
+            rescore_candidates=int(settings.rescore_candidates),
+        )
+    if collection_name != COLLECTION_NAME and partitioning != "none":
+        raise ValueError("Named collections (embedding migrations) cannot be combined with INDEX_PARTITIONING.")
+    if partitioning != "none":
+        from src.partitions import build_partitioned_index
+
+        return build_partitioned_index(
+            nodes=nodes,
+            reset=reset,
+            chroma_dir=chroma_dir,
+            embed_model=embed_model,
+            scheme=partitioning,
+        )
+
+    import chromadb
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
+    from src.rate_limit import openai_embedding
+
     chroma_dir = Path(chroma_dir)
 
-    if reset and chroma_dir.exists():
+    if reset and active and chroma_dir.exists():
         shutil.rmtree(chroma_dir)
 
     chroma_dir.mkdir(parents=True, exist_ok=True)
 
-    embed = OpenAIEmbedding(model=embed_model)
+    embed = openai_embedding(embed_model)
 
     chroma_client = chromadb.PersistentClient(path=str(chroma_dir))
-    chroma_collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    existing = _get_collection(chroma_client, collection_name)
 
-    if _has_persisted_index(chroma_dir=chroma_dir, collection=chroma_collection) and not reset:
+    if existing is not None and _has_persisted_index(chroma_dir=chroma_dir, collection=existing) and not reset:
+        metadata = existing.metadata or {}
+        check_embedding_model(
+            metadata.get(EMBED_MODEL_KEY) or _manifest_embed_model(chroma_dir, collection_name),
+            embed_model,
+            where=f"Collection '{collection_name}' in {chroma_dir}",
+            recorded_dim=metadata.get(EMBED_DIM_KEY),
+        )
         index = VectorStoreIndex.from_vector_store(
-            vector_store=vector_store,
+            vector_store=ChromaVectorStore(chroma_collection=existing),
             embed_model=embed,
         )
+        chroma_collection = existing
+        embed_dim = metadata.get(EMBED_DIM_KEY)
         built = False
     else:
         nodes = _normalize_node_metadata(list(nodes))
+        # Embed before creating the collection, so its metadata can record the vector dimension.
+        embed_dim = _embed_nodes(nodes, embed)
+        if existing is not None:
+            chroma_client.delete_collection(collection_name)
+        chroma_collection = chroma_client.create_collection(
+            collection_name,
+            metadata={**hnsw_collection_metadata(), **embedding_collection_metadata(embed_model, embed_dim)},
+        )
+        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
         index = VectorStoreIndex(
             nodes=nodes,
             storage_context=storage_context,
             embed_model=embed,
         )
-        storage_context.persist(persist_dir=str(chroma_dir))
+        # The JSON stores describe the active collection only; a side collection leaves them alone.
+        if active and persist_mode == "full":
+            storage_context.persist(persist_dir=str(chroma_dir))
+        elif active:
+            remove_json_stores(chroma_dir)
         built = True
 
     return {
         "index": index,
         "built": built,
-        "collection_name": COLLECTION_NAME,
+        "collection_name": collection_name,
         "chroma_dir": chroma_dir,
         "vector_count": chroma_collection.count(),
+        "embed_dim": embed_dim,
     }
+
+
+def _get_collection(chroma_client, name: str):
+    """The named collection, or None when it does not exist."""
+
+    try:
+        return chroma_client.get_collection(name)
+    except Exception:
+        return None
+
+
+def _manifest_embed_model(chroma_dir: Path | str, collection_name: str) -> str | None:
+    """Embedding model the manifest records for ``collection_name`` (indexes built before collection metadata)."""
+
+    manifest = read_index_manifest(chroma_dir) or {}
+    if (manifest.get("collection") or COLLECTION_NAME) == collection_name:
+        return manifest.get("embed_model")
+    return None
+
+
+def _embed_nodes(nodes: Sequence, embed) -> int | None:
+    """Fill in missing node embeddings in batches; returns the vector dimension (None without nodes)."""
+
+    from llama_index.core.schema import MetadataMode
+
+    missing = [node for node in nodes if node.embedding is None]
+    if missing:
+        vectors = embed.get_text_embedding_batch(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in missing]
+        )
+        for node, vector in zip(missing, vectors):
+            node.embedding = vector
+    return len(nodes[0].embedding) if nodes else None
+
+
+def persisted_collection_names(chroma_dir: Path | str) -> list[str]:
+    """Chroma collections holding the chunks: one per partition, or the active collection."""
+
+    from src.partitions import read_partition_manifest
+
+    manifest = read_partition_manifest(chroma_dir)
+    if manifest:
+        return [meta["collection"] for _, meta in sorted(manifest["partitions"].items())]
+    return [active_collection_name(chroma_dir)]
+
+
+def read_chunk_metadata(chroma_dir: Path | str, batch_size: int = 1000) -> list[dict]:
+    """Read per-chunk metadata straight from the persisted Chroma collection.
+
+    LlamaIndex bookkeeping keys (``_node_content``, ``_node_type``, ...) are dropped and
+    flattened fields such as ``tags`` are decoded back to lists. No embedding calls are made.
+    A snapshot directory (``src/snapshot.py``) is read from its metadata columns instead.
+    """
+
+    import chromadb
+
+    chroma_path = Path(chroma_dir)
+    if not chroma_path.exists():
+        raise FileNotFoundError(f"Persisted Chroma directory not found: {chroma_path}")
+
+    from src.snapshot import read_snapshot_manifest
+
+    if read_snapshot_manifest(chroma_path):
+        from src.snapshot import read_snapshot_metadata
+
+        return read_snapshot_metadata(chroma_path)
+
+    collection_names = persisted_collection_names(chroma_path)
+    chroma_client = chromadb.PersistentClient(path=str(chroma_path))
+    rows: list[dict] = []
+    seen_chunk_ids: set[str] = set()
+    for collection_name in collection_names:
+        collection = _get_collection(chroma_client, collection_name)
+        if collection is None:
+            raise FileNotFoundError(f"Chroma collection '{collection_name}' not found at {chroma_path}.")
+        offset = 0
+        total = collection.count()
+        while offset < total:
+            batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            for metadata in batch["metadatas"] or []:
+                row = {
+                    key: _decode_metadata_value(key, value)
+                    for key, value in (metadata or {}).items()
+                    if not key.startswith("_")
+                }
+                # Tag partitions can hold the same chunk more than once.
+                chunk_id = row.get("chunk_id")
+                if chunk_id in seen_chunk_ids:
+                    continue
+                if chunk_id:
+                    seen_chunk_ids.add(chunk_id)
+                rows.append(row)
+            offset += batch_size
+    return rows
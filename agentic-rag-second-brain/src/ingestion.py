@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
 
-from llama_index.core import Document
-from llama_index.core.node_parser import SentenceSplitter
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+# Defaults for ``CHUNK_SIZE`` / ``CHUNK_OVERLAP``; the settings decide what an index is built with.
+CHUNK_SIZE = 420
+CHUNK_OVERLAP = 60
+SPLITTER_NAME = "SentenceSplitter"
+# Below this many documents a process pool costs more than it saves.
+PARALLEL_MIN_DOCUMENTS = 64
 
 
 def _parse_frontmatter(text: str) -> Dict[str, object]:
@@ -55,43 +64,107 @@ def _doc_id(source_path: str, title: str, date: str) -> str:
     return hashlib.sha1(payload).hexdigest()
 
 
-def load_markdown_documents(notes_dir) -> List[Document]:
+def load_markdown_document(path: Path | str) -> "Document":
+    from llama_index.core import Document
+
+    path = Path(path)
+    parsed = _parse_frontmatter(path.read_text(encoding="utf-8"))
+    title = str(parsed.get("title", "Untitled"))
+    date = str(parsed.get("date", ""))
+    tags = parsed.get("tags", [])
+    source_path = str(path.resolve())
+    doc_id = _doc_id(source_path=source_path, title=title, date=date)
+
+    metadata = {
+        "doc_title": title,
+        "doc_date": date,
+        "tags": tags,
+        "source_path": source_path,
+        "doc_id": doc_id,
+    }
+
+    return Document(
+        text=str(parsed.get("body", "")),
+        metadata=metadata,
+        id_=doc_id,
+    )
+
+
+def load_markdown_documents(notes_dir) -> List["Document"]:
     notes_path = Path(notes_dir)
-    documents: List[Document] = []
-
-    for path in sorted(notes_path.glob("*.md")):
-        parsed = _parse_frontmatter(path.read_text(encoding="utf-8"))
-        title = str(parsed.get("title", "Untitled"))
-        date = str(parsed.get("date", ""))
-        tags = parsed.get("tags", [])
-        source_path = str(path.resolve())
-        doc_id = _doc_id(source_path=source_path, title=title, date=date)
-
-        metadata = {
-            "doc_title": title,
-            "doc_date": date,
-            "tags": tags,
-            "source_path": source_path,
-            "doc_id": doc_id,
-        }
-
-        documents.append(
-            Document(
-                text=str(parsed.get("body", "")),
-                metadata=metadata,
-                id_=doc_id,
-            )
-        )
+    return [load_markdown_document(path) for path in sorted(notes_path.glob("*.md"))]
+
+
+def chunking_params(chunk_size: int | None = None, chunk_overlap: int | None = None) -> Dict[str, Any]:
+    """Chunking parameters as recorded in index manifests; unset values come from ``Settings``."""
 
-    return documents
+    from src.config import settings
 
+    chunk_size = int(chunk_size or settings.chunk_size)
+    chunk_overlap = int(settings.chunk_overlap if chunk_overlap is None else chunk_overlap)
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size}).")
+    return {"splitter": SPLITTER_NAME, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
 
-def chunk_documents(documents) -> List:
-    parser = SentenceSplitter(chunk_size=420, chunk_overlap=60)
-    nodes = parser.get_nodes_from_documents(documents)
 
-    for index, node in enumerate(nodes):
+@lru_cache(maxsize=8)
+def _splitter(chunk_size: int, chunk_overlap: int):
+    """One splitter per parameter pair; building it loads the tokenizer, so reuse it across calls."""
+
+    from llama_index.core.node_parser import SentenceSplitter
+
+    return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _split_documents(documents: Sequence, chunk_size: int, chunk_overlap: int) -> List:
+    return _splitter(chunk_size, chunk_overlap).get_nodes_from_documents(list(documents))
+
+
+def _split_parallel(documents: Sequence, chunk_size: int, chunk_overlap: int, workers: int) -> List:
+    """Split contiguous document batches in worker processes and concatenate them in input order."""
+
+    batch_size = max(1, -(-len(documents) // (workers * 4)))
+    batches = [documents[start : start + batch_size] for start in range(0, len(documents), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            _split_documents,
+            batches,
+            [chunk_size] * len(batches),
+            [chunk_overlap] * len(batches),
+        )
+        return [node for nodes in results for node in nodes]
+
+
+def chunk_documents(
+    documents,
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
+    workers: int | None = None,
+) -> List:
+    """Split documents into nodes with ``chunk_id = "<doc_id>:<position>"``.
+
+    ``position`` counts a note's own chunks, so re-chunking a single note (watch mode, migration
+    catch-up) gives the same ids as a full build. Unset parameters come from ``CHUNK_SIZE``,
+    ``CHUNK_OVERLAP`` and ``CHUNK_WORKERS``. With more than one worker and at least
+    ``PARALLEL_MIN_DOCUMENTS`` documents, batches are split in a process pool; nodes come back in
+    document order, so chunk ids match the single-process path.
+    """
+
+    from src.config import settings
+
+    params = chunking_params(chunk_size, chunk_overlap)
+    workers = int(workers or settings.chunk_workers)
+    documents = list(documents)
+    if workers > 1 and len(documents) >= PARALLEL_MIN_DOCUMENTS:
+        nodes = _split_parallel(documents, params["chunk_size"], params["chunk_overlap"], workers)
+    else:
+        nodes = _split_documents(documents, params["chunk_size"], params["chunk_overlap"])
+
+    positions: dict[str, int] = {}
+    for node in nodes:
         source_doc_id = node.metadata.get("doc_id", node.ref_doc_id or "unknown")
-        node.metadata["chunk_id"] = f"{source_doc_id}:{index}"
+        position = positions.get(source_doc_id, 0)
+        positions[source_doc_id] = position + 1
+        node.metadata["chunk_id"] = f"{source_doc_id}:{position}"
 
     return nodes
@@ -0,0 +1,425 @@
+"""Open-loop load test for the baseline and agentic pipelines.
+
+Replays the golden questions (verbatim, or a synthetic expansion into distinct phrasings) at fixed
+offered rates. Arrivals follow a Poisson (or uniform) schedule that does not wait for earlier
+queries to finish, so a saturated pipeline builds a queue instead of silently slowing the load
+generator down. Queries go through the same admission control as the HTTP service
+(``QueryService``: ``max_concurrency`` executing, ``max_pending`` waiting, 503 beyond that).
+
+By default a local fake OpenAI backend (``src/fake_openai.py``) runs in a subprocess with the
+requested latency, jitter and error rate. Per offered rate and mode the report shows:
+
+- arrival rate and throughput: arrivals per second over the arrival span, and successful
+  completions per second over the completion span (both ``(n - 1) / span``, which removes the
+  bias of the first queries' latency and the final drain);
+- queueing delay: scheduled arrival to the start of execution;
+- latency: scheduled arrival to completion (p50/p95/p99), so queueing is never hidden;
+- rejected (503) and failed queries.
+
+The knee is the first rate where throughput falls below 90% of the arrival rate or more than 1%
+of queries fail; the saturation throughput is the highest throughput measured.
+
+    python -m src.loadtest --qps 1,2,4,8,16 --duration-s 20 --chat-latency-ms 400 --embed-latency-ms 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Sequence
+
+QUERY_TEMPLATES = (
+    "{q}",
+    "Quick question: {q}",
+    "{q} Please cite the notes.",
+    "For the team wiki: {q}",
+    "Can you remind me: {q}",
+)
+KNEE_THROUGHPUT_RATIO = 0.9
+KNEE_FAILURE_RATE = 0.01
+
+
+def expand_questions(questions: Sequence[str], count: int, seed: int = 0) -> list[str]:
+    """``count`` distinct query strings: each template applied to each question, then numbered repeats."""
+
+    variants = [template.format(q=question) for template in QUERY_TEMPLATES for question in questions]
+    random.Random(seed).shuffle(variants)
+    expanded = []
+    for position in range(count):
+        repeat, slot = divmod(position, len(variants))
+        expanded.append(variants[slot] if repeat == 0 else f"{variants[slot]} (variant {repeat})")
+    return expanded
+
+
+def arrival_offsets(qps: float, duration_s: float, process: str = "poisson", seed: int = 0) -> list[float]:
+    """Arrival times in seconds from the start of a level."""
+
+    if process == "uniform":
+        return [position / qps for position in range(int(qps * duration_s))]
+    rng = random.Random(seed)
+    offsets, now = [], rng.expovariate(qps)
+    while now < duration_s:
+        offsets.append(now)
+        now += rng.expovariate(qps)
+    return offsets
+
+
+def _rate(times: Sequence[float]) -> float:
+    span = max(times) - min(times) if len(times) > 1 else 0.0
+    return (len(times) - 1) / span if span > 0 else 0.0
+
+
+def _percentiles(values: Sequence[float]) -> dict[str, float | None]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    import numpy as np
+
+    p50, p95, p99 = np.percentile(np.asarray(values, dtype=np.float64), [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+@dataclass
+class LevelReport:
+    mode: str
+    offered_qps: float
+    duration_s: float
+    sent: int = 0
+    ok: int = 0
+    rejected: int = 0
+    errors: int = 0
+    timed_out: int = 0
+    arrival_qps: float = 0.0
+    throughput_qps: float = 0.0
+    max_in_flight: int = 0
+    latency_s: dict[str, float | None] = field(default_factory=dict)
+    queue_wait_s: dict[str, float | None] = field(default_factory=dict)
+    service_s: dict[str, float | None] = field(default_factory=dict)
+    error_samples: list[str] = field(default_factory=list)
+
+    @property
+    def failure_rate(self) -> float:
+        return (self.rejected + self.errors + self.timed_out) / self.sent if self.sent else 0.0
+
+    @property
+    def saturated(self) -> bool:
+        return (
+            self.throughput_qps < KNEE_THROUGHPUT_RATIO * self.arrival_qps
+            or self.failure_rate > KNEE_FAILURE_RATE
+        )
+
+
+class _TimedRuntime:
+    """Records when each query starts executing (after admission and the concurrency limit)."""
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+        self.started: dict[tuple[str, str], float] = {}
+
+    async def aanswer(self, query: str, mode: str) -> dict[str, Any]:
+        self.started[(mode, query)] = time.perf_counter()
+        return await self.runtime.aanswer(query, mode)
+
+
+async def run_level(
+    runtime,
+    *,
+    mode: str,
+    queries: Sequence[str],
+    offsets: Sequence[float],
+    offered_qps: float,
+    duration_s: float,
+    max_concurrency: int,
+    max_pending: int,
+    drain_timeout_s: float = 120.0,
+) -> LevelReport:
+    """Fire ``queries[i]`` at ``offsets[i]`` without waiting for earlier queries, then drain."""
+
+    from src.http_server import HttpError
+    from src.service import QueryService
+
+    timed = _TimedRuntime(runtime)
+    service = QueryService(timed, max_concurrency=max_concurrency, max_pending=max_pending)
+    report = LevelReport(mode=mode, offered_qps=offered_qps, duration_s=duration_s)
+    latencies: list[float] = []
+    queue_waits: list[float] = []
+    service_times: list[float] = []
+    finished_at: list[float] = []
+    in_flight = 0
+
+    async def _one(query: str, scheduled: float) -> None:
+        nonlocal in_flight
+        in_flight += 1
+        report.max_in_flight = max(report.max_in_flight, in_flight)
+        try:
+            await service.query(query, mode)
+        except HttpError as exc:
+            if exc.status == 503:
+                report.rejected += 1
+            else:
+                report.errors += 1
+                report.error_samples.append(exc.message)
+            return
+        except Exception as exc:
+            report.errors += 1
+            report.error_samples.append(f"{type(exc).__name__}: {exc}")
+            return
+        finally:
+            in_flight -= 1
+        done = time.perf_counter()
+        started = timed.started.get((mode, query), scheduled)
+        report.ok += 1
+        latencies.append(done - scheduled)
+        queue_waits.append(max(0.0, started - scheduled))
+        service_times.append(done - started)
+        finished_at.append(done)
+
+    t0 = time.perf_counter()
+    tasks = []
+    for query, offset in zip(queries, offsets):
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_one(query, t0 + offset)))
+    report.sent = len(tasks)
+
+    if tasks:
+        _done, pending = await asyncio.wait(tasks, timeout=drain_timeout_s)
+        for task in pending:
+            task.cancel()
+        report.timed_out = len(pending)
+    report.arrival_qps = _rate(offsets[: report.sent])
+    report.throughput_qps = _rate(finished_at)
+    report.latency_s = _percentiles(latencies)
+    report.queue_wait_s = _percentiles(queue_waits)
+    report.service_s = _percentiles(service_times)
+    report.error_samples = report.error_samples[:5]
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_fake_backend(
+    *,
+    chat_latency_ms: float,
+    embed_latency_ms: float,
+    latency_jitter: float,
+    error_rate: float,
+    error_status: int,
+    seed: int,
+) -> tuple[subprocess.Popen, str]:
+    """Start ``src.fake_openai`` in a subprocess (so it does not share this event loop or GIL)."""
+
+    port = _free_port()
+    command = [
+        sys.executable,
+        "-m",
+        "src.fake_openai",
+        "--port",
+        str(port),
+        "--chat-latency-ms",
+        str(chat_latency_ms),
+        "--embed-latency-ms",
+        str(embed_latency_ms),
+        "--latency-jitter",
+        str(latency_jitter),
+        "--error-rate",
+        str(error_rate),
+        "--error-status",
+        str(error_status),
+        "--seed",
+        str(seed),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if "listening" not in line:
+        process.kill()
+        raise RuntimeError(f"Fake OpenAI backend failed to start: {line!r}")
+    return process, f"http://127.0.0.1:{port}/v1"
+
+
+def _format_ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def format_report(reports: Sequence[LevelReport]) -> str:
+    header = (
+        f"{'mode':<9}{'offered':>8}{'arrive':>8}{'tput':>8}{'ok':>6}{'503':>6}{'err':>6}{'inflt':>7}"
+        f"{'queue p50/p95/p99 ms':>23}{'latency p50/p95/p99 ms':>25}"
+    )
+    lines = [header]
+    for report in reports:
+        queue = "/".join(_format_ms(report.queue_wait_s[key]) for key in ("p50", "p95", "p99"))
+        latency = "/".join(_format_ms(report.latency_s[key]) for key in ("p50", "p95", "p99"))
+        marker = "  <- saturated" if report.saturated else ""
+        lines.append(
+            f"{report.mode:<9}{report.offered_qps:>8.2f}{report.arrival_qps:>8.2f}{report.throughput_qps:>8.2f}{report.ok:>6}"
+            f"{report.rejected:>6}{report.errors + report.timed_out:>6}{report.max_in_flight:>7}"
+            f"{queue:>23}{latency:>25}{marker}"
+        )
+    return "\n".join(lines)
+
+
+def summarize_saturation(reports: Sequence[LevelReport]) -> dict[str, dict[str, float | None]]:
+    """Per mode: the first saturated offered rate (knee) and the highest measured throughput."""
+
+    summary: dict[str, dict[str, float | None]] = {}
+    for report in reports:
+        entry = summary.setdefault(report.mode, {"knee_qps": None, "saturation_throughput_qps": 0.0})
+        if report.saturated and entry["knee_qps"] is None:
+            entry["knee_qps"] = report.offered_qps
+        entry["saturation_throughput_qps"] = max(entry["saturation_throughput_qps"], report.throughput_qps)
+    return summary
+
+
+async def run_load_test(
+    runtime,
+    *,
+    questions: Sequence[str],
+    modes: Sequence[str],
+    qps_levels: Sequence[float],
+    duration_s: float,
+    max_concurrency: int,
+    max_pending: int,
+    process: str = "poisson",
+    expand: bool = True,
+    seed: int = 0,
+    drain_timeout_s: float = 120.0,
+) -> list[LevelReport]:
+    """Run every offered rate for every mode; expanded queries are never reused across levels."""
+
+    plans = [
+        (mode, qps, arrival_offsets(qps, duration_s, process, seed + position))
+        for mode in modes
+        for position, qps in enumerate(qps_levels)
+    ]
+    total = sum(len(offsets) for _mode, _qps, offsets in plans)
+    if expand:
+        pool = expand_questions(questions, total, seed)
+    else:
+        pool = [questions[position % len(questions)] for position in range(total)]
+
+    reports = []
+    cursor = 0
+    for mode, qps, offsets in plans:
+        queries = pool[cursor : cursor + len(offsets)]
+        cursor += len(offsets)
+        report = await run_level(
+            runtime,
+            mode=mode,
+            queries=queries,
+            offsets=offsets,
+            offered_qps=qps,
+            duration_s=duration_s,
+            max_concurrency=max_concurrency,
+            max_pending=max_pending,
+            drain_timeout_s=drain_timeout_s,
+        )
+        print(format_report([report]).splitlines()[1], flush=True)
+        reports.append(report)
+    return reports
+
+
+def _float_list(text: str) -> list[float]:
+    return [float(part) for part in text.split(",") if part.strip()]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.loadtest", description=__doc__.splitlines()[0])
+    parser.add_argument("--golden", default="eval/golden_questions.jsonl")
+    parser.add_argument("--chroma-dir", default=None, help="Persisted Chroma directory (defaults to CHROMA_DIR).")
+    parser.add_argument("--modes", default="baseline,agentic")
+    parser.add_argument("--qps", type=_float_list, default=[1.0, 2.0, 4.0, 8.0], help="Offered rates to sweep.")
+    parser.add_argument("--duration-s", type=float, default=15.0, help="Arrival window per level.")
+    parser.add_argument("--process", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--replay", action="store_true", help="Cycle the golden questions verbatim.")
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=None)
+    parser.add_argument("--drain-timeout-s", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live", action="store_true", help="Use the configured OpenAI endpoint, not the fake.")
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=30.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--out", default=None, help="Write the level reports as JSON.")
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+    from src.eval import load_golden_questions
+
+    backend = None
+    if not args.live:
+        backend, base_url = start_fake_backend(
+            chat_latency_ms=args.chat_latency_ms,
+            embed_latency_ms=args.embed_latency_ms,
+            latency_jitter=args.latency_jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            seed=args.seed,
+        )
+        os.environ.update(OPENAI_BASE_URL=base_url, OPENAI_API_BASE=base_url, OPENAI_API_KEY="fake")
+        print(
+            f"fake backend {base_url}: chat {args.chat_latency_ms:g} ms, embeddings {args.embed_latency_ms:g} ms, "
+            f"jitter {args.latency_jitter:g}, error rate {args.error_rate:g}",
+            flush=True,
+        )
+
+    try:
+        from src.runtime import load_runtime
+
+        runtime = load_runtime(chroma_dir=args.chroma_dir)
+        questions = [question.question for question in load_golden_questions(args.golden)]
+        max_concurrency = args.max_concurrency or int(settings.service_max_concurrency)
+        max_pending = args.max_pending if args.max_pending is not None else int(settings.service_max_pending)
+        print(f"max_concurrency={max_concurrency} max_pending={max_pending}\n{format_report([])}", flush=True)
+        reports = asyncio.run(
+            run_load_test(
+                runtime,
+                questions=questions,
+                modes=[mode.strip() for mode in args.modes.split(",") if mode.strip()],
+                qps_levels=args.qps,
+                duration_s=args.duration_s,
+                max_concurrency=max_concurrency,
+                max_pending=max_pending,
+                process=args.process,
+                expand=not args.replay,
+                seed=args.seed,
+                drain_timeout_s=args.drain_timeout_s,
+            )
+        )
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait()
+
+    print()
+    for mode, entry in summarize_saturation(reports).items():
+        knee = "not reached" if entry["knee_qps"] is None else f"{entry['knee_qps']:g} qps offered"
+        print(f"{mode}: saturation throughput {entry['saturation_throughput_qps']:.2f} qps, knee {knee}")
+    for report in reports:
+        for sample in report.error_samples[:2]:
+            print(f"  {report.mode}@{report.offered_qps:g}: {sample}")
+
+    if args.out:
+        Path(args.out).write_text(
+            json.dumps([asdict(report) for report in reports], indent=2) + "\n", encoding="utf-8"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
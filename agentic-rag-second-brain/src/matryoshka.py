@@ -0,0 +1,329 @@
+"""Two-stage retrieval with truncated (Matryoshka) embeddings and full-dimension rescoring.
+
+``text-embedding-3-*`` vectors can be shortened by keeping the first ``d`` dimensions and
+re-normalizing. In this mode the Chroma collection stores only the truncated vectors, which
+keeps the HNSW graph small and fast. The full vectors go to a compact float16 side store
+(``full_vectors.npy``, memory-mapped on load). A query is embedded once at full dimension. The
+truncated prefix finds ``rescore_candidates`` ANN candidates, and those are re-ranked by exact
+cosine similarity against their full vectors.
+
+    python -m src.matryoshka --holdout 50 --dims 256,512
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Sequence
+
+from src.index_store import COLLECTION_NAME, _get_collection, _normalize_node_metadata, hnsw_collection_metadata
+from src.records import ChunkRecord
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MANIFEST_FILENAME = "two_stage.json"
+FULL_VECTORS_FILENAME = "full_vectors.npy"
+FULL_VECTOR_IDS_FILENAME = "full_vector_ids.json"
+
+
+def truncate_normalize(vectors: "np.ndarray", dims: int) -> "np.ndarray":
+    import numpy as np
+
+    truncated = np.asarray(vectors, dtype=np.float32)[..., :dims]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.clip(norms, 1e-12, None)
+
+
+def read_two_stage_manifest(chroma_dir: Path | str) -> dict[str, Any] | None:
+    path = Path(chroma_dir) / MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def build_two_stage_index(
+    nodes: Sequence,
+    reset: bool,
+    chroma_dir: Path | str,
+    embed_model: str,
+    dims: int,
+    rescore_candidates: int = 50,
+) -> dict[str, Any]:
+    """Embed nodes once at full dimension; store truncated vectors in Chroma and full ones on the side."""
+
+    import chromadb
+    import numpy as np
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from llama_index.core.schema import MetadataMode
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
+    from src.rate_limit import openai_embedding
+
+    chroma_dir = Path(chroma_dir)
+    existing = read_two_stage_manifest(chroma_dir)
+    if existing and not reset:
+        index = TwoStageIndex(chroma_dir, embed_model=embed_model, rescore_candidates=rescore_candidates)
+        return {
+            "index": index,
+            "built": False,
+            "collection_name": COLLECTION_NAME,
+            "chroma_dir": chroma_dir,
+            "vector_count": existing["count"],
+        }
+
+    if reset and chroma_dir.exists():
+        shutil.rmtree(chroma_dir)
+    chroma_dir.mkdir(parents=True, exist_ok=True)
+    chroma_client = chromadb.PersistentClient(path=str(chroma_dir))
+    if _get_collection(chroma_client, COLLECTION_NAME) is not None:
+        # Checked before embedding: the existing collection holds full-dimension vectors.
+        raise ValueError(
+            f"{chroma_dir} already holds a '{COLLECTION_NAME}' collection that is not a two-stage index; "
+            "rebuild with RESET_INDEX=1 or choose another CHROMA_DIR."
+        )
+
+    nodes = _normalize_node_metadata(list(nodes))
+    embed = openai_embedding(embed_model)
+    full = np.asarray(
+        embed.get_text_embedding_batch([node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]),
+        dtype=np.float32,
+    )
+    if dims >= full.shape[1]:
+        raise ValueError(f"Truncated dimension {dims} must be smaller than the full dimension {full.shape[1]}.")
+    full /= np.clip(np.linalg.norm(full, axis=1, keepdims=True), 1e-12, None)
+
+    truncated = truncate_normalize(full, dims)
+    for node, vector in zip(nodes, truncated):
+        node.embedding = vector.tolist()
+
+    collection = chroma_client.create_collection(COLLECTION_NAME, metadata=hnsw_collection_metadata(space="cosine"))
+    storage_context = StorageContext.from_defaults(vector_store=ChromaVectorStore(chroma_collection=collection))
+    VectorStoreIndex(nodes=nodes, storage_context=storage_context, embed_model=embed)
+
+    np.save(chroma_dir / FULL_VECTORS_FILENAME, full.astype(np.float16))
+    (chroma_dir / FULL_VECTOR_IDS_FILENAME).write_text(
+        json.dumps([node.node_id for node in nodes]), encoding="utf-8"
+    )
+    manifest = {
+        "embed_model": embed_model,
+        "full_dim": int(full.shape[1]),
+        "dims": int(dims),
+        "count": int(full.shape[0]),
+        "full_vectors_dtype": "float16",
+    }
+    (chroma_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    index = TwoStageIndex(chroma_dir, embed_model=embed_model, rescore_candidates=rescore_candidates)
+    return {
+        "index": index,
+        "built": True,
+        "collection_name": COLLECTION_NAME,
+        "chroma_dir": chroma_dir,
+        "vector_count": collection.count(),
+    }
+
+
+class TwoStageIndex:
+    """Index-like object: truncated-vector ANN search, then full-dimension rescoring."""
+
+    def __init__(self, chroma_dir: Path | str, embed_model: str, rescore_candidates: int = 50):
+        import chromadb
+        import numpy as np
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        self.chroma_dir = Path(chroma_dir)
+        self.manifest = read_two_stage_manifest(self.chroma_dir)
+        if not self.manifest:
+            raise FileNotFoundError(f"No {MANIFEST_FILENAME} found in {self.chroma_dir}.")
+        self.dims = int(self.manifest["dims"])
+        self.embed_model_name = embed_model
+        self.rescore_candidates = rescore_candidates
+        self.full_vectors = np.load(self.chroma_dir / FULL_VECTORS_FILENAME, mmap_mode="r")
+        ids = json.loads((self.chroma_dir / FULL_VECTOR_IDS_FILENAME).read_text(encoding="utf-8"))
+        self.row_by_id = {node_id: row for row, node_id in enumerate(ids)}
+        collection = chromadb.PersistentClient(path=str(self.chroma_dir)).get_collection(COLLECTION_NAME)
+        self.vector_store = ChromaVectorStore(chroma_collection=collection)
+        self._embed = None
+
+    @property
+    def embed_model(self):
+        if self._embed is None:
+            from src.rate_limit import openai_embedding
+
+            self._embed = openai_embedding(self.embed_model_name)
+        return self._embed
+
+    def _search(self, query_embedding: list[float], top_k: int) -> list[ChunkRecord]:
+        import numpy as np
+        from llama_index.core.schema import NodeWithScore
+        from llama_index.core.vector_stores import VectorStoreQuery
+
+        from src.retrieval import _rows_from_results
+
+        full_query = np.asarray(query_embedding, dtype=np.float32)
+        full_query /= max(float(np.linalg.norm(full_query)), 1e-12)
+        candidates = min(max(self.rescore_candidates, top_k), len(self.row_by_id))
+        result = self.vector_store.query(
+            VectorStoreQuery(
+                query_embedding=truncate_normalize(full_query, self.dims).tolist(),
+                similarity_top_k=candidates,
+            )
+        )
+        nodes = result.nodes or []
+        if not nodes:
+            return []
+
+        rows = np.fromiter((self.row_by_id[node.node_id] for node in nodes), dtype=np.int64, count=len(nodes))
+        scores = self.full_vectors[rows].astype(np.float32) @ full_query
+        order = np.argsort(-scores)[:top_k]
+        return _rows_from_results([NodeWithScore(node=nodes[i], score=float(scores[i])) for i in order])
+
+    def stored_embeddings(self, node_ids: Sequence[str]) -> dict[str, list[float]]:
+        """Full-dimension vectors from the side store, so diversification sees untruncated embeddings."""
+
+        return {
+            node_id: self.full_vectors[self.row_by_id[node_id]].astype("float32").tolist()
+            for node_id in node_ids
+            if node_id in self.row_by_id
+        }
+
+    def retrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import embed_query
+
+        return self._search(embed_query(self.embed_model, query), top_k)
+
+    async def aretrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import aembed_query
+
+        query_embedding = await aembed_query(self.embed_model, query)
+        return await asyncio.to_thread(self._search, query_embedding, top_k)
+
+
+def benchmark_two_stage(
+    full_vectors: "np.ndarray",
+    queries: "np.ndarray",
+    *,
+    k: int,
+    dims_values: Sequence[int],
+    rescore_candidates: int,
+    m: int = 16,
+    construction_ef: int = 100,
+    search_ef: int = 64,
+) -> list[dict[str, Any]]:
+    """Compare full-dimension ANN with truncated ANN (with and without rescoring).
+
+    Recall@k is measured against exact full-dimension cosine search. Memory is the raw vector
+    payload of the ANN index plus, for two-stage rows, the float16 side store.
+    """
+
+    import hnswlib
+    import numpy as np
+
+    from src.hnsw_tuning import exact_top_k
+
+    full = full_vectors.astype(np.float32)
+    full /= np.clip(np.linalg.norm(full, axis=1, keepdims=True), 1e-12, None)
+    queries = queries.astype(np.float32)
+    queries /= np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+    k = min(k, full.shape[0])
+    truth = exact_top_k(full, queries, k, "cosine")
+    candidates = min(max(rescore_candidates, k), full.shape[0])
+
+    def _ann(vectors: "np.ndarray"):
+        index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+        index.init_index(max_elements=vectors.shape[0], M=m, ef_construction=construction_ef, random_seed=0)
+        index.add_items(vectors, np.arange(vectors.shape[0]))
+        index.set_num_threads(1)
+        index.set_ef(max(search_ef, candidates))
+        return index
+
+    def _measure(label: str, dims: int, search, index_bytes: int, side_bytes: int) -> dict[str, Any]:
+        latencies, hits = [], 0
+        for row, query in enumerate(queries):
+            t0 = time.perf_counter()
+            found = search(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += len(set(found.tolist()) & set(truth[row].tolist()))
+        return {
+            "variant": label,
+            "dims": dims,
+            "recall_at_k": hits / (k * len(queries)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "ann_index_mb": index_bytes / 1e6,
+            "side_store_mb": side_bytes / 1e6,
+        }
+
+    full_index = _ann(full)
+    report = [
+        _measure(
+            "full",
+            full.shape[1],
+            lambda q: full_index.knn_query(q, k=k)[0][0],
+            full.nbytes,
+            0,
+        )
+    ]
+    side_bytes = full.astype(np.float16).nbytes
+    full_f16 = full.astype(np.float16)
+    for dims in dims_values:
+        truncated = truncate_normalize(full, dims)
+        index = _ann(truncated)
+
+        def _truncated_only(q, index=index, dims=dims):
+            return index.knn_query(truncate_normalize(q, dims), k=k)[0][0]
+
+        def _two_stage(q, index=index, dims=dims):
+            found = index.knn_query(truncate_normalize(q, dims), k=candidates)[0][0]
+            scores = full_f16[found].astype(np.float32) @ q
+            return found[np.argsort(-scores)[:k]]
+
+        report.append(_measure("truncated", dims, _truncated_only, truncated.nbytes, 0))
+        report.append(_measure("two_stage", dims, _two_stage, truncated.nbytes, side_bytes))
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.matryoshka", description="Two-stage retrieval benchmark.")
+    parser.add_argument("--chroma-dir", default=None, help="Collection holding full-dimension vectors.")
+    parser.add_argument("--k", type=int, default=None)
+    parser.add_argument("--dims", default="256,512", help="Comma-separated truncated dimensions.")
+    parser.add_argument("--candidates", type=int, default=None, help="ANN candidates rescored at full dimension.")
+    parser.add_argument("--holdout", type=int, default=50)
+    parser.add_argument("--golden", default=None, help="Use embedded golden questions as queries.")
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+    from src.hnsw_tuning import golden_query_embeddings, holdout_split, load_collection_embeddings
+
+    chroma_dir = Path(args.chroma_dir or settings.chroma_dir)
+    _ids, vectors, _metadata = load_collection_embeddings(chroma_dir)
+    if args.golden:
+        base, queries = vectors, golden_query_embeddings(args.golden, settings.embed_model)
+    else:
+        base, queries = holdout_split(vectors, min(args.holdout, len(vectors) - 1))
+
+    report = benchmark_two_stage(
+        base,
+        queries,
+        k=args.k or int(settings.top_k),
+        dims_values=[int(d) for d in args.dims.split(",") if d.strip()],
+        rescore_candidates=args.candidates or int(settings.rescore_candidates),
+    )
+    print(f"{len(base)} vectors (dim={vectors.shape[1]}), {len(queries)} queries")
+    for row in report:
+        print(
+            f"{row['variant']:<10} dims={row['dims']:<5} recall@k={row['recall_at_k']:.3f} "
+            f"p50={row['p50_ms']:.3f}ms p95={row['p95_ms']:.3f}ms "
+            f"ann_index={row['ann_index_mb']:.2f}MB side_store={row['side_store_mb']:.2f}MB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Any, Sequence
+
+DEFAULT_LATENCY_BUCKETS_S: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket latency histogram with approximate percentiles."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_S):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_s: float) -> None:
+        slot = bisect.bisect_left(self.buckets, value_s)
+        with self._lock:
+            self._counts[slot] += 1
+            self._count += 1
+            self._sum += value_s
+            self._max = max(self._max, value_s)
+
+    def percentile(self, q: float) -> float | None:
+        """Return the upper bound of the bucket containing quantile ``q`` (0-1)."""
+
+        with self._lock:
+            if self._count == 0:
+                return None
+            target = q * self._count
+            running = 0
+            for slot, count in enumerate(self._counts):
+                running += count
+                if running >= target and count:
+                    return self.buckets[slot] if slot < len(self.buckets) else self._max
+            return self._max
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            cumulative = 0
+            buckets: dict[str, int] = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[f"le_{bound:g}"] = cumulative
+            buckets["le_inf"] = self._count
+            count, total, maximum = self._count, self._sum, self._max
+        return {
+            "count": count,
+            "sum_s": total,
+            "avg_s": total / count if count else None,
+            "max_s": maximum if count else None,
+            "p50_s": self.percentile(0.50),
+            "p95_s": self.percentile(0.95),
+            "p99_s": self.percentile(0.99),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """Named latency histograms and counters shared by one process."""
+
+    def __init__(self):
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = LatencyHistogram()
+            return self._histograms[name]
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        return {
+            "histograms": {name: hist.snapshot() for name, hist in sorted(histograms.items())},
+            "counters": counters,
+            "gauges": gauges,
+        }
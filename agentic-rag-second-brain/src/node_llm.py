@@ -0,0 +1,51 @@
+"""Per-node chat settings for the agentic graph.
+
+The rewrite and grade steps are short, bounded outputs (one query line, a small JSON verdict), so
+they can run on a cheaper or faster model with a tight ``max_tokens`` cap and timeout, while
+generation keeps the main model. Nodes without an explicit config inherit ``OPENAI_MODEL``;
+rewrite and grade default to temperature 0, generation to ``TEMPERATURE``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+LLM_NODES = ("rewrite", "grade", "generate")
+
+
+@dataclass(frozen=True)
+class NodeLLMConfig:
+    model: str
+    temperature: float = 0.0
+    max_tokens: int | None = None
+    timeout_s: float | None = None
+
+    def request_kwargs(self) -> dict[str, Any]:
+        """Keyword arguments for ``chat.completions.create`` (messages and response format excluded)."""
+
+        kwargs: dict[str, Any] = {"model": self.model, "temperature": self.temperature}
+        if self.max_tokens:
+            kwargs["max_tokens"] = self.max_tokens
+        if self.timeout_s:
+            kwargs["timeout"] = self.timeout_s
+        return kwargs
+
+
+def resolve_node_llm(
+    openai_model: str,
+    temperature: float,
+    overrides: Mapping[str, NodeLLMConfig] | None = None,
+) -> dict[str, NodeLLMConfig]:
+    """Config for every node in ``LLM_NODES``: ``overrides`` where given, graph defaults otherwise."""
+
+    overrides = dict(overrides or {})
+    unknown = set(overrides) - set(LLM_NODES)
+    if unknown:
+        raise ValueError(f"Unknown LLM node(s) {sorted(unknown)}. Expected names from {LLM_NODES}.")
+    defaults = {
+        "rewrite": NodeLLMConfig(model=openai_model, temperature=0.0),
+        "grade": NodeLLMConfig(model=openai_model, temperature=0.0),
+        "generate": NodeLLMConfig(model=openai_model, temperature=temperature),
+    }
+    return {node: overrides.get(node, defaults[node]) for node in LLM_NODES}
@@ -0,0 +1,299 @@
+"""Optional partitioning of the vector index into one Chroma collection per time bucket or tag.
+
+Partitions are named ``notes__<key>`` (for example ``notes__2025q3``) and described by a
+``partitions.json`` manifest in the Chroma directory. ``PartitionedIndex`` embeds the query once,
+fans the search out in parallel to the partitions relevant for that query, and merges top-k
+globally. Partition collections are opened lazily, so cold partitions stay unloaded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Sequence
+
+from src.index_store import COLLECTION_NAME, _normalize_node_metadata, hnsw_collection_metadata
+from src.recency import RECENCY_HINT_TOKENS
+from src.records import ChunkRecord
+
+PARTITION_SCHEMES = ("none", "quarter", "year", "tag")
+MANIFEST_FILENAME = "partitions.json"
+UNDATED_PARTITION = "undated"
+
+
+def partition_keys(metadata: dict[str, Any], scheme: str) -> list[str]:
+    """Return the partition key(s) a chunk belongs to. Tag partitioning may return several."""
+
+    if scheme == "tag":
+        tags = metadata.get("tags") or []
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+        return sorted({str(tag).lower() for tag in tags}) or ["untagged"]
+
+    doc_date = str(metadata.get("doc_date", ""))
+    match = re.match(r"(\d{4})-(\d{2})-\d{2}$", doc_date)
+    if not match:
+        return [UNDATED_PARTITION]
+    year, month = match.group(1), int(match.group(2))
+    if scheme == "year":
+        return [year]
+    if scheme == "quarter":
+        return [f"{year}q{(month - 1) // 3 + 1}"]
+    raise ValueError(f"Unknown partition scheme: {scheme!r}. Expected one of {PARTITION_SCHEMES}.")
+
+
+def partition_collection_name(key: str) -> str:
+    safe = re.sub(r"[^a-zA-Z0-9_-]+", "-", key).strip("-_") or "empty"
+    return f"{COLLECTION_NAME}__{safe}"[:63]
+
+
+def read_partition_manifest(chroma_dir: Path | str) -> dict[str, Any] | None:
+    path = Path(chroma_dir) / MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def build_partitioned_index(
+    nodes: Sequence,
+    reset: bool,
+    chroma_dir: Path | str,
+    embed_model: str,
+    scheme: str,
+) -> dict[str, Any]:
+    """Build one collection per partition. Each node is embedded once, even if it lands in several tag partitions."""
+
+    import chromadb
+    from llama_index.core import StorageContext, VectorStoreIndex
+    from llama_index.core.schema import MetadataMode
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
+    from src.rate_limit import openai_embedding
+
+    if scheme not in PARTITION_SCHEMES or scheme == "none":
+        raise ValueError(f"build_partitioned_index needs a partition scheme, got {scheme!r}.")
+
+    chroma_dir = Path(chroma_dir)
+    existing = read_partition_manifest(chroma_dir)
+    if existing and not reset:
+        index = PartitionedIndex(chroma_dir=chroma_dir, embed_model=embed_model, manifest=existing)
+        return {
+            "index": index,
+            "built": False,
+            "collection_name": COLLECTION_NAME,
+            "chroma_dir": chroma_dir,
+            "vector_count": index.vector_count(),
+            "partitions": sorted(existing["partitions"]),
+        }
+
+    if reset and chroma_dir.exists():
+        shutil.rmtree(chroma_dir)
+    chroma_dir.mkdir(parents=True, exist_ok=True)
+
+    nodes = list(nodes)
+    groups: dict[str, list] = {}
+    for node in nodes:
+        for key in partition_keys(node.metadata, scheme):
+            groups.setdefault(key, []).append(node)
+
+    embed = openai_embedding(embed_model)
+    pending = [node for node in nodes if node.embedding is None]
+    if pending:
+        vectors = embed.get_text_embedding_batch(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in pending]
+        )
+        for node, vector in zip(pending, vectors):
+            node.embedding = vector
+    nodes = _normalize_node_metadata(nodes)
+
+    chroma_client = chromadb.PersistentClient(path=str(chroma_dir))
+    partitions: dict[str, dict[str, Any]] = {}
+    for key, members in sorted(groups.items()):
+        collection_name = partition_collection_name(key)
+        collection = chroma_client.get_or_create_collection(collection_name, metadata=hnsw_collection_metadata())
+        vector_store = ChromaVectorStore(chroma_collection=collection)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        VectorStoreIndex(nodes=members, storage_context=storage_context, embed_model=embed)
+        dates = sorted(str(node.metadata.get("doc_date", "")) for node in members if node.metadata.get("doc_date"))
+        partitions[key] = {
+            "collection": collection_name,
+            "count": collection.count(),
+            "min_date": dates[0] if dates else None,
+            "max_date": dates[-1] if dates else None,
+        }
+
+    # Tag partitions can hold the same chunk more than once; count each chunk once.
+    manifest = {"scheme": scheme, "embed_model": embed_model, "partitions": partitions, "vector_count": len(nodes)}
+    (chroma_dir / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+
+    index = PartitionedIndex(chroma_dir=chroma_dir, embed_model=embed_model, manifest=manifest)
+    return {
+        "index": index,
+        "built": True,
+        "collection_name": COLLECTION_NAME,
+        "chroma_dir": chroma_dir,
+        "vector_count": index.vector_count(),
+        "partitions": sorted(partitions),
+    }
+
+
+class PartitionedIndex:
+    """Index-like object that searches only the partitions relevant to a query.
+
+    ``retrieve_chunks`` / ``aretrieve_chunks`` return the same row format as
+    ``src.retrieval.retrieve_chunks``, which dispatches to them automatically.
+    """
+
+    def __init__(
+        self,
+        chroma_dir: Path | str,
+        embed_model: str,
+        manifest: dict[str, Any] | None = None,
+        recent_partitions: int = 2,
+        max_workers: int = 8,
+    ):
+        self.chroma_dir = Path(chroma_dir)
+        self.manifest = manifest or read_partition_manifest(self.chroma_dir)
+        if not self.manifest:
+            raise FileNotFoundError(f"No {MANIFEST_FILENAME} found in {self.chroma_dir}.")
+        self.scheme = self.manifest["scheme"]
+        self.embed_model_name = embed_model
+        self.recent_partitions = recent_partitions
+        self._client = None
+        self._embed = None
+        self._stores: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="partition-query")
+
+    @property
+    def partitions(self) -> list[str]:
+        return sorted(self.manifest["partitions"])
+
+    @property
+    def loaded_partitions(self) -> list[str]:
+        return sorted(self._stores)
+
+    @property
+    def embed_model(self):
+        if self._embed is None:
+            from src.rate_limit import openai_embedding
+
+            self._embed = openai_embedding(self.embed_model_name)
+        return self._embed
+
+    def vector_count(self) -> int:
+        """Distinct chunks in the index (manifests written before ``vector_count`` sum the partitions)."""
+
+        if "vector_count" in self.manifest:
+            return int(self.manifest["vector_count"])
+        return sum(int(meta.get("count", 0)) for meta in self.manifest["partitions"].values())
+
+    def _store(self, key: str):
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                import chromadb
+                from llama_index.vector_stores.chroma import ChromaVectorStore
+
+                if self._client is None:
+                    self._client = chromadb.PersistentClient(path=str(self.chroma_dir))
+                collection = self._client.get_collection(self.manifest["partitions"][key]["collection"])
+                store = ChromaVectorStore(chroma_collection=collection)
+                self._stores[key] = store
+            return store
+
+    def unload(self, key: str | None = None) -> None:
+        """Drop cached collection handles (all of them when ``key`` is None)."""
+
+        with self._lock:
+            if key is None:
+                self._stores.clear()
+            else:
+                self._stores.pop(key, None)
+
+    def select_partitions(self, query: str) -> list[str]:
+        keys = self.partitions
+        lowered = query.lower()
+        if self.scheme == "tag":
+            # Match singular forms too ("embedding" selects the "embeddings" partition).
+            matched = [key for key in keys if re.search(rf"\b{re.escape(key.rstrip('s'))}", lowered)]
+            return matched or keys
+
+        if any(token in lowered for token in RECENCY_HINT_TOKENS):
+            dated = sorted(
+                (key for key in keys if key != UNDATED_PARTITION),
+                key=lambda key: self.manifest["partitions"][key].get("max_date") or "",
+            )
+            return dated[-self.recent_partitions :] or keys
+        return keys
+
+    def _query_partition(self, key: str, query_embedding: list[float], top_k: int) -> list:
+        from llama_index.core.schema import NodeWithScore
+        from llama_index.core.vector_stores import VectorStoreQuery
+
+        count = int(self.manifest["partitions"][key].get("count") or top_k)
+        result = self._store(key).query(
+            VectorStoreQuery(query_embedding=query_embedding, similarity_top_k=max(1, min(top_k, count)))
+        )
+        return [
+            NodeWithScore(node=node, score=score)
+            for node, score in zip(result.nodes or [], result.similarities or [])
+        ]
+
+    @staticmethod
+    def _merge(per_partition: list[list], top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import _rows_from_results
+
+        merged = sorted(
+            (hit for hits in per_partition for hit in hits),
+            key=lambda hit: hit.score if hit.score is not None else float("-inf"),
+            reverse=True,
+        )
+        rows: list[ChunkRecord] = []
+        seen: set[str] = set()
+        for row in _rows_from_results(merged):
+            if row["chunk_id"] in seen:
+                continue
+            seen.add(row["chunk_id"])
+            rows.append(row)
+            if len(rows) == top_k:
+                break
+        return rows
+
+    def stored_embeddings(self, node_ids: Sequence[str]) -> dict[str, list[float]]:
+        """Stored vectors for ``node_ids``, looked up in the partitions loaded so far."""
+
+        found: dict[str, list[float]] = {}
+        for key in self.loaded_partitions:
+            missing = [node_id for node_id in node_ids if node_id not in found]
+            if not missing:
+                break
+            batch = self._store(key).client.get(ids=missing, include=["embeddings"])
+            found.update(zip(batch["ids"], batch["embeddings"]))
+        return found
+
+    def retrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import embed_query
+
+        query_embedding = embed_query(self.embed_model, query)
+        keys = self.select_partitions(query)
+        futures = [self._executor.submit(self._query_partition, key, query_embedding, top_k) for key in keys]
+        return self._merge([future.result() for future in futures], top_k)
+
+    async def aretrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import aembed_query
+
+        query_embedding = await aembed_query(self.embed_model, query)
+        loop = asyncio.get_running_loop()
+        per_partition = await asyncio.gather(
+            *[
+                loop.run_in_executor(self._executor, self._query_partition, key, query_embedding, top_k)
+                for key in self.select_partitions(query)
+            ]
+        )
+        return self._merge(list(per_partition), top_k)
@@ -0,0 +1,138 @@
+"""Pre-fork query workers sharing one read-only, memory-mapped index.
+
+The parent process loads a ``SnapshotIndex`` (exporting one from the Chroma directory first when it
+is missing or older than ``chroma.sqlite3``), compiles the graph, binds the listening socket and then
+forks ``workers`` children. The vector matrix, text blob and offsets are read-only ``mmap`` mappings,
+so every worker reads the same page-cache pages. Everything else the parent built is shared
+copy-on-write (``gc.freeze`` keeps the collector from touching those objects). No worker opens
+SQLite, so workers never contend on a lock, and writes to the index raise ``ReadOnlyIndexError``.
+
+Each worker runs the asyncio query service (``src/service.py``) on the inherited socket and the
+kernel spreads connections across them. Metrics are per worker.
+
+    python -m src.cli serve --workers 4
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import signal
+import socket
+import sys
+from pathlib import Path
+
+from src.snapshot import SnapshotIndex, export_snapshot, read_snapshot_manifest
+
+
+def default_snapshot_dir(chroma_dir: Path | str) -> Path:
+    chroma_dir = Path(chroma_dir)
+    return chroma_dir.with_name(chroma_dir.name + "_snapshot")
+
+
+def _snapshot_is_stale(chroma_dir: Path, snapshot_dir: Path) -> bool:
+    manifest_path = snapshot_dir / "snapshot.json"
+    if not read_snapshot_manifest(snapshot_dir):
+        return True
+    sources = [path for path in chroma_dir.iterdir() if path.is_file()]
+    newest_source = max((path.stat().st_mtime for path in sources), default=0.0)
+    return newest_source > manifest_path.stat().st_mtime
+
+
+def load_read_only_index(
+    chroma_dir: Path | str,
+    embed_model: str,
+    snapshot_dir: Path | str | None = None,
+) -> SnapshotIndex:
+    """Memory-mapped read-only index for ``chroma_dir``, exporting a fresh snapshot when needed."""
+
+    chroma_dir = Path(chroma_dir)
+    if read_snapshot_manifest(chroma_dir):
+        return SnapshotIndex(chroma_dir, embed_model=embed_model)
+    snapshot_dir = Path(snapshot_dir) if snapshot_dir else default_snapshot_dir(chroma_dir)
+    if _snapshot_is_stale(chroma_dir, snapshot_dir):
+        export_snapshot(chroma_dir, snapshot_dir, embed_model=embed_model)
+    return SnapshotIndex(snapshot_dir, embed_model=embed_model)
+
+
+def _worker_main(runtime, sock: socket.socket, service_kwargs: dict) -> None:
+    from src.service import run_service
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    run_service(runtime, sock=sock, **service_kwargs)
+
+
+def run_prefork_service(
+    *,
+    workers: int,
+    host: str,
+    port: int,
+    max_concurrency: int,
+    max_pending: int,
+    chroma_dir: Path | str | None = None,
+    embed_model: str | None = None,
+    snapshot_dir: Path | str | None = None,
+) -> None:
+    """Load once, fork ``workers`` query service processes on one socket, and wait for them."""
+
+    from src.config import settings
+    from src.runtime import load_runtime
+
+    embed_model = embed_model or settings.embed_model
+    index = load_read_only_index(chroma_dir or settings.chroma_dir, embed_model, snapshot_dir)
+    runtime = load_runtime(index=index)
+
+    sock = socket.create_server((host, port), backlog=1024)
+    bound = sock.getsockname()
+    print(
+        f"pre-fork query service on http://{bound[0]}:{bound[1]}: {workers} workers, "
+        f"read-only index {index.path} ({index.vector_count()} chunks)",
+        flush=True,
+    )
+    service_kwargs = {
+        "host": host,
+        "port": bound[1],
+        "max_concurrency": max_concurrency,
+        "max_pending": max_pending,
+    }
+
+    gc.collect()
+    gc.freeze()
+    children: list[int] = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker_main(runtime, sock, service_kwargs)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                code = 1
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        children.append(pid)
+    sock.close()
+
+    def _terminate(*_args) -> None:
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, lambda *args: (_terminate(), sys.exit(0)))
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    except KeyboardInterrupt:
+        _terminate()
+        for child in children:
+            try:
+                os.waitpid(child, 0)
+            except ChildProcessError:
+                pass
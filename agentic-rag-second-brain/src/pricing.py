@@ -0,0 +1,67 @@
+"""Token usage records and estimated USD cost for chat calls.
+
+Prices are USD per 1M tokens as ``(prompt, completion)``. Override or extend them with
+``MODEL_PRICES``, a JSON object such as ``{"my-model": [0.2, 0.8]}``. Model names are matched
+exactly, then by the longest known prefix (so dated snapshots like ``gpt-4o-mini-2024-07-18``
+use the ``gpt-4o-mini`` price).
+"""
+
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from typing import Any, Iterable
+
+DEFAULT_PRICES_PER_1M: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+
+@lru_cache(maxsize=1)
+def model_prices() -> dict[str, tuple[float, float]]:
+    from src.config import settings
+
+    prices = dict(DEFAULT_PRICES_PER_1M)
+    if settings.model_prices.strip():
+        for model, (prompt, completion) in json.loads(settings.model_prices).items():
+            prices[model] = (float(prompt), float(completion))
+    return prices
+
+
+def price_for(model: str) -> tuple[float, float] | None:
+    prices = model_prices()
+    if model in prices:
+        return prices[model]
+    prefixes = [name for name in prices if model.startswith(name)]
+    return prices[max(prefixes, key=len)] if prefixes else None
+
+
+def usage_record(node: str, response: Any) -> dict[str, Any]:
+    """``{"node", "model", "prompt_tokens", "completion_tokens"}`` for one chat completion response."""
+
+    usage = getattr(response, "usage", None)
+    return {
+        "node": node,
+        "model": str(getattr(response, "model", "") or ""),
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+    }
+
+
+def estimate_cost_usd(records: Iterable[dict[str, Any]]) -> float | None:
+    """Summed cost of ``usage_record`` rows; None when any model has no known price."""
+
+    total = 0.0
+    for record in records:
+        price = price_for(record["model"])
+        if price is None:
+            return None
+        total += (record["prompt_tokens"] * price[0] + record["completion_tokens"] * price[1]) / 1e6
+    return total
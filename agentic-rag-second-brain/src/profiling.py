@@ -0,0 +1,244 @@
+"""Opt-in profiling for single query and ingestion calls.
+
+Enable with ``PROFILE=1`` (every hook) or a comma-separated list of labels, e.g.
+``PROFILE=agentic,index``. Hooked calls: ``run_agentic_rag`` (``agentic``), ``baseline_rag_answer``
+(``baseline``) and ``build_or_load_index`` (``index``). Each profiled call writes to ``PROFILE_DIR``:
+
+- ``<stem>.prof``: cProfile stats (``python -m pstats``, snakeviz)
+- ``<stem>.pstats.txt``: top functions by cumulative time
+- ``<stem>.collapsed``: sampled stacks in collapsed format (``flamegraph.pl``, speedscope)
+- ``<stem>.allocations.txt``: tracemalloc top allocations and peak traced memory for the call
+
+When disabled, a hook costs one cached set lookup per call. Only one call is profiled at a time
+per process, because cProfile and tracemalloc are process-wide; concurrent calls run unprofiled.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+PROFILE_LABELS = ("agentic", "baseline", "index")
+
+_PROJECT_DIR = str(Path(__file__).resolve().parent)
+_enabled_labels: frozenset[str] | None = None
+_active = threading.Lock()
+
+
+@dataclass
+class ProfileReport:
+    label: str
+    wall_s: float = 0.0
+    peak_traced_bytes: int = 0
+    samples: int = 0
+    paths: dict[str, Path] = field(default_factory=dict)
+
+
+def _parse_labels(value: str) -> frozenset[str]:
+    value = value.strip().lower()
+    if value in ("", "0", "false", "off", "none"):
+        return frozenset()
+    if value in ("1", "true", "on", "all"):
+        return frozenset(PROFILE_LABELS)
+    return frozenset(label.strip() for label in value.split(",") if label.strip())
+
+
+def enabled_labels() -> frozenset[str]:
+    global _enabled_labels
+    if _enabled_labels is None:
+        from src.config import settings
+
+        _enabled_labels = _parse_labels(settings.profile)
+    return _enabled_labels
+
+
+def set_profiling(labels: str | None) -> None:
+    """Override ``PROFILE`` at runtime (``None`` re-reads ``Settings`` on the next call)."""
+
+    global _enabled_labels
+    _enabled_labels = None if labels is None else _parse_labels(labels)
+
+
+def is_enabled(label: str) -> bool:
+    return label in enabled_labels()
+
+
+_IDLE_FUNCTIONS = frozenset({"select", "poll", "wait", "_wait_for_tstate_lock", "acquire"})
+
+
+def _project_frame(frame) -> bool:
+    return frame.f_code.co_filename.startswith(_PROJECT_DIR)
+
+
+def _busy_in_project(frame) -> bool:
+    """True for a thread running project code that is not parked in a wait (idle loops, pools)."""
+
+    if frame.f_code.co_name in _IDLE_FUNCTIONS:
+        return False
+    while frame is not None:
+        if _project_frame(frame):
+            return True
+        frame = frame.f_back
+    return False
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _StackSampler:
+    """Samples the profiled thread, plus other threads while they are busy in project code."""
+
+    def __init__(self, target_thread_id: int, interval_s: float):
+        self.target_thread_id = target_thread_id
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval_s):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != self.target_thread_id and not _busy_in_project(frame):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self.stacks[f"{names.get(thread_id, thread_id)};{_collapse(frame)}"] += 1
+
+    def __enter__(self) -> "_StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _output_stem(label: str) -> Path:
+    from src.config import settings
+
+    out_dir = Path(settings.profile_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}-{time.perf_counter_ns() % 10**6:06d}"
+
+
+def _write_reports(report: ProfileReport, profiler, sampler: _StackSampler, before, after, top_n: int) -> None:
+    import pstats
+    import tracemalloc
+
+    stem = _output_stem(report.label)
+    report.paths["prof"] = stem.with_suffix(".prof")
+    profiler.dump_stats(report.paths["prof"])
+
+    report.paths["pstats"] = stem.with_suffix(".pstats.txt")
+    with report.paths["pstats"].open("w", encoding="utf-8") as handle:
+        stats = pstats.Stats(profiler, stream=handle)
+        stats.sort_stats("cumulative").print_stats(top_n)
+
+    report.paths["collapsed"] = stem.with_suffix(".collapsed")
+    report.paths["collapsed"].write_text(
+        "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common()),
+        encoding="utf-8",
+    )
+
+    report.paths["allocations"] = stem.with_suffix(".allocations.txt")
+    lines = [
+        f"{report.label}: wall {report.wall_s * 1000:.1f} ms, peak traced {report.peak_traced_bytes / 1e6:.2f} MB",
+        f"top {top_n} allocation sites still held after the call (size delta, count delta):",
+    ]
+    ignore = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+    for stat in after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")[:top_n]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d}  {frame.filename}:{frame.lineno}"
+        )
+    report.paths["allocations"].write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@contextmanager
+def profile_block(label: str, *, force: bool = False) -> Iterator[ProfileReport | None]:
+    """Profile the enclosed block when ``label`` is enabled (or ``force``); yields the report or None."""
+
+    if not (force or is_enabled(label)) or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    import cProfile
+    import tracemalloc
+
+    from src.config import settings
+
+    report = ProfileReport(label=label)
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start(int(settings.profile_traceback_depth))
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        sampler = _StackSampler(threading.get_ident(), float(settings.profile_sample_interval_ms) / 1000)
+        started = time.perf_counter()
+        with sampler:
+            profiler.enable()
+            try:
+                yield report
+            finally:
+                profiler.disable()
+                report.wall_s = time.perf_counter() - started
+        report.peak_traced_bytes = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        report.samples = sampler.samples
+        _write_reports(report, profiler, sampler, before, after, int(settings.profile_top_n))
+        stem = report.paths["prof"].with_suffix("")
+        print(f"profile[{label}]: {report.wall_s * 1000:.1f} ms -> {stem}.*", file=sys.stderr)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _active.release()
+
+
+def profiled(label: str) -> Callable:
+    """Decorator: run the wrapped call under ``profile_block(label)`` when profiling is enabled."""
+
+    def decorate(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if label not in enabled_labels():
+                    return await func(*args, **kwargs)
+                with profile_block(label):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if label not in enabled_labels():
+                return func(*args, **kwargs)
+            with profile_block(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 import json
+import time
 from typing import Any
 
-from openai import OpenAI
-
+from src.adaptive_k import AdaptiveKConfig
+from src.diversify import DiversifyConfig
+from src.pricing import usage_record
+from src.profiling import profiled
 from src.prompts import (
     BASELINE_OUTPUT_JSON_SCHEMA,
     BASELINE_SYSTEM_PROMPT,
     BASELINE_USER_PROMPT_TEMPLATE,
 )
-from src.retrieval import retrieve_chunks
+from src.retrieval import aretrieve_chunks, retrieve_chunks
 
 
 def build_context(chunks: list[dict[str, Any]], max_context_chars: int) -> str:
@@ -29,34 +32,29 @@ def build_context(chunks: list[dict[str, Any]], max_context_chars: int) -> str:
     return "\n".join(parts)
 
 
-def baseline_rag_answer(
-    index,
-    query: str,
-    *,
-    top_k: int,
-    model: str,
-    temperature: float,
-    max_context_chars: int,
-) -> dict[str, Any]:
-    chunks = retrieve_chunks(index=index, query=query, top_k=top_k)
-    context = build_context(chunks=chunks, max_context_chars=max_context_chars)
-
-    client = OpenAI()
-    response = client.chat.completions.create(
-        model=model,
-        temperature=temperature,
-        response_format={"type": "json_schema", "json_schema": BASELINE_OUTPUT_JSON_SCHEMA},
-        messages=[
+def _baseline_request(query: str, context: str, *, model: str, temperature: float) -> dict[str, Any]:
+    return {
+        "model": model,
+        "temperature": temperature,
+        "response_format": {"type": "json_schema", "json_schema": BASELINE_OUTPUT_JSON_SCHEMA},
+        "messages": [
             {"role": "system", "content": BASELINE_SYSTEM_PROMPT},
             {
                 "role": "user",
                 "content": BASELINE_USER_PROMPT_TEMPLATE.format(question=query, context=context),
             },
         ],
-    )
+    }
 
-    content = response.choices[0].message.content or "{}"
-    parsed = json.loads(content)
+
+def _baseline_result(
+    query: str,
+    response,
+    chunks: list[dict[str, Any]],
+    started: float,
+    retrieved: float,
+) -> dict[str, Any]:
+    parsed = json.loads(response.choices[0].message.content or "{}")
 
     return {
         "query": query,
@@ -64,4 +62,68 @@ def baseline_rag_answer(
         "citations": parsed.get("citations", []),
         "notes": parsed.get("notes", ""),
         "retrieved_chunks": chunks,
+        "node_latency_s": {"retrieve": retrieved - started, "generate": time.perf_counter() - retrieved},
+        "llm_usage": [usage_record("generate", response)],
     }
+
+
+@profiled("baseline")
+def baseline_rag_answer(
+    index,
+    query: str,
+    *,
+    top_k: int,
+    model: str,
+    temperature: float,
+    max_context_chars: int,
+    diversify: DiversifyConfig | None = None,
+    adaptive_k: AdaptiveKConfig | None = None,
+) -> dict[str, Any]:
+    started = time.perf_counter()
+    chunks = retrieve_chunks(index=index, query=query, top_k=top_k, diversify=diversify, adaptive=adaptive_k)
+    retrieved = time.perf_counter()
+    context = build_context(chunks=chunks, max_context_chars=max_context_chars)
+
+    from src.rate_limit import openai_client
+
+    client = openai_client()
+    response = client.chat.completions.create(
+        **_baseline_request(query, context, model=model, temperature=temperature)
+    )
+    return _baseline_result(query, response, chunks, started, retrieved)
+
+
+async def abaseline_rag_answer(
+    index,
+    query: str,
+    *,
+    top_k: int,
+    model: str,
+    temperature: float,
+    max_context_chars: int,
+    diversify: DiversifyConfig | None = None,
+    adaptive_k: AdaptiveKConfig | None = None,
+    client=None,
+) -> dict[str, Any]:
+    """Async ``baseline_rag_answer``. Pass a shared ``AsyncOpenAI`` ``client`` to reuse its connection pool.
+
+    Without one, a client is created and closed for this call (``RagRuntime`` keeps one per event loop).
+    """
+
+    started = time.perf_counter()
+    chunks = await aretrieve_chunks(
+        index=index, query=query, top_k=top_k, diversify=diversify, adaptive=adaptive_k
+    )
+    retrieved = time.perf_counter()
+    context = build_context(chunks=chunks, max_context_chars=max_context_chars)
+
+    request = _baseline_request(query, context, model=model, temperature=temperature)
+    if client is not None:
+        response = await client.chat.completions.create(**request)
+    else:
+        from src.rate_limit import async_openai_client
+
+        # A one-off client owns its connection pool, so close it rather than leak it.
+        async with async_openai_client() as owned:
+            response = await owned.chat.completions.create(**request)
+    return _baseline_result(query, response, chunks, started, retrieved)
@@ -0,0 +1,381 @@
+"""Process-wide OpenAI rate limiting and retry policy.
+
+Every OpenAI client in the project (chat calls in the graph, baseline and eval judge, query and
+document embeddings) is built by ``openai_client``, ``async_openai_client`` or ``openai_embedding``.
+Their HTTP transport passes each request through one shared ``RateLimiter`` before it is sent:
+
+- per model, a requests-per-minute and a tokens-per-minute token bucket. Tokens are estimated from the
+  request (about 4 characters per token, plus ``max_tokens`` for chat) and corrected from the
+  response's ``usage`` once it arrives. Callers reserve capacity in arrival order and sleep until
+  their reservation is covered, so concurrent eval, ingestion and serving share the quota instead of
+  racing for it.
+- 429 and 5xx responses and connection errors are retried with full-jitter exponential backoff. A
+  429's ``Retry-After`` also pauses new requests for that model, so one throttle does not become a
+  burst of them. The SDK's own retries are turned off to avoid retrying twice.
+
+Limits come from ``RATE_LIMIT_RPM`` / ``RATE_LIMIT_TPM`` (``0`` = unlimited) and per-model overrides in
+``RATE_LIMITS``, a JSON object such as ``{"gpt-4o-mini": [500, 200000]}`` (rpm, tpm) matched exactly,
+then by longest prefix. Buckets hold ``RATE_LIMIT_BURST_S`` seconds of quota. Queueing metrics are in
+``rate_limiter().metrics``, per model: ``ratelimit.<model>.wait_s`` histogram, ``.waiting`` gauge and
+``.requests``, ``.tokens``, ``.retries``, ``.throttled`` counters.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from src.metrics import MetricsRegistry
+
+if TYPE_CHECKING:
+    import httpx
+
+CHARS_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 256
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Reservation-style token bucket: ``reserve`` always succeeds and returns how long to wait."""
+
+    def __init__(self, per_minute: float, burst_s: float = 10.0):
+        self.rate_per_s = per_minute / 60.0
+        self.capacity = max(1.0, self.rate_per_s * burst_s)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` now, going into debt if needed; seconds until the debt is paid back."""
+
+        with self._lock:
+            self._refill(time.monotonic())
+            # A single request larger than the bucket waits for a full bucket rather than forever.
+            self._level -= min(amount, self.capacity)
+            return max(0.0, -self._level / self.rate_per_s)
+
+    def adjust(self, amount: float) -> None:
+        """Return (positive) or charge (negative) tokens after the real cost is known."""
+
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 6
+    backoff_s: float = 0.5
+    backoff_max_s: float = 30.0
+
+    def delay(self, attempt: int, retry_after_s: float | None = None) -> float:
+        """Full-jitter exponential backoff, floored at the server's ``Retry-After``."""
+
+        if retry_after_s is not None:
+            return min(self.backoff_max_s, retry_after_s) + random.uniform(0.0, self.backoff_s)
+        return random.uniform(0.0, min(self.backoff_max_s, self.backoff_s * 2**attempt))
+
+
+class _ModelLimit:
+    def __init__(self, rpm: float, tpm: float, burst_s: float):
+        self.requests = TokenBucket(rpm, burst_s) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, burst_s) if tpm > 0 else None
+        self.paused_until = 0.0
+
+
+class RateLimiter:
+    """Per-model RPM/TPM buckets shared by every client in the process."""
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, float]] | None = None,
+        *,
+        default_rpm: float = 0.0,
+        default_tpm: float = 0.0,
+        burst_s: float = 10.0,
+        retry: RetryPolicy | None = None,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.limits = dict(limits or {})
+        self.default_limit = (default_rpm, default_tpm)
+        self.burst_s = burst_s
+        self.retry = retry or RetryPolicy()
+        self.metrics = metrics or MetricsRegistry()
+        self._models: dict[str, _ModelLimit] = {}
+        self._waiting: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, model: str) -> tuple[float, float]:
+        if model in self.limits:
+            return self.limits[model]
+        prefixes = [name for name in self.limits if model.startswith(name)]
+        return self.limits[max(prefixes, key=len)] if prefixes else self.default_limit
+
+    def _model(self, model: str) -> _ModelLimit:
+        with self._lock:
+            state = self._models.get(model)
+            if state is None:
+                state = self._models[model] = _ModelLimit(*self.limit_for(model), self.burst_s)
+            return state
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Reserve one request and ``tokens`` for ``model``; returns the wait in seconds."""
+
+        state = self._model(model)
+        wait = max(0.0, state.paused_until - time.monotonic())
+        if state.requests is not None:
+            wait = max(wait, state.requests.reserve(1))
+        if state.tokens is not None:
+            wait = max(wait, state.tokens.reserve(tokens))
+        self.metrics.increment(f"ratelimit.{model}.requests")
+        self.metrics.histogram(f"ratelimit.{model}.wait_s").observe(wait)
+        return wait
+
+    def _waiting_delta(self, model: str, delta: int) -> None:
+        with self._lock:
+            self._waiting[model] = self._waiting.get(model, 0) + delta
+            self.metrics.set_gauge(f"ratelimit.{model}.waiting", self._waiting[model])
+
+    def acquire(self, model: str, tokens: int) -> None:
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            self._waiting_delta(model, 1)
+            try:
+                time.sleep(wait)
+            finally:
+                self._waiting_delta(model, -1)
+
+    async def aacquire(self, model: str, tokens: int) -> None:
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            self._waiting_delta(model, 1)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting_delta(model, -1)
+
+    def settle(self, model: str, estimated: int, actual: int | None) -> None:
+        """Correct the token bucket once the response reports real usage."""
+
+        if actual is None:
+            actual = estimated
+        self.metrics.increment(f"ratelimit.{model}.tokens", actual)
+        state = self._model(model)
+        if state.tokens is not None and actual != estimated:
+            state.tokens.adjust(estimated - actual)
+
+    def throttled(self, model: str, retry_after_s: float | None) -> None:
+        """Record a 429; with ``Retry-After``, hold new requests for the model until it passes."""
+
+        self.metrics.increment(f"ratelimit.{model}.throttled")
+        if retry_after_s:
+            state = self._model(model)
+            with self._lock:
+                state.paused_until = max(state.paused_until, time.monotonic() + retry_after_s)
+
+
+def estimate_tokens(body: dict[str, Any]) -> int:
+    """Rough token cost of a chat or embeddings request body, counted like the API's TPM limit."""
+
+    if "messages" in body:
+        chars = sum(len(json.dumps(message.get("content", ""))) for message in body["messages"])
+        completion = body.get("max_completion_tokens") or body.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+        return chars // CHARS_PER_TOKEN + int(completion)
+    inputs = body.get("input", "")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    return sum(len(text) if isinstance(text, str) else len(text or ()) for text in inputs) // CHARS_PER_TOKEN + 1
+
+
+def _request_model(request: "httpx.Request") -> tuple[str | None, int]:
+    if request.method != "POST" or not request.content:
+        return None, 0
+    try:
+        body = json.loads(request.content)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None, 0
+    if not isinstance(body, dict) or "model" not in body:
+        return None, 0
+    return str(body["model"]), estimate_tokens(body)
+
+
+def _usage_tokens(response: "httpx.Response") -> int | None:
+    if "application/json" not in response.headers.get("content-type", ""):
+        return None
+    try:
+        usage = json.loads(response.content).get("usage") or {}
+    except (UnicodeDecodeError, json.JSONDecodeError, AttributeError):
+        return None
+    total = usage.get("total_tokens")
+    return int(total) if total is not None else None
+
+
+def _retry_after_s(response: "httpx.Response") -> float | None:
+    for header, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return float(value) / scale
+            except ValueError:
+                continue
+    return None
+
+
+class _TransportMixin:
+    def __init__(self, inner, limiter: RateLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def _retry_delay(self, model: str, attempt: int, response=None) -> float:
+        retry_after = _retry_after_s(response) if response is not None else None
+        if response is not None and response.status_code == 429:
+            self.limiter.throttled(model, retry_after)
+        self.limiter.metrics.increment(f"ratelimit.{model}.retries")
+        return self.limiter.retry.delay(attempt, retry_after)
+
+
+def _make_transports():
+    import httpx
+
+    class RateLimitedTransport(_TransportMixin, httpx.BaseTransport):
+        def handle_request(self, request: httpx.Request) -> httpx.Response:
+            model, estimated = _request_model(request)
+            if model is None:
+                return self.inner.handle_request(request)
+            for attempt in range(self.limiter.retry.max_retries + 1):
+                self.limiter.acquire(model, estimated)
+                try:
+                    response = self.inner.handle_request(request)
+                except httpx.TransportError:
+                    if attempt == self.limiter.retry.max_retries:
+                        raise
+                    time.sleep(self._retry_delay(model, attempt))
+                    continue
+                if response.status_code not in RETRY_STATUSES or attempt == self.limiter.retry.max_retries:
+                    break
+                response.read()
+                response.close()
+                time.sleep(self._retry_delay(model, attempt, response))
+            if "text/event-stream" not in response.headers.get("content-type", ""):
+                response.read()
+                self.limiter.settle(model, estimated, _usage_tokens(response))
+            return response
+
+        def close(self) -> None:
+            self.inner.close()
+
+    class AsyncRateLimitedTransport(_TransportMixin, httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            model, estimated = _request_model(request)
+            if model is None:
+                return await self.inner.handle_async_request(request)
+            for attempt in range(self.limiter.retry.max_retries + 1):
+                await self.limiter.aacquire(model, estimated)
+                try:
+                    response = await self.inner.handle_async_request(request)
+                except httpx.TransportError:
+                    if attempt == self.limiter.retry.max_retries:
+                        raise
+                    await asyncio.sleep(self._retry_delay(model, attempt))
+                    continue
+                if response.status_code not in RETRY_STATUSES or attempt == self.limiter.retry.max_retries:
+                    break
+                await response.aread()
+                await response.aclose()
+                await asyncio.sleep(self._retry_delay(model, attempt, response))
+            if "text/event-stream" not in response.headers.get("content-type", ""):
+                await response.aread()
+                self.limiter.settle(model, estimated, _usage_tokens(response))
+            return response
+
+        async def aclose(self) -> None:
+            await self.inner.aclose()
+
+    return RateLimitedTransport, AsyncRateLimitedTransport
+
+
+@lru_cache(maxsize=1)
+def rate_limiter() -> RateLimiter:
+    """The process-wide limiter, configured from ``Settings`` on first use."""
+
+    from src.config import settings
+
+    limits = {}
+    if settings.rate_limits.strip():
+        limits = {model: (float(rpm), float(tpm)) for model, (rpm, tpm) in json.loads(settings.rate_limits).items()}
+    return RateLimiter(
+        limits,
+        default_rpm=float(settings.rate_limit_rpm),
+        default_tpm=float(settings.rate_limit_tpm),
+        burst_s=float(settings.rate_limit_burst_s),
+        retry=RetryPolicy(
+            max_retries=int(settings.rate_limit_max_retries),
+            backoff_s=float(settings.rate_limit_backoff_s),
+            backoff_max_s=float(settings.rate_limit_backoff_max_s),
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def _transport_classes():
+    return _make_transports()
+
+
+def http_client() -> "httpx.Client":
+    """A new ``httpx.Client`` whose requests go through ``rate_limiter()``."""
+
+    import httpx
+    from openai import DEFAULT_TIMEOUT
+
+    transport_cls = _transport_classes()[0]
+    return httpx.Client(transport=transport_cls(httpx.HTTPTransport(), rate_limiter()), timeout=DEFAULT_TIMEOUT)
+
+
+def async_http_client() -> "httpx.AsyncClient":
+    import httpx
+    from openai import DEFAULT_TIMEOUT
+
+    transport_cls = _transport_classes()[1]
+    return httpx.AsyncClient(
+        transport=transport_cls(httpx.AsyncHTTPTransport(), rate_limiter()), timeout=DEFAULT_TIMEOUT
+    )
+
+
+@lru_cache(maxsize=1)
+def openai_client():
+    """Shared, thread-safe ``OpenAI`` client (one connection pool per process)."""
+
+    from openai import OpenAI
+
+    return OpenAI(http_client=http_client(), max_retries=0)
+
+
+def async_openai_client():
+    """A new ``AsyncOpenAI`` client; its connection pool belongs to the running event loop."""
+
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(http_client=async_http_client(), max_retries=0)
+
+
+def openai_embedding(model: str):
+    """LlamaIndex ``OpenAIEmbedding`` whose sync and async calls share the rate limiter."""
+
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    return OpenAIEmbedding(
+        model=model,
+        max_retries=0,
+        http_client=http_client(),
+        async_http_client=async_http_client(),
+    )
@@ -0,0 +1,56 @@
+"""Recency helpers: query phrasings that ask for the newest guidance, and note date parsing.
+
+Shared by the agentic graph (evidence grading and retry rewrites), ``PartitionedIndex`` (which
+partitions a query searches) and ``IndexHandle`` (the latest corpus date recomputed on every swap),
+so none of them has to import another.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+RECENCY_HINT_TOKENS = (
+    "current",
+    "latest",
+    "most recent",
+    "best",
+    "should we use",
+    "recommended",
+    "recommendation",
+)
+
+
+def parse_doc_date(value: str) -> datetime | None:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def latest_doc_date_from_chunks(chunks: list[dict[str, Any]]) -> datetime | None:
+    dates = [parse_doc_date(chunk.get("doc_date", "")) for chunk in chunks]
+    valid = [date for date in dates if date is not None]
+    return max(valid) if valid else None
+
+
+def latest_doc_date_from_corpus(raw_notes_dir: Path | str) -> datetime | None:
+    """Newest ``YYYY-MM-DD-`` file name prefix among the notes in ``raw_notes_dir``."""
+
+    notes_path = Path(raw_notes_dir)
+    if not notes_path.exists():
+        return None
+
+    latest: datetime | None = None
+    for note_file in notes_path.glob("*.md"):
+        match = re.match(r"(\d{4}-\d{2}-\d{2})-", note_file.name)
+        if not match:
+            continue
+        maybe_date = parse_doc_date(match.group(1))
+        if maybe_date is None:
+            continue
+        if latest is None or maybe_date > latest:
+            latest = maybe_date
+    return latest
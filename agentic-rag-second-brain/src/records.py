@@ -0,0 +1,121 @@
+"""Compact records for retrieved chunks and graph trace entries.
+
+``ChunkRecord`` replaces the per-hit row dict: a slotted dataclass with a fixed set of fields, so a
+row costs one small object instead of a dict plus its key table. It keeps the dict-style access the
+rest of the code (and notebooks) use (``row["chunk_id"]``, ``row.get(...)``, ``dict(row)``,
+``{**row}``); ``rrf_score`` and ``query_hits`` only appear as keys once fusion has set them.
+
+``TraceEvent`` is one ``decision_trace`` entry: a step name, a short detail and, for retrieval, the
+retrieved records themselves. It renders to the familiar ``"step: detail"`` string with ``str()``,
+so the chunk summary is only formatted when someone reads the trace.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, fields, replace
+from typing import Any, ClassVar, Iterator
+
+
+@dataclass(slots=True)
+class ChunkRecord:
+    score: float | None
+    text: str
+    doc_title: str = ""
+    doc_date: str = ""
+    chunk_id: str = ""
+    source_path: str = ""
+    node_id: str = ""
+    rrf_score: float | None = None
+    query_hits: int | None = None
+
+    ROW_KEYS: ClassVar[tuple[str, ...]] = (
+        "score",
+        "text",
+        "doc_title",
+        "doc_date",
+        "chunk_id",
+        "source_path",
+        "node_id",
+    )
+    FUSION_KEYS: ClassVar[tuple[str, ...]] = ("rrf_score", "query_hits")
+
+    @classmethod
+    def from_mapping(cls, row: Mapping[str, Any]) -> "ChunkRecord":
+        if isinstance(row, ChunkRecord):
+            return row
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in row.items() if key in names})
+
+    def keys(self) -> list[str]:
+        return [*self.ROW_KEYS, *(key for key in self.FUSION_KEYS if getattr(self, key) is not None)]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.ROW_KEYS or (key in self.FUSION_KEYS and getattr(self, key) is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.ROW_KEYS and key not in self.FUSION_KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.keys()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self) -> list[tuple[str, Any]]:
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def values(self) -> list[Any]:
+        return [getattr(self, key) for key in self.keys()]
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.items())
+
+    def with_fusion(self) -> "ChunkRecord":
+        """Copy with zeroed ``rrf_score`` and ``query_hits`` (the text is shared, not copied)."""
+
+        return replace(self, rrf_score=0.0, query_hits=0)
+
+
+Mapping.register(ChunkRecord)
+
+
+@dataclass(slots=True, frozen=True)
+class TraceEvent:
+    step: str
+    detail: str = ""
+    chunks: tuple[ChunkRecord, ...] = ()
+
+    def __str__(self) -> str:
+        if self.chunks:
+            return f"{self.step}: " + ", ".join(
+                f"{chunk.chunk_id}|{chunk.doc_date}|{chunk.doc_title}" for chunk in self.chunks
+            )
+        return f"{self.step}: {self.detail}"
+
+    def __contains__(self, text: str) -> bool:
+        return text in str(self)
+
+    def startswith(self, prefix: str) -> bool:
+        return str(self).startswith(prefix)
+
+
+def json_default(value: Any) -> Any:
+    """``json.dumps`` fallback: records become dicts, trace events and anything else strings."""
+
+    if isinstance(value, ChunkRecord):
+        return value.to_dict()
+    return str(value)
@@ -1,53 +1,338 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Sequence
 
-import chromadb
-from llama_index.core import VectorStoreIndex
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
+from src.index_store import (
+    EMBED_DIM_KEY,
+    EMBED_MODEL_KEY,
+    _get_collection,
+    _manifest_embed_model,
+    active_collection_name,
+    check_embedding_model,
+)
+from src.records import ChunkRecord
 
-from src.index_store import COLLECTION_NAME
+if TYPE_CHECKING:
+    from llama_index.core import VectorStoreIndex
 
+    from src.adaptive_k import AdaptiveKConfig
+    from src.diversify import DiversifyConfig
+
+QUERY_EMBEDDING_CACHE_SIZE = 256
+_query_embedding_cache: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+_query_embedding_lock = threading.Lock()
+
+
+def load_persisted_index(
+    chroma_dir: Path | str,
+    embed_model: str,
+    collection_name: str | None = None,
+) -> VectorStoreIndex:
+    """Load the persisted index.
+
+    A ``SnapshotIndex``, ``PartitionedIndex`` or ``TwoStageIndex`` is returned when the matching
+    manifest exists. Otherwise ``collection_name`` (default: the active collection) is loaded.
+    ``EmbeddingModelMismatchError`` is raised when the index records another embedding model.
+    """
+
+    from src.snapshot import SnapshotIndex, read_snapshot_manifest
 
-def load_persisted_index(chroma_dir: Path | str, embed_model: str) -> VectorStoreIndex:
     chroma_path = Path(chroma_dir)
     if not chroma_path.exists() or not any(chroma_path.iterdir()):
         raise FileNotFoundError(
             f"Persisted Chroma directory not found or empty: {chroma_path}. "
             "Run notebooks/02_indexing_chroma_llamaindex.ipynb first."
         )
+    snapshot_manifest = read_snapshot_manifest(chroma_path)
+    if snapshot_manifest:
+        check_embedding_model(
+            snapshot_manifest.get("embed_model"),
+            embed_model,
+            where=f"Snapshot {chroma_path}",
+            recorded_dim=snapshot_manifest.get("dim"),
+        )
+        return SnapshotIndex(chroma_path, embed_model=embed_model)
+
+    import chromadb
+    from llama_index.core import VectorStoreIndex
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
+    from src.config import settings
+    from src.matryoshka import TwoStageIndex, read_two_stage_manifest
+    from src.partitions import PartitionedIndex, read_partition_manifest
+    from src.rate_limit import openai_embedding
+
+    manifest = read_partition_manifest(chroma_path)
+    if manifest:
+        check_embedding_model(manifest.get("embed_model"), embed_model, where=f"Partitioned index {chroma_path}")
+        return PartitionedIndex(
+            chroma_dir=chroma_path,
+            embed_model=embed_model,
+            manifest=manifest,
+            recent_partitions=int(settings.recent_partitions),
+        )
+    two_stage = read_two_stage_manifest(chroma_path)
+    if two_stage:
+        check_embedding_model(two_stage.get("embed_model"), embed_model, where=f"Two-stage index {chroma_path}")
+        return TwoStageIndex(
+            chroma_dir=chroma_path,
+            embed_model=embed_model,
+            rescore_candidates=int(settings.rescore_candidates),
+        )
 
+    collection_name = collection_name or active_collection_name(chroma_path)
     chroma_client = chromadb.PersistentClient(path=str(chroma_path))
-    collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
-    if collection.count() == 0:
+    collection = _get_collection(chroma_client, collection_name)
+    if collection is None or collection.count() == 0:
         raise FileNotFoundError(
-            f"Chroma collection '{COLLECTION_NAME}' has no vectors at {chroma_path}. "
+            f"Chroma collection '{collection_name}' has no vectors at {chroma_path}. "
             "Run notebooks/02_indexing_chroma_llamaindex.ipynb first."
         )
+    metadata = collection.metadata or {}
+    check_embedding_model(
+        metadata.get(EMBED_MODEL_KEY) or _manifest_embed_model(chroma_path, collection_name),
+        embed_model,
+        where=f"Collection '{collection_name}' in {chroma_path}",
+        recorded_dim=metadata.get(EMBED_DIM_KEY),
+    )
 
     vector_store = ChromaVectorStore(chroma_collection=collection)
-    embedding = OpenAIEmbedding(model=embed_model)
+    embedding = openai_embedding(embed_model)
     return VectorStoreIndex.from_vector_store(vector_store=vector_store, embed_model=embedding)
 
 
-def retrieve_chunks(index: VectorStoreIndex, query: str, top_k: int) -> list[dict[str, Any]]:
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    results = retriever.retrieve(query)
-
-    rows: list[dict[str, Any]] = []
+def _rows_from_results(results) -> list[ChunkRecord]:
+    rows: list[ChunkRecord] = []
     for result in results:
         node = result.node
+        metadata = node.metadata
         rows.append(
-            {
-                "score": float(result.score) if result.score is not None else None,
-                "text": node.get_content(),
-                "doc_title": node.metadata.get("doc_title", ""),
-                "doc_date": node.metadata.get("doc_date", ""),
-                "chunk_id": node.metadata.get("chunk_id", ""),
-                "source_path": node.metadata.get("source_path", ""),
-            }
+            ChunkRecord(
+                score=float(result.score) if result.score is not None else None,
+                text=node.get_content(),
+                doc_title=metadata.get("doc_title", ""),
+                doc_date=metadata.get("doc_date", ""),
+                chunk_id=metadata.get("chunk_id", ""),
+                source_path=metadata.get("source_path", ""),
+                node_id=node.node_id,
+            )
         )
 
     return rows
+
+
+def _cached_query_embedding(key: tuple[str, str]) -> list[float] | None:
+    with _query_embedding_lock:
+        embedding = _query_embedding_cache.get(key)
+        if embedding is not None:
+            _query_embedding_cache.move_to_end(key)
+        return embedding
+
+
+def _store_query_embedding(key: tuple[str, str], embedding: list[float]) -> list[float]:
+    with _query_embedding_lock:
+        _query_embedding_cache[key] = embedding
+        _query_embedding_cache.move_to_end(key)
+        while len(_query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+            _query_embedding_cache.popitem(last=False)
+    return embedding
+
+
+def clear_query_embedding_cache() -> None:
+    """Forget cached query embeddings, e.g. so a benchmark run pays for its own embedding calls."""
+
+    with _query_embedding_lock:
+        _query_embedding_cache.clear()
+
+
+def embed_query(embed_model, query: str) -> list[float]:
+    """Query embedding with a small LRU cache, so later stages reuse the retrieval embedding."""
+
+    key = (getattr(embed_model, "model_name", type(embed_model).__name__), query)
+    embedding = _cached_query_embedding(key)
+    if embedding is None:
+        embedding = _store_query_embedding(key, embed_model.get_query_embedding(query))
+    return embedding
+
+
+async def aembed_query(embed_model, query: str) -> list[float]:
+    key = (getattr(embed_model, "model_name", type(embed_model).__name__), query)
+    embedding = _cached_query_embedding(key)
+    if embedding is None:
+        embedding = _store_query_embedding(key, await embed_model.aget_query_embedding(query))
+    return embedding
+
+
+def _embed_model(index):
+    return getattr(index, "embed_model", None) or index._embed_model
+
+
+def stored_embeddings(index: VectorStoreIndex, node_ids: Sequence[str]) -> dict[str, list[float]]:
+    """Embeddings already stored for ``node_ids`` (no re-embedding), keyed by node id."""
+
+    if hasattr(index, "stored_embeddings"):
+        return index.stored_embeddings(node_ids)
+    found = index.vector_store.client.get(ids=list(node_ids), include=["embeddings"])
+    return {node_id: embedding for node_id, embedding in zip(found["ids"], found["embeddings"])}
+
+
+def diversify_chunks(
+    index: VectorStoreIndex,
+    query: str,
+    chunks: list[ChunkRecord],
+    top_k: int,
+    config: DiversifyConfig,
+) -> list[ChunkRecord]:
+    """Thin an over-fetched candidate list to at most ``top_k`` distinct chunks (MMR or threshold)."""
+
+    import numpy as np
+
+    from src.diversify import select_diverse
+
+    if not chunks:
+        return chunks
+    by_id = stored_embeddings(index, [chunk["node_id"] for chunk in chunks])
+    if any(chunk["node_id"] not in by_id for chunk in chunks):
+        return chunks[:top_k]
+    candidates = np.asarray([by_id[chunk["node_id"]] for chunk in chunks], dtype=np.float32)
+    query_embedding = embed_query(_embed_model(index), query)
+    return [chunks[i] for i in select_diverse(query_embedding, candidates, top_k, config)]
+
+
+def candidate_count(top_k: int, diversify: DiversifyConfig | None, adaptive: AdaptiveKConfig | None = None) -> int:
+    """How many candidates to fetch before adaptive k and diversification cut them to size."""
+
+    fetch_k = top_k
+    if diversify is not None and diversify.enabled:
+        fetch_k = max(fetch_k, diversify.fetch_k)
+    if adaptive is not None and adaptive.enabled:
+        fetch_k = max(fetch_k, adaptive.max_k)
+    return fetch_k
+
+
+def _keep_k(
+    candidates: list[ChunkRecord], top_k: int, adaptive: AdaptiveKConfig | None, score_key: str = "score"
+) -> int:
+    if adaptive is None or not adaptive.enabled:
+        return top_k
+    from src.adaptive_k import choose_k
+
+    return choose_k([chunk[score_key] for chunk in candidates], adaptive, default_k=top_k)
+
+
+def _select(
+    index: VectorStoreIndex,
+    query: str,
+    candidates: list[ChunkRecord],
+    top_k: int,
+    diversify: DiversifyConfig | None,
+    adaptive: AdaptiveKConfig | None,
+) -> list[ChunkRecord]:
+    k = _keep_k(candidates, top_k, adaptive)
+    if diversify is None or not diversify.enabled:
+        return candidates[:k]
+    return diversify_chunks(index, query, candidates, k, diversify)
+
+
+def retrieve_candidates(index: VectorStoreIndex, query: str, top_k: int) -> list[ChunkRecord]:
+    """Raw nearest-neighbour rows for ``query``, best first, without adaptive k or diversification."""
+
+    if hasattr(index, "retrieve_chunks"):
+        return index.retrieve_chunks(query, top_k)
+    from llama_index.core.schema import QueryBundle
+
+    retriever = index.as_retriever(similarity_top_k=top_k)
+    bundle = QueryBundle(query_str=query, embedding=embed_query(index._embed_model, query))
+    return _rows_from_results(retriever.retrieve(bundle))
+
+
+async def aretrieve_candidates(index: VectorStoreIndex, query: str, top_k: int) -> list[ChunkRecord]:
+    if hasattr(index, "aretrieve_chunks"):
+        return await index.aretrieve_chunks(query, top_k)
+    from llama_index.core.schema import QueryBundle
+
+    retriever = index.as_retriever(similarity_top_k=top_k)
+    bundle = QueryBundle(query_str=query, embedding=await aembed_query(index._embed_model, query))
+    return _rows_from_results(await retriever.aretrieve(bundle))
+
+
+def _row_key(row: ChunkRecord) -> str:
+    return str(row.get("node_id") or row.get("chunk_id") or row.get("text", ""))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[ChunkRecord]], rrf_k: int = 60) -> list[ChunkRecord]:
+    """Merge ranked candidate lists by summing ``1 / (rrf_k + rank)`` per chunk.
+
+    Fused rows keep their best vector ``score`` and gain ``rrf_score`` and ``query_hits`` (how many
+    lists contained the chunk); they are ordered by ``rrf_score``.
+    """
+
+    fused: dict[str, ChunkRecord] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            key = _row_key(row)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = ChunkRecord.from_mapping(row).with_fusion()
+            elif row["score"] is not None and (entry.score is None or row["score"] > entry.score):
+                entry.score = row["score"]
+            entry.rrf_score += 1.0 / (rrf_k + rank)
+            entry.query_hits += 1
+    return sorted(fused.values(), key=lambda row: row.rrf_score, reverse=True)
+
+
+def select_fused_chunks(
+    index: VectorStoreIndex,
+    query: str,
+    rankings: Sequence[Sequence[ChunkRecord]],
+    top_k: int,
+    diversify: DiversifyConfig | None = None,
+    adaptive: AdaptiveKConfig | None = None,
+    rrf_k: int = 60,
+) -> list[ChunkRecord]:
+    """Fuse per-query candidate lists, then apply adaptive k (on ``rrf_score``) and diversification.
+
+    ``query`` is the primary query MMR measures relevance against.
+    """
+
+    fused = reciprocal_rank_fusion(rankings, rrf_k)
+    k = _keep_k(fused, top_k, adaptive, score_key="rrf_score")
+    if diversify is None or not diversify.enabled:
+        return fused[:k]
+    return diversify_chunks(index, query, fused, k, diversify)
+
+
+def retrieve_chunks(
+    index: VectorStoreIndex,
+    query: str,
+    top_k: int,
+    diversify: DiversifyConfig | None = None,
+    adaptive: AdaptiveKConfig | None = None,
+) -> list[ChunkRecord]:
+    """Top-k chunk rows.
+
+    With ``adaptive``, up to ``max_k`` candidates are fetched and k is chosen from their scores
+    (``src/adaptive_k.py``); with ``diversify``, the k chunks are then picked for distinctness.
+    """
+
+    candidates = retrieve_candidates(index, query, candidate_count(top_k, diversify, adaptive))
+    return _select(index, query, candidates, top_k, diversify, adaptive)
+
+
+async def aretrieve_chunks(
+    index: VectorStoreIndex,
+    query: str,
+    top_k: int,
+    diversify: DiversifyConfig | None = None,
+    adaptive: AdaptiveKConfig | None = None,
+) -> list[ChunkRecord]:
+    """Async ``retrieve_chunks``: the query embedding is awaited instead of blocking a thread."""
+
+    candidates = await aretrieve_candidates(index, query, candidate_count(top_k, diversify, adaptive))
+    if diversify is None or not diversify.enabled:
+        return candidates[: _keep_k(candidates, top_k, adaptive)]
+    return await asyncio.to_thread(_select, index, query, candidates, top_k, diversify, adaptive)
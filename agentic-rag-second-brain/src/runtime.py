@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+from src.adaptive_k import AdaptiveKConfig
+from src.config import settings
+from src.diversify import DiversifyConfig
+from src.index_handle import IndexHandle
+from src.node_llm import NodeLLMConfig
+
+
+def _per_loop_async_client() -> Callable[[], Any]:
+    from src.graph import _async_client_factory
+
+    return _async_client_factory()
+
+
+def diversify_config_from_settings() -> DiversifyConfig | None:
+    if settings.diversify_mode == "none":
+        return None
+    return DiversifyConfig(
+        mode=settings.diversify_mode,
+        fetch_k=int(settings.diversify_fetch_k),
+        lambda_mult=float(settings.mmr_lambda),
+        duplicate_threshold=float(settings.dedup_threshold),
+    )
+
+
+def adaptive_k_config_from_settings() -> AdaptiveKConfig | None:
+    if settings.adaptive_k_mode == "none":
+        return None
+    return AdaptiveKConfig(
+        mode=settings.adaptive_k_mode,
+        min_k=int(settings.adaptive_min_k),
+        max_k=int(settings.adaptive_max_k),
+        gap=float(settings.adaptive_gap),
+        mass=float(settings.adaptive_mass),
+    )
+
+
+def _node_llm_config(model: str, temperature: str, max_tokens: str, timeout_s: str) -> NodeLLMConfig:
+    return NodeLLMConfig(
+        model=model or settings.openai_model,
+        temperature=float(temperature or settings.temperature),
+        max_tokens=int(max_tokens or 0) or None,
+        timeout_s=float(timeout_s or 0) or None,
+    )
+
+
+def node_llm_config_from_settings() -> dict[str, NodeLLMConfig]:
+    """Per-node chat settings; empty model/temperature values fall back to ``OPENAI_MODEL``/``TEMPERATURE``."""
+
+    return {
+        "rewrite": _node_llm_config(
+            settings.rewrite_model,
+            settings.rewrite_temperature,
+            settings.rewrite_max_tokens,
+            settings.rewrite_timeout_s,
+        ),
+        "grade": _node_llm_config(
+            settings.grader_model,
+            settings.grader_temperature,
+            settings.grader_max_tokens,
+            settings.grader_timeout_s,
+        ),
+        "generate": _node_llm_config(
+            settings.generation_model,
+            settings.generation_temperature,
+            settings.generation_max_tokens,
+            settings.generation_timeout_s,
+        ),
+    }
+
+
+def graph_kwargs_from_settings() -> dict[str, Any]:
+    """Translate string ``Settings`` values into ``build_agentic_rag_graph`` keyword arguments."""
+
+    return {
+        "openai_model": settings.openai_model,
+        "temperature": float(settings.temperature),
+        "top_k": int(settings.top_k),
+        "max_context_chars": int(settings.max_context_chars),
+        "max_retries": int(settings.max_retries),
+        "recency_days": int(settings.recency_days),
+        "evidence_min_recent_chunks": int(settings.evidence_min_recent_chunks),
+        "use_llm_grader": settings.use_llm_grader == "1",
+        "speculative_generation": settings.speculative_generation == "1",
+        "multi_query": settings.multi_query == "1",
+        "rrf_k": int(settings.rrf_k),
+        "raw_notes_dir": settings.raw_notes_dir,
+        "diversify": diversify_config_from_settings(),
+        "adaptive_k": adaptive_k_config_from_settings(),
+        "node_llm": node_llm_config_from_settings(),
+    }
+
+
+@dataclass
+class RagRuntime:
+    """A loaded index and compiled agentic graph, kept warm across queries.
+
+    The graph reads the index through ``index_handle``, so ``reload`` can swap in a rebuilt index
+    without recompiling the graph or interrupting queries in flight.
+    """
+
+    index_handle: IndexHandle
+    graph: Any
+    graph_kwargs: dict[str, Any]
+    embed_model: str = ""
+    migration: Any = None
+    # One AsyncOpenAI client per event loop for the async baseline, as the graph keeps for its nodes.
+    async_client: Callable[[], Any] = field(default_factory=_per_loop_async_client, repr=False)
+
+    @property
+    def index(self) -> Any:
+        return self.index_handle.index
+
+    @property
+    def chroma_dir(self) -> Path | None:
+        """Directory the current index version was loaded from; None for an index passed in directly."""
+
+        source = self.index_handle.current().source
+        return Path(source) if source else None
+
+    def reload(
+        self,
+        chroma_dir: Path | str | None = None,
+        *,
+        warm_queries: Sequence[str] = (),
+        background: bool = True,
+        embed_model: str | None = None,
+    ):
+        """Load ``chroma_dir`` (default ``CHROMA_DIR``) as the next index version, warm it and swap it in.
+
+        ``embed_model`` switches the query embedding model too, e.g. after an offline migration cutover.
+        Returns a ``Future`` with the new ``IndexVersion`` (or the version itself when not ``background``).
+        """
+
+        from src.retrieval import load_persisted_index
+
+        chroma_dir = Path(chroma_dir or settings.chroma_dir)
+        embed_model = embed_model or self.embed_model or settings.embed_model
+
+        def published(future: Future) -> None:
+            # Only switch once the new version is live; a failed load or warm-up keeps the old model.
+            if not future.cancelled() and future.exception() is None:
+                self.embed_model = embed_model
+
+        result = self.index_handle.refresh(
+            lambda: load_persisted_index(chroma_dir=chroma_dir, embed_model=embed_model),
+            warm_queries=warm_queries,
+            warm_top_k=self.graph_kwargs["top_k"],
+            source=str(chroma_dir),
+            background=background,
+        )
+        if background:
+            result.add_done_callback(published)
+        else:
+            self.embed_model = embed_model
+        return result
+
+    def migrate(
+        self,
+        embed_model: str,
+        *,
+        chroma_dir: Path | str | None = None,
+        shadow_rate: float | None = None,
+    ):
+        """Start building ``embed_model``'s collection in the background (``src/embed_migration.py``).
+
+        Queries keep using the current index meanwhile. Returns a ``Future`` that completes when the
+        new collection is built (and, with ``shadow_rate`` > 0, being shadow-queried).
+        """
+
+        from src.embed_migration import EmbeddingMigration
+
+        if self.migration is not None and self.migration.state == "building":
+            raise RuntimeError("An embedding migration is already building.")
+        self.migration = EmbeddingMigration(
+            self.index_handle,
+            Path(chroma_dir or settings.chroma_dir),
+            from_model=self.embed_model or settings.embed_model,
+            to_model=embed_model,
+            notes_dir=self.graph_kwargs["raw_notes_dir"],
+            shadow_rate=float(settings.migration_shadow_rate if shadow_rate is None else shadow_rate),
+        )
+        return self.migration.start()
+
+    def cutover(self):
+        """Make the migrated collection live: activate it on disk and swap it in for new queries."""
+
+        if self.migration is None:
+            raise RuntimeError("No embedding migration has been started.")
+        version = self.migration.cutover()
+        self.embed_model = self.migration.to_model
+        return version
+
+    def baseline(self, query: str) -> dict[str, Any]:
+        from src.rag_baseline import baseline_rag_answer
+
+        return baseline_rag_answer(
+            index=self.index,
+            query=query,
+            top_k=self.graph_kwargs["top_k"],
+            model=self.graph_kwargs["openai_model"],
+            temperature=self.graph_kwargs["temperature"],
+            max_context_chars=self.graph_kwargs["max_context_chars"],
+            diversify=self.graph_kwargs.get("diversify"),
+            adaptive_k=self.graph_kwargs.get("adaptive_k"),
+        )
+
+    def agentic(self, query: str) -> dict[str, Any]:
+        from src.graph import run_agentic_rag
+
+        return run_agentic_rag(self.graph, query)
+
+    async def abaseline(self, query: str) -> dict[str, Any]:
+        from src.rag_baseline import abaseline_rag_answer
+
+        return await abaseline_rag_answer(
+            index=self.index,
+            query=query,
+            top_k=self.graph_kwargs["top_k"],
+            model=self.graph_kwargs["openai_model"],
+            temperature=self.graph_kwargs["temperature"],
+            max_context_chars=self.graph_kwargs["max_context_chars"],
+            diversify=self.graph_kwargs.get("diversify"),
+            adaptive_k=self.graph_kwargs.get("adaptive_k"),
+            client=self.async_client(),
+        )
+
+    async def aagentic(self, query: str) -> dict[str, Any]:
+        from src.graph import arun_agentic_rag
+
+        return await arun_agentic_rag(self.graph, query)
+
+    def answer(self, query: str, mode: str = "agentic") -> dict[str, Any]:
+        if mode == "baseline":
+            return self.baseline(query)
+        if mode == "agentic":
+            return self.agentic(query)
+        raise ValueError(f"Unknown query mode: {mode!r}. Expected 'baseline' or 'agentic'.")
+
+    async def aanswer(self, query: str, mode: str = "agentic") -> dict[str, Any]:
+        if mode == "baseline":
+            return await self.abaseline(query)
+        if mode == "agentic":
+            return await self.aagentic(query)
+        raise ValueError(f"Unknown query mode: {mode!r}. Expected 'baseline' or 'agentic'.")
+
+
+def load_runtime(
+    chroma_dir: Path | str | None = None,
+    embed_model: str | None = None,
+    index: Any = None,
+    **graph_overrides: Any,
+) -> RagRuntime:
+    """Load the persisted index (unless ``index`` is given) and compile the agentic graph once."""
+
+    from src.graph import build_agentic_rag_graph
+    from src.retrieval import load_persisted_index
+
+    source = ""
+    embed_model = embed_model or settings.embed_model
+    if index is None:
+        source = str(Path(chroma_dir or settings.chroma_dir))
+        index = load_persisted_index(chroma_dir=Path(source), embed_model=embed_model)
+    graph_kwargs = {**graph_kwargs_from_settings(), **graph_overrides}
+    handle = IndexHandle(index, raw_notes_dir=graph_kwargs["raw_notes_dir"], source=source)
+    graph = build_agentic_rag_graph(index=handle, **graph_kwargs)
+    return RagRuntime(index_handle=handle, graph=graph, graph_kwargs=graph_kwargs, embed_model=embed_model)
@@ -0,0 +1,301 @@
+"""Asyncio HTTP query service around a warm ``RagRuntime``.
+
+Endpoints:
+- ``POST /query`` with ``{"query": "...", "mode": "agentic" | "baseline"}``
+- ``GET /metrics`` latency histograms, counters and gauges as JSON, plus the OpenAI rate limiter's
+  queueing metrics under ``rate_limit``
+- ``GET /healthz``
+- ``POST /reload`` with optional ``{"chroma_dir": "...", "warm_queries": [...], "embed_model": "..."}``:
+  load, warm and swap in a new index version in the background (``202``); queries in flight finish on
+  the old version
+- ``POST /migrate`` with ``{"embed_model": "...", "shadow_rate": 0.1}``: build the new model's collection
+  in the background while serving the current one (``202``); ``GET /migrate`` reports progress and shadow
+  overlap/latency, ``POST /migrate/cutover`` makes the new collection live
+
+The index is loaded and the agentic graph compiled once at startup. Identical in-flight queries
+(same mode and normalized text) share one execution, and at most ``max_concurrency`` executions
+run at a time with up to ``max_pending`` more queued; beyond that the service answers 503.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from src.http_server import HttpError, HttpRequest, start_json_server
+from src.metrics import MetricsRegistry
+
+QUERY_MODES = ("baseline", "agentic")
+
+
+def _coalesce_key(mode: str, query: str) -> tuple[str, str]:
+    return mode, " ".join(query.lower().split())
+
+
+class QueryService:
+    def __init__(
+        self,
+        runtime,
+        *,
+        max_concurrency: int = 8,
+        max_pending: int = 64,
+        metrics: MetricsRegistry | None = None,
+    ):
+        self.runtime = runtime
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.metrics = metrics or MetricsRegistry()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+        self._admitted = 0
+        self._executing = 0
+        handle = getattr(runtime, "index_handle", None)
+        if handle is not None:
+            handle.metrics = self.metrics
+            self.metrics.set_gauge("index.version", handle.version)
+
+    async def _run(self, query: str, mode: str) -> dict[str, Any]:
+        if hasattr(self.runtime, "aanswer"):
+            return await self.runtime.aanswer(query, mode)
+        return await asyncio.to_thread(self.runtime.answer, query, mode)
+
+    async def _execute(self, key: tuple[str, str], query: str, mode: str) -> dict[str, Any]:
+        queued_at = time.perf_counter()
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                self.metrics.histogram("queue_wait_s").observe(started - queued_at)
+                self._executing += 1
+                self.metrics.set_gauge("executing", self._executing)
+                try:
+                    result = await self._run(query, mode)
+                    for node, seconds in result.get("node_latency_s", {}).items():
+                        self.metrics.histogram(f"{mode}.node.{node}_s").observe(seconds)
+                    return result
+                finally:
+                    self._executing -= 1
+                    self.metrics.set_gauge("executing", self._executing)
+                    self.metrics.histogram(f"{mode}.execution_s").observe(time.perf_counter() - started)
+        finally:
+            self._admitted -= 1
+            self._inflight.pop(key, None)
+            self.metrics.set_gauge("admitted", self._admitted)
+
+    async def query(self, query: str, mode: str = "agentic") -> tuple[dict[str, Any], bool]:
+        """Answer ``query``; returns ``(result, coalesced)``."""
+
+        if mode not in QUERY_MODES:
+            raise HttpError(400, f"Unknown mode {mode!r}; expected one of {QUERY_MODES}.")
+        key = _coalesce_key(mode, query)
+
+        task = self._inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.metrics.increment("coalesced")
+        else:
+            if self._admitted >= self.max_concurrency + self.max_pending:
+                self.metrics.increment("rejected")
+                raise HttpError(503, "Too many queries in flight; retry later.")
+            self._admitted += 1
+            self.metrics.set_gauge("admitted", self._admitted)
+            task = asyncio.ensure_future(self._execute(key, query, mode))
+            self._inflight[key] = task
+
+        # Shield so one caller disconnecting does not cancel the shared execution.
+        return await asyncio.shield(task), coalesced
+
+    def reload(
+        self,
+        chroma_dir: str | None = None,
+        warm_queries: list[str] | None = None,
+        embed_model: str | None = None,
+    ) -> dict[str, Any]:
+        if not hasattr(self.runtime, "reload"):
+            raise HttpError(501, "This runtime does not support reloading the index.")
+
+        def _report(future) -> None:
+            error = future.exception()
+            if error is not None:
+                print(f"reload failed: {type(error).__name__}: {error}", file=sys.stderr, flush=True)
+            else:
+                version = future.result()
+                print(f"reload: index version {version.version} from {version.source}", file=sys.stderr, flush=True)
+
+        future = self.runtime.reload(chroma_dir, warm_queries=warm_queries or (), embed_model=embed_model)
+        future.add_done_callback(_report)
+        return {"status": "reloading", "current_version": self.runtime.index_handle.version}
+
+    def migrate(self, request: HttpRequest) -> tuple[int, Any]:
+        if not hasattr(self.runtime, "migrate"):
+            raise HttpError(501, "This runtime does not support embedding migrations.")
+        migration = self.runtime.migration
+        if request.path == "/migrate/cutover":
+            if request.method != "POST":
+                raise HttpError(405, "Use POST /migrate/cutover.")
+            try:
+                version = self.runtime.cutover()
+            except RuntimeError as exc:
+                raise HttpError(409, str(exc)) from exc
+            print(
+                f"migrate: cut over to {migration.to_model}, index version {version.version}",
+                file=sys.stderr,
+                flush=True,
+            )
+            return 200, {**self.runtime.migration.status(), "index_version": version.version}
+        if request.method == "GET":
+            return 200, migration.status() if migration is not None else {"state": "idle"}
+        if request.method != "POST":
+            raise HttpError(405, "Use GET or POST /migrate.")
+        body = request.json()
+        embed_model = str(body.get("embed_model", "")).strip() if isinstance(body, dict) else ""
+        if not embed_model:
+            raise HttpError(400, "Request body must include the target 'embed_model'.")
+        shadow_rate = None if body.get("shadow_rate") is None else float(body["shadow_rate"])
+
+        def _report(future) -> None:
+            error = future.exception()
+            status = self.runtime.migration.status()
+            if error is not None:
+                print(f"migrate failed: {status['error']}", file=sys.stderr, flush=True)
+            else:
+                print(
+                    f"migrate: built '{status['collection']}' ({status['vector_count']} vectors), {status['state']}",
+                    file=sys.stderr,
+                    flush=True,
+                )
+
+        try:
+            future = self.runtime.migrate(embed_model, shadow_rate=shadow_rate)
+        except RuntimeError as exc:
+            raise HttpError(409, str(exc)) from exc
+        future.add_done_callback(_report)
+        return 202, self.runtime.migration.status()
+
+    async def handle(self, request: HttpRequest) -> tuple[int, Any]:
+        if request.path == "/healthz":
+            handle = getattr(self.runtime, "index_handle", None)
+            return 200, {
+                "status": "ok",
+                "pid": os.getpid(),
+                "index_version": handle.version if handle is not None else None,
+            }
+        if request.path == "/metrics":
+            from src.rate_limit import rate_limiter
+
+            return 200, {**self.metrics.snapshot(), "rate_limit": rate_limiter().metrics.snapshot()}
+        if request.path == "/reload":
+            if request.method != "POST":
+                raise HttpError(405, "Use POST /reload.")
+            body = request.json()
+            if not isinstance(body, dict):
+                raise HttpError(400, "Request body must be a JSON object.")
+            warm_queries = [str(query) for query in body.get("warm_queries", [])]
+            return 202, self.reload(body.get("chroma_dir"), warm_queries, body.get("embed_model"))
+        if request.path in ("/migrate", "/migrate/cutover"):
+            return self.migrate(request)
+        if request.path != "/query":
+            raise HttpError(404, f"Unknown path: {request.path}")
+        if request.method != "POST":
+            raise HttpError(405, "Use POST /query.")
+
+        body = request.json()
+        query = str(body.get("query", "")).strip() if isinstance(body, dict) else ""
+        if not query:
+            raise HttpError(400, "Request body must include a non-empty 'query'.")
+        mode = str(body.get("mode", "agentic"))
+
+        started = time.perf_counter()
+        self.metrics.increment("requests")
+        try:
+            result, coalesced = await self.query(query, mode)
+        except HttpError:
+            raise
+        except Exception:
+            self.metrics.increment("errors")
+            raise
+        latency_s = time.perf_counter() - started
+        self.metrics.histogram(f"{mode}.latency_s").observe(latency_s)
+        return 200, {"mode": mode, "latency_s": latency_s, "coalesced": coalesced, "result": result}
+
+
+async def start_service(
+    runtime,
+    *,
+    host: str,
+    port: int,
+    max_concurrency: int,
+    max_pending: int,
+    metrics: MetricsRegistry | None = None,
+    sock: socket.socket | None = None,
+) -> tuple[QueryService, asyncio.AbstractServer]:
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rag-query"))
+    service = QueryService(runtime, max_concurrency=max_concurrency, max_pending=max_pending, metrics=metrics)
+    server = await start_json_server(service.handle, host, port, sock=sock)
+    return service, server
+
+
+def run_service(
+    runtime=None,
+    *,
+    host: str | None = None,
+    port: int | None = None,
+    max_concurrency: int | None = None,
+    max_pending: int | None = None,
+    watch: bool = False,
+    sock: socket.socket | None = None,
+) -> None:
+    """Load the runtime (unless given) and serve until interrupted.
+
+    With ``watch=True`` a ``NoteWatcher`` keeps the index in sync with ``RAW_NOTES_DIR`` and reports
+    its freshness metrics on ``/metrics``.
+    """
+
+    from src.config import settings
+
+    if runtime is None:
+        from src.runtime import load_runtime
+
+        runtime = load_runtime()
+
+    metrics = MetricsRegistry()
+    watcher = None
+    if watch:
+        from src.watcher import NoteWatcher
+
+        watcher = NoteWatcher(
+            getattr(runtime, "index_handle", runtime.index),
+            settings.raw_notes_dir,
+            poll_interval_s=float(settings.watch_poll_interval_s),
+            debounce_s=float(settings.watch_debounce_s),
+            chroma_dir=getattr(runtime, "chroma_dir", None),
+            metrics=metrics,
+        ).start()
+
+    async def _serve() -> None:
+        _service, server = await start_service(
+            runtime,
+            host=host or settings.service_host,
+            port=int(port if port is not None else settings.service_port),
+            max_concurrency=int(max_concurrency or settings.service_max_concurrency),
+            max_pending=int(max_pending if max_pending is not None else settings.service_max_pending),
+            metrics=metrics,
+            sock=sock,
+        )
+        bound = server.sockets[0].getsockname()
+        print(f"query service listening on http://{bound[0]}:{bound[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
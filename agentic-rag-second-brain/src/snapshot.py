@@ -0,0 +1,431 @@
+"""Portable, versioned index snapshots for fast cold start.
+
+``export_snapshot`` reads the persisted Chroma index (plain, partitioned or two-stage) and writes one
+self-contained directory:
+
+- ``snapshot.json``: format version, embed model, dimension, distance space, chunking config, counts
+- ``vectors.npy``: contiguous ``(n, dim)`` float32 (or float16) matrix
+- ``text.bin`` + ``text_offsets.npy``: chunk texts as one UTF-8 blob with ``n + 1`` byte offsets
+- ``columns.json``: per-chunk metadata stored column-wise (``node_id``, ``chunk_id``, ``doc_title``, ...)
+
+``SnapshotIndex`` memory-maps the arrays, so loading only touches what a query reads. It does an exact
+search over the matrix and returns the same rows as ``src.retrieval.retrieve_chunks``; pointing
+``CHROMA_DIR`` at a snapshot directory makes ``load_persisted_index`` return one.
+
+    python -m src.snapshot export --out data/processed/snapshot
+    python -m src.snapshot load data/processed/snapshot --query "current embedding model"
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Sequence
+
+from src.index_store import (
+    EMBED_DIM_KEY,
+    EMBED_MODEL_KEY,
+    _decode_metadata_value,
+    _manifest_embed_model,
+    active_collection_name,
+    check_embedding_model,
+    persisted_collection_names,
+    read_index_manifest,
+)
+from src.records import ChunkRecord
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SNAPSHOT_FORMAT = "rag-index-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST_FILENAME = "snapshot.json"
+VECTORS_FILENAME = "vectors.npy"
+TEXT_FILENAME = "text.bin"
+TEXT_OFFSETS_FILENAME = "text_offsets.npy"
+COLUMNS_FILENAME = "columns.json"
+METADATA_COLUMNS = ("chunk_id", "doc_id", "doc_title", "doc_date", "source_path", "tags")
+
+
+class ReadOnlyIndexError(RuntimeError):
+    """Raised when something tries to modify a read-only (snapshot) index."""
+
+
+def read_snapshot_manifest(path: Path | str) -> dict[str, Any] | None:
+    manifest_path = Path(path) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot version {manifest.get('version')!r} at {path}; "
+            f"this build reads version {SNAPSHOT_VERSION}."
+        )
+    return manifest
+
+
+def _read_collection_rows(chroma_dir: Path, batch_size: int) -> tuple[list[str], list, list[str], list[dict], dict]:
+    """``(ids, embeddings, documents, metadatas, collection_metadata)`` across all chunk collections.
+
+    Rows are deduplicated by id; ``collection_metadata`` is that of the last collection read.
+    """
+
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(chroma_dir))
+    ids: list[str] = []
+    embeddings: list = []
+    documents: list[str] = []
+    metadatas: list[dict] = []
+    seen: set[str] = set()
+    collection_metadata: dict = {}
+    for name in persisted_collection_names(chroma_dir):
+        collection = client.get_collection(name)
+        collection_metadata = collection.metadata or {}
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            for row, node_id in enumerate(batch["ids"]):
+                if node_id in seen:
+                    continue
+                seen.add(node_id)
+                ids.append(node_id)
+                embeddings.append(batch["embeddings"][row])
+                documents.append(batch["documents"][row] or "")
+                metadatas.append(batch["metadatas"][row] or {})
+    return ids, embeddings, documents, metadatas, collection_metadata
+
+
+def _recorded_embedding(chroma_dir: Path, collection_metadata: dict) -> tuple[str | None, int | None]:
+    """``(model, dim)`` the index records for its vectors, from its manifests or collection metadata."""
+
+    from src.matryoshka import read_two_stage_manifest
+    from src.partitions import read_partition_manifest
+
+    for manifest in (read_partition_manifest(chroma_dir), read_two_stage_manifest(chroma_dir)):
+        if manifest and manifest.get("embed_model"):
+            return manifest["embed_model"], manifest.get("full_dim")
+    model = collection_metadata.get(EMBED_MODEL_KEY) or _manifest_embed_model(
+        chroma_dir, active_collection_name(chroma_dir)
+    )
+    return model, collection_metadata.get(EMBED_DIM_KEY)
+
+
+def export_snapshot(
+    chroma_dir: Path | str,
+    out_dir: Path | str,
+    *,
+    embed_model: str | None = None,
+    dtype: str = "float32",
+    batch_size: int = 1000,
+) -> dict[str, Any]:
+    """Write a snapshot of the persisted index to ``out_dir`` (replaced atomically). Returns the manifest.
+
+    The snapshot is labelled with the embedding model the index records; ``EmbeddingModelMismatchError``
+    is raised when ``embed_model`` is given and differs from it.
+    """
+
+    import numpy as np
+
+    from src.ingestion import chunking_params
+    from src.matryoshka import FULL_VECTOR_IDS_FILENAME, FULL_VECTORS_FILENAME, read_two_stage_manifest
+
+    chroma_dir = Path(chroma_dir)
+    ids, embeddings, documents, metadatas, collection_metadata = _read_collection_rows(chroma_dir, batch_size)
+    if not ids:
+        raise FileNotFoundError(f"No vectors found in {chroma_dir}.")
+    recorded_model, recorded_dim = _recorded_embedding(chroma_dir, collection_metadata)
+    if embed_model:
+        check_embedding_model(recorded_model, embed_model, where=f"Index {chroma_dir}", recorded_dim=recorded_dim)
+    embed_model = recorded_model or embed_model
+    if not embed_model:
+        raise ValueError(f"{chroma_dir} records no embedding model; pass embed_model to label the snapshot.")
+    space = str(collection_metadata.get("hnsw:space", "l2"))
+    vectors = np.asarray(embeddings, dtype=np.float32)
+
+    two_stage = read_two_stage_manifest(chroma_dir)
+    if two_stage:
+        # Chroma only holds the truncated prefixes; export the full-dimension side store instead.
+        full_vectors = np.load(chroma_dir / FULL_VECTORS_FILENAME, mmap_mode="r")
+        full_ids = json.loads((chroma_dir / FULL_VECTOR_IDS_FILENAME).read_text(encoding="utf-8"))
+        row_by_id = {node_id: row for row, node_id in enumerate(full_ids)}
+        vectors = np.asarray(full_vectors[[row_by_id[node_id] for node_id in ids]], dtype=np.float32)
+        space = "cosine"
+
+    columns: dict[str, list] = {"node_id": ids}
+    for key in METADATA_COLUMNS:
+        columns[key] = [_decode_metadata_value(key, metadata.get(key, "")) for metadata in metadatas]
+
+    return write_snapshot(
+        out_dir,
+        vectors=vectors,
+        texts=documents,
+        columns=columns,
+        embed_model=embed_model,
+        space=space,
+        dtype=dtype,
+        chunking=(read_index_manifest(chroma_dir) or {}).get("chunking") or chunking_params(),
+        source={"chroma_dir": str(chroma_dir), "collection": active_collection_name(chroma_dir)},
+    )
+
+
+def write_snapshot(
+    out_dir: Path | str,
+    *,
+    vectors: "np.ndarray",
+    texts: Sequence[str],
+    columns: dict[str, list],
+    embed_model: str,
+    space: str,
+    dtype: str = "float32",
+    normalized: bool = False,
+    chunking: dict[str, Any] | None = None,
+    source: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Write ``vectors``, ``texts`` and per-row ``columns`` (``node_id`` plus ``METADATA_COLUMNS``)
+    as a snapshot directory, replacing ``out_dir`` atomically. Returns the manifest.
+
+    ``normalized`` records that every row already has unit length, so cosine search can skip the
+    per-row norms.
+    """
+
+    import numpy as np
+
+    out_dir = Path(out_dir)
+    if dtype not in ("float32", "float16"):
+        raise ValueError(f"Unsupported snapshot dtype {dtype!r}; use float32 or float16.")
+    if not len(vectors) == len(texts) == len(columns["node_id"]):
+        raise ValueError("Snapshot vectors, texts and columns must have one entry per row.")
+
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(blob) for blob in encoded])
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "embed_model": embed_model,
+        "dim": int(vectors.shape[1]),
+        "count": len(encoded),
+        "dtype": dtype,
+        "space": space,
+        "normalized": normalized,
+        "chunking": chunking or {},
+        "source": source or {},
+        "columns": sorted(columns),
+    }
+
+    staging = out_dir.with_name(out_dir.name + ".tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+    np.save(staging / VECTORS_FILENAME, np.ascontiguousarray(vectors.astype(dtype)))
+    np.save(staging / TEXT_OFFSETS_FILENAME, offsets)
+    (staging / TEXT_FILENAME).write_bytes(b"".join(encoded))
+    (staging / COLUMNS_FILENAME).write_text(json.dumps(columns), encoding="utf-8")
+    (staging / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    staging.rename(out_dir)
+    return manifest
+
+
+def read_snapshot_metadata(path: Path | str) -> list[dict[str, Any]]:
+    """Per-chunk metadata rows from a snapshot, in the shape ``read_chunk_metadata`` returns."""
+
+    columns = json.loads((Path(path) / COLUMNS_FILENAME).read_text(encoding="utf-8"))
+    keys = [key for key in METADATA_COLUMNS if key in columns]
+    return [{key: columns[key][row] for key in keys} for row in range(len(columns["node_id"]))]
+
+
+class _OpenAIQueryEmbedder:
+    """Query embeddings straight from the OpenAI SDK, so cold start skips importing LlamaIndex."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._client = None
+        self._async_client = None
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        if self._client is None:
+            from src.rate_limit import openai_client
+
+            self._client = openai_client()
+        return self._client.embeddings.create(model=self.model_name, input=[query]).data[0].embedding
+
+    async def aget_query_embedding(self, query: str) -> list[float]:
+        if self._async_client is None:
+            from src.rate_limit import async_openai_client
+
+            self._async_client = async_openai_client()
+        response = await self._async_client.embeddings.create(model=self.model_name, input=[query])
+        return response.data[0].embedding
+
+
+class SnapshotIndex:
+    """Index-like object over a memory-mapped snapshot (exact search).
+
+    The index is read-only: the arrays are mapped read-only and mutating calls raise
+    ``ReadOnlyIndexError``. That makes it safe to load once and share with forked workers.
+    """
+
+    read_only = True
+
+    def __init__(self, path: Path | str, embed_model: str | None = None):
+        import numpy as np
+
+        self.path = Path(path)
+        self.manifest = read_snapshot_manifest(self.path)
+        if not self.manifest:
+            raise FileNotFoundError(f"No {MANIFEST_FILENAME} found in {self.path}.")
+        if embed_model:
+            check_embedding_model(
+                self.manifest["embed_model"],
+                embed_model,
+                where=f"Snapshot {self.path}",
+                recorded_dim=self.manifest.get("dim"),
+            )
+        self.space = self.manifest["space"]
+        self.vectors = np.load(self.path / VECTORS_FILENAME, mmap_mode="r")
+        self.text_offsets = np.load(self.path / TEXT_OFFSETS_FILENAME, mmap_mode="r")
+        self.text = np.memmap(self.path / TEXT_FILENAME, dtype=np.uint8, mode="r") if self.text_offsets[-1] else b""
+        self.columns = json.loads((self.path / COLUMNS_FILENAME).read_text(encoding="utf-8"))
+        self.row_by_id = {node_id: row for row, node_id in enumerate(self.columns["node_id"])}
+        self._squared_norms = None
+        self.embed_model = _OpenAIQueryEmbedder(self.manifest["embed_model"])
+
+    def vector_count(self) -> int:
+        return int(self.manifest["count"])
+
+    def _refuse_write(self, *args, **kwargs):
+        raise ReadOnlyIndexError(
+            f"Snapshot index at {self.path} is read-only; rebuild the Chroma index and re-export instead."
+        )
+
+    insert = insert_nodes = delete_nodes = delete_ref_doc = _refuse_write
+
+    def _chunk_text(self, row: int) -> str:
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def _distances(self, query: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+
+        dots = np.asarray(self.vectors @ query.astype(self.vectors.dtype), dtype=np.float32)
+        if self.space == "ip":
+            return 1.0 - dots
+        if self.space == "cosine" and self.manifest.get("normalized"):
+            return 1.0 - dots / max(float(np.linalg.norm(query)), 1e-12)
+        if self.space == "cosine":
+            if self._squared_norms is None:
+                self._squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors, dtype=np.float32)
+            norms = np.sqrt(np.clip(self._squared_norms, 1e-24, None)) * max(float(np.linalg.norm(query)), 1e-12)
+            return 1.0 - dots / norms
+        if self._squared_norms is None:
+            self._squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors, dtype=np.float32)
+        return np.clip(self._squared_norms - 2 * dots + float(query @ query), 0.0, None)
+
+    def _search(self, query_embedding: Sequence[float], top_k: int) -> list[ChunkRecord]:
+        import numpy as np
+
+        distances = self._distances(np.asarray(query_embedding, dtype=np.float32))
+        k = min(top_k, len(distances))
+        if k == 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        rows: list[ChunkRecord] = []
+        for row in top.tolist():
+            rows.append(
+                ChunkRecord(
+                    # Same scale as ChromaVectorStore, which reports exp(-distance).
+                    score=float(np.exp(-distances[row])),
+                    text=self._chunk_text(row),
+                    doc_title=self.columns["doc_title"][row],
+                    doc_date=self.columns["doc_date"][row],
+                    chunk_id=self.columns["chunk_id"][row],
+                    source_path=self.columns["source_path"][row],
+                    node_id=self.columns["node_id"][row],
+                )
+            )
+        return rows
+
+    def stored_embeddings(self, node_ids: Sequence[str]) -> dict[str, list[float]]:
+        return {
+            node_id: self.vectors[self.row_by_id[node_id]].astype("float32").tolist()
+            for node_id in node_ids
+            if node_id in self.row_by_id
+        }
+
+    def retrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import embed_query
+
+        return self._search(embed_query(self.embed_model, query), top_k)
+
+    async def aretrieve_chunks(self, query: str, top_k: int) -> list[ChunkRecord]:
+        from src.retrieval import aembed_query
+
+        query_embedding = await aembed_query(self.embed_model, query)
+        return await asyncio.to_thread(self._search, query_embedding, top_k)
+
+
+def load_snapshot(path: Path | str, embed_model: str | None = None) -> SnapshotIndex:
+    return SnapshotIndex(path, embed_model=embed_model)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.snapshot", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write a snapshot of the persisted Chroma index.")
+    export_parser.add_argument("--chroma-dir", default=None)
+    export_parser.add_argument("--out", required=True)
+    export_parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+
+    load_parser = subparsers.add_parser("load", help="Time loading a snapshot and optionally run a query.")
+    load_parser.add_argument("path")
+    load_parser.add_argument("--query", default=None)
+    load_parser.add_argument("--top-k", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+
+    if args.command == "export":
+        started = time.perf_counter()
+        manifest = export_snapshot(
+            args.chroma_dir or settings.chroma_dir,
+            args.out,
+            embed_model=settings.embed_model,
+            dtype=args.dtype,
+        )
+        size = sum(path.stat().st_size for path in Path(args.out).iterdir())
+        print(
+            f"exported {manifest['count']} chunks (dim={manifest['dim']}, {manifest['dtype']}, "
+            f"{size / 1e6:.2f} MB) to {args.out} in {time.perf_counter() - started:.2f}s"
+        )
+        return 0
+
+    started = time.perf_counter()
+    index = load_snapshot(args.path, embed_model=settings.embed_model)
+    print(f"loaded {index.vector_count()} chunks in {(time.perf_counter() - started) * 1000:.1f}ms")
+    if args.query:
+        started = time.perf_counter()
+        rows = index.retrieve_chunks(args.query, args.top_k or int(settings.top_k))
+        print(f"query in {(time.perf_counter() - started) * 1000:.1f}ms")
+        for row in rows:
+            print(f"  {row['score']:.3f}  {row['chunk_id']}  {row['doc_date']}  {row['doc_title']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
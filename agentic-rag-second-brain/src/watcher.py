@@ -0,0 +1,235 @@
+"""Watch ``RAW_NOTES_DIR`` and keep the live Chroma collection in sync.
+
+A background thread polls the notes directory (``*.md``; mtime and size per file), waits until a
+burst of changes has settled for ``debounce_s``, and then applies the batch:
+
+- created / modified notes are parsed, chunked and embedded off the query path, the new chunks are
+  inserted and only then the note's previous chunks are deleted, so concurrent ``retrieve_chunks``
+  callers never see the note disappear;
+- deleted notes have their chunks removed by ``source_path``.
+
+After each batch the handle publishes the index as a new version with a recomputed latest corpus
+date (queries already in flight keep theirs) and, when
+``chroma_dir`` is given, ``index_manifest.json`` gets the collection's new ``vector_count``.
+
+Metrics (``MetricsRegistry``): ``watch.freshness_lag_s`` histogram (note mtime to searchable),
+``watch.pending_lag_s`` gauge (age of the oldest change not yet applied), and counters
+``watch.upserted``, ``watch.deleted``, ``watch.chunks_added``, ``watch.errors``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from src.metrics import MetricsRegistry
+
+FileState = tuple[int, int]
+
+
+def scan_notes(notes_dir: Path | str) -> dict[str, FileState]:
+    """``{resolved_path: (mtime_ns, size)}`` for every note in ``notes_dir``."""
+
+    snapshot: dict[str, FileState] = {}
+    for path in Path(notes_dir).glob("*.md"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        snapshot[str(path.resolve())] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def diff_snapshots(
+    previous: dict[str, FileState],
+    current: dict[str, FileState],
+) -> tuple[list[str], list[str]]:
+    """Return ``(upserted, deleted)`` paths between two scans."""
+
+    upserted = sorted(path for path, state in current.items() if previous.get(path) != state)
+    deleted = sorted(path for path in previous if path not in current)
+    return upserted, deleted
+
+
+def _collection(index):
+    if getattr(index, "read_only", False):
+        from src.snapshot import ReadOnlyIndexError
+
+        raise ReadOnlyIndexError(f"Watch mode cannot update a read-only {type(index).__name__}.")
+    if not hasattr(index, "vector_store"):
+        raise TypeError(
+            f"Watch mode needs a single-collection VectorStoreIndex, got {type(index).__name__}. "
+            "Partitioned and two-stage indexes must be rebuilt instead."
+        )
+    return index.vector_store.client
+
+
+def chunk_ids_for_source(index, source_path: str) -> list[str]:
+    return _collection(index).get(where={"source_path": source_path}, include=[])["ids"]
+
+
+def upsert_note(index, path: Path | str, chunking: dict | None = None) -> int:
+    """Re-index one note: insert its new chunks, then drop the old ones. Returns the chunk count.
+
+    ``chunking`` (an index manifest's ``chunking``) keeps the chunks in line with how the index was built.
+    """
+
+    from src.index_store import _normalize_node_metadata
+    from src.ingestion import chunk_documents, load_markdown_document
+
+    chunking = chunking or {}
+    document = load_markdown_document(path)
+    source_path = document.metadata["source_path"]
+    nodes = _normalize_node_metadata(
+        chunk_documents([document], chunking.get("chunk_size"), chunking.get("chunk_overlap"))
+    )
+    stale_ids = chunk_ids_for_source(index, source_path)
+    index.insert_nodes(nodes)
+    if stale_ids:
+        _collection(index).delete(ids=stale_ids)
+    return len(nodes)
+
+
+def delete_note(index, source_path: str) -> int:
+    stale_ids = chunk_ids_for_source(index, source_path)
+    if stale_ids:
+        _collection(index).delete(ids=stale_ids)
+    return len(stale_ids)
+
+
+class NoteWatcher:
+    """Polling watcher that applies note changes to ``index`` from a background thread.
+
+    ``index`` may be an ``IndexHandle``; changes then go to whichever version is current.
+    """
+
+    def __init__(
+        self,
+        index,
+        notes_dir: Path | str,
+        *,
+        poll_interval_s: float = 1.0,
+        debounce_s: float = 0.5,
+        metrics: MetricsRegistry | None = None,
+        chroma_dir: Path | str | None = None,
+    ):
+        self._index = index
+        _collection(self.index)
+        self.notes_dir = Path(notes_dir)
+        self.chroma_dir = Path(chroma_dir) if chroma_dir else None
+        self.chunking = self._manifest_chunking()
+        self.poll_interval_s = poll_interval_s
+        self.debounce_s = debounce_s
+        self.metrics = metrics or MetricsRegistry()
+        self._applied = scan_notes(self.notes_dir)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def index(self):
+        from src.index_handle import IndexHandle
+
+        index = self._index.index if isinstance(self._index, IndexHandle) else self._index
+        # A ShadowIndex answers from its primary collection, so note changes are written there.
+        return getattr(index, "writable_index", index)
+
+    def poll_once(self) -> dict[str, Any] | None:
+        """Apply pending changes once they have been stable for ``debounce_s``; None if nothing changed."""
+
+        current = scan_notes(self.notes_dir)
+        upserted, deleted = diff_snapshots(self._applied, current)
+        if not upserted and not deleted:
+            self.metrics.set_gauge("watch.pending_lag_s", 0.0)
+            return None
+
+        first_seen = time.time()
+        # Debounce: wait until a scan sees no further change (editors write files in bursts).
+        while not self._stop.is_set():
+            self._stop.wait(self.debounce_s)
+            settled = scan_notes(self.notes_dir)
+            if settled == current:
+                break
+            current = settled
+        upserted, deleted = diff_snapshots(self._applied, current)
+        oldest_change_s = min([current[path][0] / 1e9 for path in upserted] + [first_seen])
+        self.metrics.set_gauge("watch.pending_lag_s", time.time() - oldest_change_s)
+        return self._apply(current, upserted, deleted)
+
+    def _apply(self, current: dict[str, FileState], upserted: list[str], deleted: list[str]) -> dict[str, Any]:
+        started = time.perf_counter()
+        summary: dict[str, Any] = {"upserted": [], "deleted": [], "errors": []}
+        for path in upserted:
+            try:
+                chunks = upsert_note(self.index, path, self.chunking)
+            except Exception as exc:  # not marked applied, so the note is retried on the next poll
+                summary["errors"].append(f"{path}: {type(exc).__name__}: {exc}")
+                self.metrics.increment("watch.errors")
+                continue
+            summary["upserted"].append(path)
+            self.metrics.increment("watch.upserted")
+            self.metrics.increment("watch.chunks_added", chunks)
+            self.metrics.histogram("watch.freshness_lag_s").observe(time.time() - current[path][0] / 1e9)
+            self._applied[path] = current[path]
+        for path in deleted:
+            try:
+                delete_note(self.index, path)
+            except Exception as exc:
+                summary["errors"].append(f"{path}: {type(exc).__name__}: {exc}")
+                self.metrics.increment("watch.errors")
+                continue
+            summary["deleted"].append(path)
+            self.metrics.increment("watch.deleted")
+            self._applied.pop(path, None)
+        if summary["upserted"] or summary["deleted"]:
+            self._refresh_derived_state()
+        self.metrics.set_gauge("watch.pending_lag_s", 0.0)
+        self.metrics.histogram("watch.apply_s").observe(time.perf_counter() - started)
+        summary["apply_s"] = time.perf_counter() - started
+        return summary
+
+    def _manifest_chunking(self) -> dict | None:
+        from src.index_store import read_index_manifest
+
+        if self.chroma_dir is None:
+            return None
+        return (read_index_manifest(self.chroma_dir) or {}).get("chunking")
+
+    def _refresh_derived_state(self) -> None:
+        from src.index_handle import IndexHandle
+        from src.index_store import update_index_manifest
+
+        if isinstance(self._index, IndexHandle):
+            self._index.refresh_derived_state()
+        if self.chroma_dir is not None:
+            collection = _collection(self.index)
+            update_index_manifest(self.chroma_dir, collection.name, vector_count=collection.count())
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                summary = self.poll_once()
+            except Exception:
+                self.metrics.increment("watch.errors")
+                summary = None
+            if summary and (summary["upserted"] or summary["deleted"] or summary["errors"]):
+                print(
+                    f"watch: {len(summary['upserted'])} upserted, {len(summary['deleted'])} deleted, "
+                    f"{len(summary['errors'])} errors in {summary['apply_s']:.2f}s",
+                    flush=True,
+                )
+            self._stop.wait(self.poll_interval_s)
+
+    def start(self) -> "NoteWatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="note-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,116 @@
+"""Measure index build write amplification for each ``PERSIST_MODE``.
+
+Notes are chunked and embedded once, then the same pre-embedded nodes are indexed into a fresh
+directory per mode, so only persistence differs. For each mode the report gives bytes written
+(``wchar`` from ``/proc/self/io`` on Linux), bytes on disk, the share taken by LlamaIndex JSON
+stores, and the ratio to the logical payload (chunk text + float32 vectors).
+
+    python -m src.write_amplification --notes-dir data/raw/notes
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Sequence
+
+from src.index_store import LLAMA_INDEX_JSON_STORES, PERSIST_MODES, _embed_nodes, build_or_load_index
+
+
+def _process_bytes_written() -> int | None:
+    try:
+        for line in Path("/proc/self/io").read_text().splitlines():
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def directory_bytes(path: Path | str) -> dict[str, int]:
+    """Bytes on disk split into ``json_stores``, ``chroma`` and ``total``."""
+
+    path = Path(path)
+    json_bytes = sum((path / name).stat().st_size for name in LLAMA_INDEX_JSON_STORES if (path / name).exists())
+    total = sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+    return {"json_stores": json_bytes, "chroma": total - json_bytes, "total": total}
+
+
+def logical_bytes(nodes: Sequence) -> int:
+    from llama_index.core.schema import MetadataMode
+
+    text = sum(len(node.get_content(metadata_mode=MetadataMode.NONE).encode("utf-8")) for node in nodes)
+    vectors = sum(4 * len(node.embedding or []) for node in nodes)
+    return text + vectors
+
+
+def measure_persistence(nodes: Sequence, embed_model: str, persist_mode: str, workdir: Path | str) -> dict[str, Any]:
+    """Build the index from pre-embedded ``nodes`` into ``workdir`` and report what was written."""
+
+    workdir = Path(workdir)
+    written_before = _process_bytes_written()
+    started = time.perf_counter()
+    info = build_or_load_index(
+        nodes=nodes,
+        reset=True,
+        chroma_dir=workdir,
+        embed_model=embed_model,
+        partitioning="none",
+        persist_mode=persist_mode,
+    )
+    build_s = time.perf_counter() - started
+    written_after = _process_bytes_written()
+    on_disk = directory_bytes(workdir)
+    payload = logical_bytes(nodes)
+    written = None if written_before is None or written_after is None else written_after - written_before
+    return {
+        "persist_mode": persist_mode,
+        "chunks": info["vector_count"],
+        "build_s": build_s,
+        "logical_bytes": payload,
+        "bytes_written": written,
+        "disk_bytes": on_disk["total"],
+        "json_store_bytes": on_disk["json_stores"],
+        "write_amplification": (written / payload) if written is not None and payload else None,
+        "disk_amplification": on_disk["total"] / payload if payload else None,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.write_amplification", description=__doc__.splitlines()[0])
+    parser.add_argument("--notes-dir", default=None, help="Notes to index (defaults to RAW_NOTES_DIR).")
+    parser.add_argument("--modes", default=",".join(PERSIST_MODES))
+    args = parser.parse_args(argv)
+
+    from src.config import settings
+    from src.ingestion import chunk_documents, load_markdown_documents
+    from src.rate_limit import openai_embedding
+
+    nodes = chunk_documents(load_markdown_documents(args.notes_dir or settings.raw_notes_dir))
+    # The same helper the index build uses, so the vectors match a real ingest.
+    _embed_nodes(nodes, openai_embedding(settings.embed_model))
+    print(f"{len(nodes)} chunks, logical payload {logical_bytes(nodes) / 1e3:.1f} kB (text + float32 vectors)")
+    root = Path(tempfile.mkdtemp(prefix="rag-write-amp-"))
+    try:
+        # Unreported warm-up build, so one-time Chroma/LlamaIndex initialisation does not skew the first mode.
+        measure_persistence(nodes, settings.embed_model, "lean", root / "warmup")
+        for mode in [mode.strip() for mode in args.modes.split(",") if mode.strip()]:
+            report = measure_persistence(nodes, settings.embed_model, mode, root / mode)
+            written = report["bytes_written"]
+            print(
+                f"  {mode:<5} build={report['build_s']:.2f}s "
+                f"written={'n/a' if written is None else f'{written / 1e3:.1f} kB'} "
+                f"disk={report['disk_bytes'] / 1e3:.1f} kB (json stores {report['json_store_bytes'] / 1e3:.1f} kB) "
+                f"write_amp={report['write_amplification'] or float('nan'):.2f}x "
+                f"disk_amp={report['disk_amplification']:.2f}x"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+"""Version pinning and derived-state refreshes on ``IndexHandle``."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from src.index_handle import IndexHandle
+
+
+def _write_note(notes_dir, date: str) -> None:
+    (notes_dir / f"{date}-note.md").write_text("# Note\n", encoding="utf-8")
+
+
+def test_refresh_while_pinned_publishes_new_date_to_new_queries(tmp_path):
+    _write_note(tmp_path, "2025-01-01")
+    handle = IndexHandle(object(), raw_notes_dir=tmp_path)
+    in_flight = handle.pin()
+
+    _write_note(tmp_path, "2026-05-01")
+    refreshed = handle.refresh_derived_state()
+    fresh = handle.pin()
+
+    assert fresh is refreshed
+    assert fresh.version != in_flight.version
+    assert fresh.index is in_flight.index
+    assert handle.resolve(fresh.version).latest_doc_date == datetime(2026, 5, 1)
+    assert handle.resolve(in_flight.version).latest_doc_date == datetime(2025, 1, 1)
+
+    handle.release(in_flight.version)
+    handle.release(fresh.version)
+    assert handle.resolve(handle.version) is refreshed
+
+
+def test_release_frees_a_swapped_out_version(tmp_path):
+    handle = IndexHandle(object(), raw_notes_dir=tmp_path)
+    pinned = handle.pin()
+    handle.swap(object())
+
+    assert handle.resolve(pinned.version) is pinned
+    handle.release(pinned.version)
+    with pytest.raises(KeyError):
+        handle.resolve(pinned.version)
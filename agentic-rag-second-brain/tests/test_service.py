@@ -0,0 +1,112 @@
+"""End-to-end checks for the HTTP query service against the local fake OpenAI backend."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from src.fake_openai import FakeOpenAIBackend, FakeOpenAIServer
+from src.http_server import HttpError, HttpRequest
+
+NOTES_DIR = Path(__file__).resolve().parents[1] / "data" / "raw" / "notes"
+EMBED_MODEL = "text-embedding-3-small"
+
+
+@pytest.fixture(scope="module")
+def fake_backend():
+    # Slow enough chat calls that concurrent queries overlap.
+    backend = FakeOpenAIBackend(chat_latency_s=0.2)
+    server = FakeOpenAIServer(backend=backend)
+    url = server.start()
+    keys = ("OPENAI_BASE_URL", "OPENAI_API_BASE", "OPENAI_API_KEY")
+    saved = {key: os.environ.get(key) for key in keys}
+    os.environ.update(OPENAI_BASE_URL=url, OPENAI_API_BASE=url, OPENAI_API_KEY="fake")
+    yield backend
+    for key, value in saved.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    server.stop()
+
+
+@pytest.fixture(scope="module")
+def runtime(fake_backend, tmp_path_factory):
+    from src.index_store import build_or_load_index
+    from src.ingestion import chunk_documents, load_markdown_documents
+    from src.runtime import load_runtime
+
+    chroma_dir = tmp_path_factory.mktemp("chroma")
+    build_or_load_index(
+        nodes=chunk_documents(load_markdown_documents(NOTES_DIR)),
+        reset=True,
+        chroma_dir=chroma_dir,
+        embed_model=EMBED_MODEL,
+        partitioning="none",
+    )
+    return load_runtime(chroma_dir=chroma_dir, embed_model=EMBED_MODEL, raw_notes_dir=str(NOTES_DIR))
+
+
+def _query(service, query: str, mode: str):
+    body = json.dumps({"query": query, "mode": mode}).encode("utf-8")
+    return service.handle(HttpRequest("POST", "/query", body=body))
+
+
+@pytest.mark.parametrize("mode", ["baseline", "agentic"])
+def test_query_answers_in_each_mode(runtime, mode):
+    from src.service import QueryService
+
+    async def scenario():
+        return await _query(QueryService(runtime), "What embedding model should we use?", mode)
+
+    status, payload = asyncio.run(scenario())
+
+    assert status == 200
+    assert payload["mode"] == mode
+    assert payload["coalesced"] is False
+    result = payload["result"]
+    answer = result["final_answer"] if mode == "agentic" else result
+    assert answer["answer"]
+
+
+def test_identical_inflight_queries_share_one_execution(runtime):
+    from src.service import QueryService
+
+    service = QueryService(runtime)
+
+    async def scenario():
+        return await asyncio.gather(
+            _query(service, "How should we chunk meeting notes?", "baseline"),
+            _query(service, "  how should we CHUNK meeting notes? ", "baseline"),
+        )
+
+    responses = asyncio.run(scenario())
+
+    assert [status for status, _ in responses] == [200, 200]
+    assert sorted(payload["coalesced"] for _, payload in responses) == [False, True]
+    assert responses[0][1]["result"] == responses[1][1]["result"]
+    assert service.metrics.snapshot()["counters"]["coalesced"] == 1
+
+
+def test_queries_beyond_the_admission_limit_get_503(runtime):
+    from src.service import QueryService
+
+    service = QueryService(runtime, max_concurrency=1, max_pending=0)
+
+    async def scenario():
+        return await asyncio.gather(
+            _query(service, "How should we chunk meeting notes?", "baseline"),
+            _query(service, "What embedding model should we use?", "baseline"),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(scenario())
+
+    assert first[0] == 200
+    assert isinstance(second, HttpError)
+    assert second.status == 503
+    assert service.metrics.snapshot()["counters"]["rejected"] == 1